@@ -1,36 +1,129 @@
 import os
 import json
-from datetime import datetime, timedelta
+import hashlib
+import importlib.metadata
+import base64
+import re
+import binascii
+from typing import List, Optional
+from datetime import datetime, date, time, timedelta, timezone
 from functools import wraps
-from collections import defaultdict
+import io
 from io import BytesIO
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, Response, stream_with_context, jsonify, make_response
 from flask_sqlalchemy import SQLAlchemy
+from jinja2 import FileSystemBytecodeCache
+import msgspec
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session as OrmSession
 from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.routing import BaseConverter
+from passwords import PasswordBusyError, PasswordHasher
+from offload import NativePool
+from report_cache import ReportCache
+from report_jobs import ReportQueue, QueueFullError
+from user_cache import UserCache, UserSnapshot
+from instrumentation import init_instrumentation, timed
+from compression import init_compression
+from db_config import configure_engine, engine_options, normalize_database_url
+from sessions import SqlSessionInterface
+from service_import import ImportRowError, detect_format, iter_records, parse_break, parse_date, parse_tasks, parse_time
+from csv_export import CSV_COLUMNS, CSV_HEADER, CsvChunk, services_csv_row
 import csv # Importar para exportación CSV
-
-# Importaciones de ReportLab
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4, landscape, portrait # Import landscape and portrait
-from reportlab.lib.units import mm # Para trabajar con milímetros
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch # Para ReportLab TableStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT # <-- IMPORTACIÓN CORREGIDA AQUÍ
+import zlib # Compresión gzip opcional de las exportaciones CSV
 
 # --- Configuración de la aplicación Flask ---
 app = Flask(__name__)
 
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your_super_secret_key_that_is_very_long_and_random_2024') # Use environment variable for production
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///site.db') # Use environment variable for production
+app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(os.environ.get('DATABASE_URL', 'sqlite:///site.db')) # Use environment variable for production
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool de Postgres por worker y PRAGMAs de SQLite (WAL...), ver db_config.py
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+# Sesiones (ver sessions.py): 'cookie' firmada (por defecto) o 'sql' (tabla web_session).
+# Las dos funcionan con varios workers y servidores mientras compartan SECRET_KEY / base de datos.
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'cookie')
+app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=int(os.environ.get('SESSION_LIFETIME_HOURS', 24 * 7)))
+app.config['SESSION_PURGE_INTERVAL'] = int(os.environ.get('SESSION_PURGE_INTERVAL', 300)) # Segundos entre purgas por proceso
+app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+app.config['SESSION_COOKIE_SECURE'] = os.environ.get('SESSION_COOKIE_SECURE', '0') == '1' # Activar detrás de HTTPS
+
+# Contraseñas (ver passwords.py): algoritmo y coste en formato de Werkzeug, hashes simultáneos por
+# proceso, peticiones que pueden esperar turno y segundos máximos de espera
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_WAITING'] = int(os.environ.get('PASSWORD_HASH_WAITING', 16))
+app.config['PASSWORD_HASH_TIMEOUT'] = int(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+# Tamaño máximo de una petición (en la práctica, de los archivos de /import)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('IMPORT_MAX_MB', 50)) * 1024 * 1024
+
+# Caché en disco de los informes PDF (ver report_cache.py)
+app.config['REPORT_CACHE_DIR'] = os.environ.get('REPORT_CACHE_DIR', os.path.join(app.instance_path, 'report_cache'))
+app.config['REPORT_CACHE_MAX_BYTES'] = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# Informes en segundo plano (ver report_jobs.py): procesos simultáneos, trabajos en espera y trabajos
+# simultáneos por usuario (los tres son por worker de gunicorn) y segundos máximos por informe
+app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 2))
+app.config['REPORT_QUEUE_SIZE'] = int(os.environ.get('REPORT_QUEUE_SIZE', 20))
+app.config['REPORT_USER_LIMIT'] = int(os.environ.get('REPORT_USER_LIMIT', 2))
+app.config['REPORT_TIMEOUT'] = int(os.environ.get('REPORT_TIMEOUT', 120))
+# Hilos del sistema por proceso que generan PDFs en primer plano (ver offload.py); con workers
+# gevent es lo que evita que ReportLab pare el resto de peticiones del worker
+app.config['PDF_RENDER_THREADS'] = int(os.environ.get('PDF_RENDER_THREADS', 2))
+# Caché de usuarios de Flask-Login (ver user_cache.py): segundos de validez (0 la desactiva) y entradas máximas
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+# Medición por petición, cabecera Server-Timing, log de peticiones lentas y /metrics (ver instrumentation.py)
+app.config['INSTRUMENTATION'] = os.environ.get('INSTRUMENTATION', '0') == '1'
+app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 500))
+# Compresión gzip/brotli de HTML, CSV y JSON según Accept-Encoding (ver compression.py): tamaño
+# mínimo en bytes, nivel de gzip (1-9), nivel de brotli (0-11) y algoritmos en orden de preferencia
+app.config['COMPRESSION'] = os.environ.get('COMPRESSION', '0') == '1'
+app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+app.config['COMPRESSION_LEVEL'] = int(os.environ.get('COMPRESSION_LEVEL', 6))
+app.config['COMPRESSION_BROTLI_LEVEL'] = int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 4))
+app.config['COMPRESSION_ENCODINGS'] = os.environ.get('COMPRESSION_ENCODINGS', 'br,gzip')
+
+# Caché de bytecode de Jinja: las plantillas compiladas se guardan en disco y un worker nuevo (o
+# un reinicio) las carga sin volver a compilarlas. Vacío la desactiva.
+app.config['JINJA_CACHE_DIR'] = os.environ.get('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
 
 # Initialize SQLAlchemy
 db = SQLAlchemy(app)
+with app.app_context():
+    configure_engine(db.engine)
+
+report_cache = ReportCache(app.config['REPORT_CACHE_DIR'], app.config['REPORT_CACHE_MAX_BYTES'])
+report_queue = ReportQueue(report_cache,
+                           max_workers=app.config['REPORT_WORKERS'],
+                           max_pending=app.config['REPORT_QUEUE_SIZE'],
+                           per_user_limit=app.config['REPORT_USER_LIMIT'],
+                           timeout=app.config['REPORT_TIMEOUT'])
+user_cache = UserCache(app.config['USER_CACHE_TTL'], app.config['USER_CACHE_SIZE'])
+pdf_pool = NativePool(app.config['PDF_RENDER_THREADS'], thread_name_prefix='pdf')
+password_hasher = PasswordHasher(app.config['PASSWORD_HASH_METHOD'],
+                                 max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                                 max_waiting=app.config['PASSWORD_HASH_WAITING'],
+                                 wait_timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+
+if app.config['JINJA_CACHE_DIR']:
+    os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
+
+# La compresión se registra antes que la medición para ejecutarse después (Flask llama a los
+# after_request en orden inverso) y comprimir la respuesta ya terminada
+compression = None
+if app.config['COMPRESSION']:
+    compression = init_compression(app, min_size=app.config['COMPRESSION_MIN_SIZE'],
+                                   level=app.config['COMPRESSION_LEVEL'],
+                                   brotli_level=app.config['COMPRESSION_BROTLI_LEVEL'],
+                                   encodings=[name.strip() for name in app.config['COMPRESSION_ENCODINGS'].split(',') if name.strip()])
+
+if app.config['INSTRUMENTATION']:
+    init_instrumentation(app, db, slow_request_ms=app.config['SLOW_REQUEST_MS'],
+                         extra_metrics=[compression.stats.render] if compression else ())
 
 # Setup Flask-Login
 login_manager = LoginManager()
@@ -38,9 +131,15 @@ login_manager.init_app(app)
 login_manager.login_view = 'login' # Redirect to login page if not authenticated
 
 # User Loader for Flask-Login
+# current_user es un UserSnapshot cacheado (solo id y username), no un objeto User: las vistas
+# que necesitan el modelo completo lo cargan con db.session.get(User, current_user.id).
+def _load_user_snapshot(user_id):
+    row = db.session.execute(db.select(User.id, User.username).where(User.id == user_id)).first()
+    return UserSnapshot(row.id, row.username) if row else None
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id), _load_user_snapshot)
 
 # Database Models
 class User(db.Model, UserMixin):
@@ -50,48 +149,419 @@ class User(db.Model, UserMixin):
     services = db.relationship('Service', backref='author', lazy=True) # One-to-many relationship with Service
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    # El hash guardado usa un algoritmo o coste distinto de PASSWORD_HASH_METHOD
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f"User('{self.username}')"
 
 class Service(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False)
+    # active_history: al cambiar la fecha o el usuario se carga el valor anterior aunque el objeto
+    # esté expirado, para recalcular también el mes de origen en monthly_rollup
+    date = db.column_property(db.Column(db.Date, nullable=False), active_history=True)
     place = db.Column(db.String(100), nullable=False)
     entry_time = db.Column(db.Time, nullable=False)
     break_duration = db.Column(db.Integer, default=0) # Break duration in minutes
     exit_time = db.Column(db.Time, nullable=False)
     worked_hours = db.Column(db.Float, nullable=False)
     observations = db.Column(db.Text, nullable=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.column_property(db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False), active_history=True)
     # New field to store specific tasks as a JSON string
     specific_tasks = db.Column(db.Text, nullable=True) # Stores JSON: [{"description": "task name", "duration": 1.5}]
+    # Tareas normalizadas (fuente para los resúmenes). specific_tasks se sigue escribiendo como copia JSON
+    # para las exportaciones y para poder volver atrás; los datos antiguos se migran con backfill_service_tasks.py
+    tasks = db.relationship('ServiceTask', backref='service', lazy=True,
+                            cascade='all, delete-orphan', order_by='ServiceTask.id')
+
+    # Índice compuesto para las vistas mensuales: filtra por usuario y rango de fechas y
+    # devuelve las filas ya ordenadas por (date, entry_time) sin ordenar en memoria.
+    __table_args__ = (
+        db.Index('ix_service_user_date_entry', 'user_id', 'date', 'entry_time'),
+    )
 
     def __repr__(self):
         return f"Service('{self.date}', '{self.place}', '{self.worked_hours}')"
 
+class ServiceTask(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('service.id', ondelete='CASCADE'), nullable=False)
+    description = db.Column(db.String(200), nullable=False)
+    duration = db.Column(db.Float, nullable=False) # Hours
+
+    # service_id para cargar/borrar las tareas de un servicio y para el JOIN de los resúmenes mensuales
+    __table_args__ = (
+        db.Index('ix_service_task_service_description', 'service_id', 'description'),
+    )
+
+    def __repr__(self):
+        return f"ServiceTask('{self.description}', '{self.duration}')"
+
+# Totales precalculados por usuario y mes. Se mantienen al día con los eventos de Service/ServiceTask
+# (ver refresh_monthly_rollups) y se pueden reconstruir/verificar con rebuild_rollups.py
+class MonthlyRollup(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    year_month = db.Column(db.String(7), primary_key=True) # 'YYYY-MM'
+    total_hours = db.Column(db.Float, nullable=False, default=0.0)
+    service_count = db.Column(db.Integer, nullable=False, default=0)
+    task_hours = db.Column(db.Float, nullable=False, default=0.0)
+    # Se incrementa cada vez que cambia algún servicio del mes; forma parte de la clave de la caché de
+    # informes y del ETag, así que un informe cacheado nunca sobrevive a un cambio en sus datos
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=True) # UTC, para Last-Modified
+
+    def __repr__(self):
+        return f"MonthlyRollup('{self.user_id}', '{self.year_month}', '{self.total_hours}')"
+
+# Sesiones del almacén 'sql' (SESSION_BACKEND=sql). 'data' es el JSON etiquetado de Flask.
+class WebSession(db.Model):
+    __tablename__ = 'web_session'
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True) # UTC; índice para purgar las caducadas
+
+if app.config['SESSION_BACKEND'] == 'sql':
+    with app.app_context():
+        app.session_interface = SqlSessionInterface(db.engine, WebSession.__table__,
+                                                    purge_interval=app.config['SESSION_PURGE_INTERVAL'])
+
 # Helper function to calculate worked hours
 def calculate_worked_hours(entry_time_str, exit_time_str, break_duration_minutes):
     try:
         entry_dt = datetime.strptime(entry_time_str, '%H:%M')
         exit_dt = datetime.strptime(exit_time_str, '%H:%M')
 
-        if exit_dt < entry_dt:
-            # Handle cases where exit time is on the next day
-            exit_dt += timedelta(days=1)
-
-        total_duration = exit_dt - entry_dt
-        break_td = timedelta(minutes=break_duration_minutes)
-        worked_duration = total_duration - break_td
-
-        worked_hours = worked_duration.total_seconds() / 3600
-        return max(0.0, worked_hours) # Ensure hours are not negative
     except ValueError:
         return None # Return None if time format is incorrect
+    return worked_hours_between(entry_dt.time(), exit_dt.time(), break_duration_minutes)
+
+# Lo mismo con horas ya convertidas (la importación masiva las parsea sin strptime)
+def worked_hours_between(entry_time, exit_time, break_duration_minutes):
+    entry_minutes = entry_time.hour * 60 + entry_time.minute
+    exit_minutes = exit_time.hour * 60 + exit_time.minute
+    if exit_minutes < entry_minutes:
+        # Handle cases where exit time is on the next day
+        exit_minutes += 24 * 60
+    worked_hours = (exit_minutes - entry_minutes - break_duration_minutes) / 60
+    return max(0.0, worked_hours) # Ensure hours are not negative
+
+# Intervalo real de un turno; una salida anterior a la entrada es del día siguiente (igual que
+# en calculate_worked_hours)
+def service_interval(service_date, entry_time, exit_time):
+    start = datetime.combine(service_date, entry_time)
+    end = datetime.combine(service_date, exit_time)
+    if end < start:
+        end += timedelta(days=1)
+    return start, end
+
+# Primer servicio del usuario que se solapa con el turno dado, o None. Un turno dura menos de un
+# día, así que solo pueden solaparse los de la víspera (nocturnos), los del mismo día y los del día
+# siguiente: una consulta por rango sobre ix_service_user_date_entry y comparar esos intervalos.
+# Los turnos de duración cero (entrada igual a salida) no se solapan con nada.
+def find_overlapping_service(user_id, service_date, entry_time, exit_time, exclude_id=None):
+    start, end = service_interval(service_date, entry_time, exit_time)
+    if start == end:
+        return None
+    query = db.select(Service.id, Service.date, Service.entry_time, Service.exit_time).where(
+        Service.user_id == user_id,
+        Service.date >= service_date - timedelta(days=1),
+        Service.date <= service_date + timedelta(days=1),
+    )
+    if exclude_id is not None:
+        query = query.where(Service.id != exclude_id)
+    with db.session.no_autoflush: # edit_service ya ha modificado el servicio; no guardarlo aún
+        for row in db.session.execute(query):
+            other_start, other_end = service_interval(row.date, row.entry_time, row.exit_time)
+            if other_start < end and start < other_end:
+                return row
+    return None
+
+# Todos los pares de servicios solapados (de todos los usuarios o de uno) en una sola pasada:
+# las filas llegan ordenadas por (user_id, date, entry_time), que es el orden del índice y el de
+# la hora real de inicio, y se guardan solo los turnos del usuario que siguen abiertos (terminan
+# después del inicio del actual). Cada turno se compara con esos, no con todos los demás.
+# Devuelve pares (anterior, posterior) de filas con id, user_id, date, entry_time y exit_time.
+def audit_overlaps(user_id=None, yield_per=5000):
+    query = db.select(Service.id, Service.user_id, Service.date, Service.entry_time, Service.exit_time) \
+        .order_by(Service.user_id, Service.date, Service.entry_time, Service.id) \
+        .execution_options(yield_per=yield_per)
+    if user_id is not None:
+        query = query.where(Service.user_id == user_id)
+    last_user_id, active = None, [] # active: [(fin, fila)]
+    for row in db.session.execute(query):
+        if row.user_id != last_user_id:
+            last_user_id, active = row.user_id, []
+        start, end = service_interval(row.date, row.entry_time, row.exit_time)
+        if start == end:
+            continue
+        active = [item for item in active if item[0] > start]
+        for _, other in active:
+            yield other, row
+        active.append((end, row))
+
+# Helper: convierte 'YYYY-MM' en el rango semiabierto [primer día del mes, primer día del mes siguiente)
+def month_bounds(month_str):
+    year, month = map(int, month_str.split('-'))
+    first_day = date(year, month, 1)
+    if month == 12:
+        next_first_day = date(year + 1, 1, 1)
+    else:
+        next_first_day = date(year, month + 1, 1)
+    return first_day, next_first_day
+
+# Condiciones para los servicios de un usuario en un mes. Compara Service.date contra un rango en lugar
+# de usar extract('year'/'month'), para que la base de datos pueda usar ix_service_user_date_entry.
+def service_month_filter(user_id, month_str):
+    first_day, next_first_day = month_bounds(month_str)
+    return (
+        Service.user_id == user_id,
+        Service.date >= first_day,
+        Service.date < next_first_day
+    )
+
+# Totales del mes: una sola fila de monthly_rollup. Un mes sin servicios no tiene fila.
+def month_totals(user_id, month_str):
+    rollup = db.session.get(MonthlyRollup, (user_id, month_str))
+    if rollup is None:
+        rollup = MonthlyRollup(user_id=user_id, year_month=month_str,
+                               total_hours=0.0, service_count=0, task_hours=0.0)
+    return rollup
+
+# --- Mantenimiento incremental de monthly_rollup ---
+# Los eventos de mapper solo apuntan qué meses han cambiado (en session.info); al final de cada
+# flush se recalcula cada mes afectado una sola vez, con agregados SQL dentro de la misma transacción.
+# Los inserts masivos con db.insert() no disparan estos eventos: quien los use debe llamar a
+# refresh_monthly_rollups() con los meses que ha tocado.
+
+def _rollup_pending(target):
+    session = sa_inspect(target).session
+    return session.info.setdefault('rollup_months', set()), session.info.setdefault('rollup_services', set())
+
+def _mark_service_months(target):
+    months, _ = _rollup_pending(target)
+    state = sa_inspect(target)
+    user_ids = set(state.attrs.user_id.history.deleted) | {target.user_id}
+    dates = set(state.attrs.date.history.deleted) | {target.date}
+    # Si una edición mueve el servicio de mes (o de usuario) se recalculan el mes viejo y el nuevo
+    for user_id in user_ids:
+        for service_date in dates:
+            if user_id is not None and service_date is not None:
+                months.add((user_id, service_date.strftime('%Y-%m')))
+
+def _mark_task_service(target):
+    _, services = _rollup_pending(target)
+    service_ids = set(sa_inspect(target).attrs.service_id.history.deleted) | {target.service_id}
+    services.update(service_id for service_id in service_ids if service_id is not None)
+
+@event.listens_for(Service, 'after_insert')
+@event.listens_for(Service, 'after_update')
+@event.listens_for(Service, 'after_delete')
+def _service_changed(mapper, connection, target):
+    _mark_service_months(target)
+
+@event.listens_for(ServiceTask, 'after_insert')
+@event.listens_for(ServiceTask, 'after_update')
+@event.listens_for(ServiceTask, 'after_delete')
+def _service_task_changed(mapper, connection, target):
+    _mark_task_service(target)
+
+@event.listens_for(OrmSession, 'after_flush')
+def _refresh_rollups_after_flush(session, flush_context):
+    months = session.info.pop('rollup_months', set())
+    service_ids = session.info.pop('rollup_services', set())
+    if not months and not service_ids:
+        return
+    connection = session.connection()
+    service_table = Service.__table__
+    if service_ids:
+        rows = connection.execute(
+            db.select(service_table.c.user_id, service_table.c.date).where(service_table.c.id.in_(service_ids))
+        )
+        months.update((user_id, service_date.strftime('%Y-%m')) for user_id, service_date in rows)
+    refresh_monthly_rollups(connection, months)
+
+# Recalcula desde cero las filas de monthly_rollup de los (user_id, 'YYYY-MM') indicados.
+# Primero bloquea las filas (creándolas si no existen) y solo después suma: en Postgres con READ
+# COMMITTED, otra transacción que cambie el mismo mes espera al bloqueo y su suma ya ve los datos de
+# esta, así que ninguna de las dos escribe un total sin los servicios de la otra.
+def refresh_monthly_rollups(connection, months):
+    if not months:
+        return
+    _lock_rollups(connection, months)
+    service_table = Service.__table__
+    task_table = ServiceTask.__table__
+    # Un solo GROUP BY (user_id, mes) sobre el rango de fechas que cubre todos los meses, en lugar de
+    # dos consultas por mes: una importación toca cientos de meses por lote
+    bounds = [month_bounds(month_str) for _, month_str in months]
+    in_range = (
+        service_table.c.user_id.in_({user_id for user_id, _ in months}),
+        service_table.c.date >= min(first_day for first_day, _ in bounds),
+        service_table.c.date < max(next_first_day for _, next_first_day in bounds),
+    )
+    year_month = year_month_expr(service_table.c.date)
+    totals = {month: [0.0, 0, 0.0] for month in months}
+    for user_id, month_str, total_hours, service_count in connection.execute(
+        db.select(service_table.c.user_id, year_month, db.func.sum(service_table.c.worked_hours), db.func.count())
+        .where(*in_range).group_by(service_table.c.user_id, year_month)
+    ):
+        if (user_id, month_str) in totals:
+            totals[(user_id, month_str)][:2] = float(total_hours or 0.0), service_count
+    for user_id, month_str, task_hours in connection.execute(
+        db.select(service_table.c.user_id, year_month, db.func.sum(task_table.c.duration))
+        .select_from(task_table.join(service_table))
+        .where(*in_range).group_by(service_table.c.user_id, year_month)
+    ):
+        if (user_id, month_str) in totals:
+            totals[(user_id, month_str)][2] = float(task_hours or 0.0)
+    values = [{
+        'key_user_id': user_id, 'key_year_month': month_str, 'total_hours': total_hours,
+        'service_count': service_count, 'task_hours': task_hours,
+    } for (user_id, month_str), (total_hours, service_count, task_hours) in totals.items()]
+    _write_rollups(connection, values)
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# INSERT ... ON CONFLICT del motor en uso (SQLite >= 3.24 y Postgres lo admiten)
+def _rollup_insert():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(MonthlyRollup.__table__)
+
+# Crea a cero las filas que falten e incrementa data_version de todas en un solo upsert. El
+# upsert deja las filas bloqueadas hasta el final de la transacción; van en orden para que dos
+# transacciones con meses en común no se bloqueen mutuamente.
+def _lock_rollups(connection, months):
+    rollup_table = MonthlyRollup.__table__
+    now = _utcnow()
+    insert = _rollup_insert()
+    connection.execute(
+        insert.on_conflict_do_update(
+            index_elements=[rollup_table.c.user_id, rollup_table.c.year_month],
+            set_={'data_version': rollup_table.c.data_version + 1, 'updated_at': insert.excluded.updated_at},
+        ),
+        [{'user_id': user_id, 'year_month': month_str, 'total_hours': 0.0, 'service_count': 0,
+          'task_hours': 0.0, 'data_version': 1, 'updated_at': now} for user_id, month_str in sorted(months)],
+    )
+
+# Escribe los totales recalculados en las filas ya bloqueadas (un UPDATE con executemany)
+def _write_rollups(connection, values):
+    rollup_table = MonthlyRollup.__table__
+    connection.execute(
+        rollup_table.update().where(
+            rollup_table.c.user_id == db.bindparam('key_user_id'),
+            rollup_table.c.year_month == db.bindparam('key_year_month'),
+        ).values(total_hours=db.bindparam('total_hours'), service_count=db.bindparam('service_count'),
+                 task_hours=db.bindparam('task_hours')),
+        values,
+    )
+
+# Expresión 'YYYY-MM' de una columna de fecha, según el motor de base de datos
+def year_month_expr(column):
+    if db.engine.dialect.name == 'postgresql':
+        return db.func.to_char(column, 'YYYY-MM')
+    return db.func.strftime('%Y-%m', column)
+
+# Recalcula todos los totales mensuales con dos consultas GROUP BY.
+# Devuelve {(user_id, 'YYYY-MM'): (total_hours, service_count, task_hours)}
+def compute_monthly_rollups():
+    year_month = year_month_expr(Service.date)
+    expected = {}
+    for user_id, month_str, total_hours, service_count in db.session.query(
+        Service.user_id, year_month, db.func.sum(Service.worked_hours), db.func.count(Service.id)
+    ).group_by(Service.user_id, year_month):
+        expected[(user_id, month_str)] = (float(total_hours or 0.0), service_count, 0.0)
+    for user_id, month_str, task_hours in db.session.query(
+        Service.user_id, year_month, db.func.sum(ServiceTask.duration)
+    ).join(ServiceTask, ServiceTask.service_id == Service.id).group_by(Service.user_id, year_month):
+        total_hours, service_count, _ = expected[(user_id, month_str)]
+        expected[(user_id, month_str)] = (total_hours, service_count, float(task_hours or 0.0))
+    return expected
+
+# Compara monthly_rollup con los datos reales. Devuelve una lista de
+# (user_id, 'YYYY-MM', guardado, esperado); las filas vacías equivalen a un mes sin servicios.
+def verify_monthly_rollups(tolerance=1e-6):
+    expected = compute_monthly_rollups()
+    stored = {
+        (rollup.user_id, rollup.year_month): (rollup.total_hours, rollup.service_count, rollup.task_hours)
+        for rollup in MonthlyRollup.query.all()
+    }
+    empty = (0.0, 0, 0.0)
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        stored_values = stored.get(key, empty)
+        expected_values = expected.get(key, empty)
+        if (stored_values[1] != expected_values[1]
+                or abs(stored_values[0] - expected_values[0]) > tolerance
+                or abs(stored_values[2] - expected_values[2]) > tolerance):
+            drift.append((key[0], key[1], stored_values, expected_values))
+    return drift
+
+# Reconstruye monthly_rollup entera a partir de service/service_task, en una transacción.
+# Las versiones existentes se incrementan (y las filas de meses vacíos se conservan a cero) para que
+# ningún informe cacheado con una versión anterior vuelva a ser válido.
+def rebuild_monthly_rollups():
+    expected = compute_monthly_rollups()
+    previous_versions = dict(
+        ((user_id, month_str), version) for user_id, month_str, version in
+        db.session.query(MonthlyRollup.user_id, MonthlyRollup.year_month, MonthlyRollup.data_version)
+    )
+    now = _utcnow()
+    rows = []
+    for key in set(expected) | set(previous_versions):
+        total_hours, service_count, task_hours = expected.get(key, (0.0, 0, 0.0))
+        rows.append({'user_id': key[0], 'year_month': key[1], 'total_hours': total_hours,
+                     'service_count': service_count, 'task_hours': task_hours,
+                     'data_version': previous_versions.get(key, 0) + 1, 'updated_at': now})
+    MonthlyRollup.query.delete()
+    if rows:
+        db.session.execute(db.insert(MonthlyRollup), rows)
+    db.session.commit()
+    return len(expected)
+
+def overlap_message(other):
+    return (f"El servicio se solapa con otro del {other.date.strftime('%d/%m/%Y')} "
+            f"({other.entry_time.strftime('%H:%M')}-{other.exit_time.strftime('%H:%M')}).")
+
+# Lee las tareas específicas del formulario de añadir/editar servicio
+def specific_tasks_from_form():
+    specific_task_descriptions = request.form.getlist('specific_task_description[]')
+    specific_task_durations = request.form.getlist('specific_task_duration[]')
+
+    specific_tasks_list = []
+    for desc, dur in zip(specific_task_descriptions, specific_task_durations):
+        if desc and dur: # Only add if both description and duration are provided
+            try:
+                duration_float = float(dur)
+                if duration_float > 0:
+                    specific_tasks_list.append({"description": desc.strip(), "duration": duration_float})
+            except ValueError:
+                flash(f'Duración inválida para la tarea "{desc}". Debe ser un número.', 'warning')
+                # Continue to process other tasks, but inform user
+    return specific_tasks_list
+
+# Guarda las tareas en la tabla service_task y mantiene la copia JSON en specific_tasks
+def set_service_tasks(service, specific_tasks_list):
+    service.tasks = [ServiceTask(description=task['description'], duration=task['duration'])
+                     for task in specific_tasks_list]
+    service.specific_tasks = json.dumps(specific_tasks_list) if specific_tasks_list else None
+
+# Tareas de un servicio para el formulario de edición. Los servicios que aún no se han migrado
+# con backfill_service_tasks.py solo tienen la copia JSON.
+def service_tasks_as_dicts(service):
+    if service.tasks:
+        return [{"description": task.description, "duration": task.duration} for task in service.tasks]
+    if service.specific_tasks:
+        return json.loads(service.specific_tasks)
+    return []
 
 # Decorator to redirect authenticated users from login/register
 def redirect_authenticated(f):
@@ -102,51 +572,155 @@ def redirect_authenticated(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# --- Mes en la URL ---
+# Las páginas del mes viven en /month/AAAA-MM y /tasks/AAAA-MM (y sus descargas debajo). El mes de
+# la sesión solo se usa como valor por defecto para las URLs sin mes (/, /tasks_summary...).
+
+class MonthConverter(BaseConverter):
+    regex = r'\d{4}-(?:0[1-9]|1[0-2])'
+
+app.url_map.converters['month'] = MonthConverter
+
+MONTH_RE = re.compile(MonthConverter.regex + '$')
+
+class YearConverter(BaseConverter):
+    regex = r'[12]\d{3}'
+
+    def to_python(self, value):
+        return int(value)
+
+app.url_map.converters['year'] = YearConverter
+
+def selected_month(session_key, month=None):
+    if month is None:
+        return session.get(session_key, datetime.now().strftime('%Y-%m'))
+    if session.get(session_key) != month:
+        session[session_key] = month # Solo se escribe si cambia, para no reenviar la cookie en cada visita
+    return month
+
+# Archivos estáticos con el hash del contenido en el nombre (los genera build_assets.py):
+# nombre lógico -> nombre real. Sin manifest.json asset_url() enlaza el nombre lógico.
+try:
+    with open(os.path.join(app.static_folder, 'manifest.json'), encoding='utf-8') as manifest_file:
+        STATIC_MANIFEST = json.load(manifest_file)
+except FileNotFoundError:
+    STATIC_MANIFEST = {}
+FINGERPRINTED_STATIC = frozenset(STATIC_MANIFEST.values())
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+@app.template_global()
+def asset_url(name):
+    return url_for('static', filename=STATIC_MANIFEST.get(name, name))
+
+# Un archivo con hash no cambia nunca (otro contenido es otro nombre): el navegador y los proxies
+# pueden guardarlo un año sin revalidar
+@app.after_request
+def cache_fingerprinted_static(response):
+    if request.endpoint == 'static' and request.view_args.get('filename') in FINGERPRINTED_STATIC:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+# Las plantillas forman parte del ETag de las páginas: al desplegar plantillas nuevas cambian todos.
+# Es un hash del contenido (no de las fechas de modificación, que cambian con cada checkout), así
+# que todos los hosts con las mismas plantillas dan el mismo ETag y los 304 siguen funcionando.
+# El manifiesto también entra, porque las páginas enlazan el CSS por su nombre con hash.
+def _templates_version(directory):
+    digest = hashlib.sha256()
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, directory).encode('utf-8') + b'\0')
+            with open(path, 'rb') as template:
+                digest.update(template.read())
+    return digest.hexdigest()[:16]
+
+TEMPLATES_DIR = os.path.join(app.root_path, app.template_folder)
+TEMPLATES_VERSION = _templates_version(TEMPLATES_DIR) + ':' + ','.join(sorted(FINGERPRINTED_STATIC))
+
+# Compila todas las plantillas por adelantado (gunicorn.conf.py lo llama en el proceso maestro antes
+# de crear los workers), para que la primera petición de cada página no pague la compilación
+def warm_templates():
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+# Respuesta de una página del mes con ETag: cambia con data_version del mes (cualquier alta,
+# edición o borrado la incrementa), con el usuario y con las plantillas. Si hay mensajes flash
+# pendientes la página no se cachea: el 304 volvería a mostrar el mensaje de la versión guardada.
+def month_page_response(page, month_str, render):
+    totals = month_totals(current_user.id, month_str)
+    return cached_page_response(('page', page, current_user.id, current_user.username, month_str,
+                                 totals.data_version, TEMPLATES_VERSION), lambda: render(totals))
+
+# render() solo se llama si el navegador no tiene ya la versión con ese ETag
+def cached_page_response(etag_parts, render):
+    if '_flashes' in session:
+        response = make_response(render())
+        response.cache_control.no_store = True
+        return response
+    etag = ReportCache.key(*etag_parts)
+    if request.if_none_match.contains_weak(etag): # Débil: con compresión el ETag se envía como W/"..."
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True # El navegador guarda la página pero revalida con el ETag
+    return response
+
+# Pico de inicios de sesión: hay más hashes de contraseña esperando de los que permite el límite
+@app.errorhandler(PasswordBusyError)
+def password_busy(error):
+    flash('Hay muchos inicios de sesión en este momento. Inténtalo de nuevo en unos segundos.', 'warning')
+    if request.endpoint == 'login':
+        response = make_response(render_template('login.html'), 503)
+    else:
+        response = redirect(request.referrer or url_for('index'))
+    response.headers['Retry-After'] = '5'
+    return response
+
 # --- Routes ---
 
 @app.route("/")
 @app.route("/index")
+@app.route("/month/<month:month>")
 @login_required
-def index():
-    current_month_str = session.get('current_month', datetime.now().strftime('%Y-%m'))
-    year, month = map(int, current_month_str.split('-'))
-
-    # Filter services by month and year for the current user
-    services_query = Service.query.filter_by(user_id=current_user.id).filter(
-        db.extract('year', Service.date) == year,
-        db.extract('month', Service.date) == month
-    )
+def index(month=None):
+    current_month_str = selected_month('current_month', month)
 
+    # Las filas no se renderizan aquí: la tabla las pide por páginas a /api/services (o a
+    # /api/services/search, que busca en todo el historial). El total sale de monthly_rollup o,
+    # con búsqueda, de un SUM sobre los servicios encontrados.
     search_query = request.args.get('search')
-    if search_query:
-        services_query = services_query.filter(
-            (Service.place.ilike(f'%{search_query}%')) |
-            (Service.observations.ilike(f'%{search_query}%'))
-        )
 
-    services = services_query.order_by(Service.date.asc(), Service.entry_time.asc()).all()
-
-    total_hours = sum(service.worked_hours for service in services)
-    total_hours_display = f"{total_hours:.2f} horas"
-
-    spanish_month_names = [
-        "enero", "febrero", "marzo", "abril", "mayo", "junio",
-        "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
-    ]
+    def render(total_hours):
+        spanish_month_names = [
+            "enero", "febrero", "marzo", "abril", "mayo", "junio",
+            "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+        ]
+        return render_template('index.html',
+                               search_query=search_query,
+                               total_hours_display=f"{total_hours:.2f} horas",
+                               current_month=current_month_str,
+                               spanish_month_names=spanish_month_names,
+                               current_username=current_user.username)
 
-    return render_template('index.html',
-                           services=services,
-                           total_hours_display=total_hours_display,
-                           current_month=current_month_str,
-                           spanish_month_names=spanish_month_names,
-                           current_username=current_user.username)
+    if search_query:
+        return render(db.session.query(db.func.coalesce(db.func.sum(Service.worked_hours), 0.0)).filter(
+            service_text_filter(current_user.id, search_query)
+        ).scalar())
+    return month_page_response('index', current_month_str, lambda totals: render(totals.total_hours))
 
+# Formulario de mes sin JavaScript; con JavaScript la plantilla navega directamente a /month/AAAA-MM
 @app.route("/load_month", methods=['POST'])
 @login_required
 def load_month():
-    selected_month = request.form.get('selected_month')
-    if selected_month:
-        session['current_month'] = selected_month
+    month = request.form.get('selected_month', '')
+    if MONTH_RE.match(month):
+        return redirect(url_for('index', month=month))
     return redirect(url_for('index'))
 
 @app.route("/add_service", methods=['GET', 'POST'])
@@ -170,22 +744,7 @@ def add_service():
             return redirect(url_for('add_service'))
 
         # Handle specific tasks
-        specific_task_descriptions = request.form.getlist('specific_task_description[]')
-        specific_task_durations = request.form.getlist('specific_task_duration[]')
-        
-        specific_tasks_list = []
-        for desc, dur in zip(specific_task_descriptions, specific_task_durations):
-            if desc and dur: # Only add if both description and duration are provided
-                try:
-                    duration_float = float(dur)
-                    if duration_float > 0:
-                        specific_tasks_list.append({"description": desc.strip(), "duration": duration_float})
-                except ValueError:
-                    flash(f'Duración inválida para la tarea "{desc}". Debe ser un número.', 'warning')
-                    # Continue to process other tasks, but inform user
-        
-        # Convert list of dicts to JSON string
-        specific_tasks_json = json.dumps(specific_tasks_list) if specific_tasks_list else None
+        specific_tasks_list = specific_tasks_from_form()
 
         try:
             new_service = Service(
@@ -196,9 +755,14 @@ def add_service():
                 exit_time=datetime.strptime(exit_time_str, '%H:%M').time(),
                 worked_hours=worked_hours,
                 observations=observations,
-                user_id=current_user.id,
-                specific_tasks=specific_tasks_json # Save the JSON string
+                user_id=current_user.id
             )
+            overlapping = find_overlapping_service(current_user.id, new_service.date,
+                                                   new_service.entry_time, new_service.exit_time)
+            if overlapping:
+                flash(overlap_message(overlapping), 'danger')
+                return redirect(url_for('add_service'))
+            set_service_tasks(new_service, specific_tasks_list)
             db.session.add(new_service)
             db.session.commit()
             flash('Servicio añadido exitosamente!', 'success')
@@ -224,6 +788,79 @@ def add_service():
                            current_username=current_user.username)
 
 
+# Turnos fijos (p. ej. de lunes a viernes en el mismo lugar): genera todos los servicios del rango
+# de una vez con create_recurring_services
+@app.route("/add_recurring", methods=['GET', 'POST'])
+@login_required
+def add_recurring():
+    if request.method == 'POST':
+        place = request.form.get('place', '').strip()
+        observations = request.form.get('observations', '').strip() or None
+        try:
+            start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
+            entry_time = datetime.strptime(request.form['entry_time'], '%H:%M').time()
+            exit_time = datetime.strptime(request.form['exit_time'], '%H:%M').time()
+            break_duration = int(request.form.get('break_duration') or 0)
+            weekdays = {int(day) for day in request.form.getlist('weekdays')} & set(range(7))
+        except (KeyError, ValueError):
+            flash('Fechas u horas inválidas. Usa AAAA-MM-DD y HH:MM.', 'danger')
+            return redirect(url_for('add_recurring'))
+
+        if not place or len(place) > 100:
+            flash('Indica un lugar (máximo 100 caracteres).', 'danger')
+        elif not weekdays:
+            flash('Elige al menos un día de la semana.', 'danger')
+        elif end_date < start_date:
+            flash('La fecha final no puede ser anterior a la inicial.', 'danger')
+        elif (end_date - start_date).days >= RECURRING_MAX_DAYS:
+            flash(f'El rango no puede superar {RECURRING_MAX_DAYS} días.', 'danger')
+        elif break_duration < 0:
+            flash('El descanso no puede ser negativo.', 'danger')
+        else:
+            result = create_recurring_services(current_user.id, start_date, end_date, weekdays, place,
+                                               entry_time, exit_time, break_duration, observations,
+                                               specific_tasks_from_form())
+            flash(f"{result['created']} servicios añadidos.", 'success' if result['created'] else 'warning')
+            skipped = [('ya existían', result['duplicates']), ('se solapan con otro servicio', result['overlaps'])]
+            for reason, days in skipped:
+                if days:
+                    shown = ', '.join(day.strftime('%d/%m/%Y') for day in days[:10])
+                    more = f' y {len(days) - 10} más' if len(days) > 10 else ''
+                    flash(f'Saltados {len(days)} días que {reason}: {shown}{more}.', 'warning')
+            return redirect(url_for('index', month=start_date.strftime('%Y-%m')))
+        return redirect(url_for('add_recurring'))
+
+    today = datetime.now().date()
+    return render_template('recurring.html', weekday_names=WEEKDAY_NAMES,
+                           default_start=today.strftime('%Y-%m-%d'),
+                           default_end=(today + timedelta(days=27)).strftime('%Y-%m-%d'))
+
+# Importación masiva de servicios desde CSV o JSON Lines (ver import_services). Werkzeug guarda
+# las subidas grandes en un archivo temporal, así que el archivo se lee por líneas sin cargarlo entero.
+@app.route("/import", methods=['GET', 'POST'])
+@login_required
+def import_services_view():
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Selecciona un archivo CSV o JSON Lines.', 'danger')
+            return redirect(url_for('import_services_view'))
+        file_format = request.form.get('format') or detect_format(upload.filename)
+        if file_format not in ('csv', 'jsonl'):
+            file_format = detect_format(upload.filename)
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            report = import_services(current_user.id, stream, file_format,
+                                     dry_run=request.form.get('dry_run') == '1')
+        except UnicodeDecodeError:
+            db.session.rollback()
+            flash('El archivo no está en UTF-8. Guárdalo como CSV UTF-8 e inténtalo de nuevo.', 'danger')
+            return redirect(url_for('import_services_view'))
+        report['dry_run'] = request.form.get('dry_run') == '1'
+    return render_template('import.html', report=report)
+
 @app.route("/edit_service/<int:service_id>", methods=['GET', 'POST'])
 @login_required
 def edit_service(service_id):
@@ -253,25 +890,16 @@ def edit_service(service_id):
             flash('La hora de salida no puede ser anterior a la hora de entrada, considerando el descanso.', 'danger')
             return redirect(url_for('edit_service', service_id=service.id))
         
+        overlapping = find_overlapping_service(current_user.id, service.date, service.entry_time,
+                                               service.exit_time, exclude_id=service.id)
+        if overlapping:
+            flash(overlap_message(overlapping), 'danger')
+            return redirect(url_for('edit_service', service_id=service.id))
+
         service.worked_hours = worked_hours
 
         # Handle specific tasks for editing
-        specific_task_descriptions = request.form.getlist('specific_task_description[]')
-        specific_task_durations = request.form.getlist('specific_task_duration[]')
-        
-        specific_tasks_list = []
-        for desc, dur in zip(specific_task_descriptions, specific_task_durations):
-            if desc and dur: # Only add if both description and duration are provided
-                try:
-                    duration_float = float(dur)
-                    if duration_float > 0:
-                        specific_tasks_list.append({"description": desc.strip(), "duration": duration_float})
-                except ValueError:
-                    flash(f'Duración inválida para la tarea "{desc}". Debe ser un número.', 'warning')
-                    # Continue to process other tasks, but inform user
-        
-        service.specific_tasks = json.dumps(specific_tasks_list) if specific_tasks_list else None
-
+        set_service_tasks(service, specific_tasks_from_form())
 
         try:
             db.session.commit()
@@ -284,9 +912,9 @@ def edit_service(service_id):
 
     # For GET request, parse existing specific tasks
     existing_specific_tasks = []
-    if service.specific_tasks:
+    if service.tasks or service.specific_tasks:
         try:
-            existing_specific_tasks = json.loads(service.specific_tasks)
+            existing_specific_tasks = service_tasks_as_dicts(service)
         except json.JSONDecodeError:
             flash('Error al cargar tareas específicas existentes.', 'warning')
             existing_specific_tasks = []
@@ -366,6 +994,10 @@ def login():
         password = request.form['password']
         user = User.query.filter_by(username=username).first()
         if user and user.check_password(password):
+            if user.password_needs_rehash():
+                # Es el único momento en que tenemos la contraseña en claro para actualizar el hash
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
             flash('Inicio de sesión exitoso!', 'success')
             # Set default month in session for the logged-in user
@@ -389,16 +1021,17 @@ def logout():
 @login_required
 def profile():
     if request.method == 'POST':
+        user = db.session.get(User, current_user.id) # current_user es un snapshot de solo lectura
         new_username = request.form['username']
         new_password = request.form.get('new_password') # Usar .get para que no falle si no se envía
 
         # Lógica para actualizar nombre de usuario
-        if new_username != current_user.username:
+        if new_username != user.username:
             existing_user = User.query.filter_by(username=new_username).first()
-            if existing_user and existing_user.id != current_user.id:
+            if existing_user and existing_user.id != user.id:
                 flash('Este nombre de usuario ya está en uso.', 'danger')
                 return redirect(url_for('profile'))
-            current_user.username = new_username
+            user.username = new_username
             flash('Nombre de usuario actualizado!', 'success')
         
         # Lógica para cambiar contraseña
@@ -406,18 +1039,19 @@ def profile():
             current_password = request.form.get('current_password')
             confirm_new_password = request.form.get('confirm_new_password')
 
-            if not current_user.check_password(current_password):
+            if not user.check_password(current_password):
                 flash('La contraseña actual es incorrecta.', 'danger')
             elif len(new_password) < 6:
                 flash('La nueva contraseña debe tener al menos 6 caracteres.', 'danger')
             elif new_password != confirm_new_password:
                 flash('Las contraseñas no coinciden.', 'danger')
             else:
-                current_user.set_password(new_password)
+                user.set_password(new_password)
                 flash('Contraseña actualizada!', 'success')
         
         try:
             db.session.commit()
+            user_cache.invalidate(user.id)
             # No es necesario flashear "Perfil actualizado exitosamente!" aquí si ya flasheamos los mensajes específicos
         except Exception as e:
             db.session.rollback()
@@ -478,314 +1112,875 @@ def reset_password(token):
     return render_template('reset_password.html', token=token)
 
 
+CSV_CHUNK_SIZE = 64 * 1024 # Bytes de CSV que se acumulan antes de enviar un bloque
+CSV_YIELD_PER = 1000 # Filas que se leen de la base de datos en cada vuelta
+
+# Columnas de Service en el orden que espera csv_export.services_csv_row()
+def csv_report_columns():
+    return [getattr(Service, name) for name in CSV_COLUMNS]
+
+# Filas del CSV de un mes como tuplas simples (para export_reports.py)
+def csv_report_rows(user_id, month_str):
+    return [tuple(row) for row in db.session.execute(
+        db.select(*csv_report_columns())
+        .where(*service_month_filter(user_id, month_str))
+        .order_by(Service.date.asc(), Service.entry_time.asc())
+    )]
+
+# Genera el CSV de los servicios de un usuario en [first_day, end_day) por bloques.
+# Lee columnas sueltas (no objetos ORM) con yield_per, que en Postgres usa un cursor del
+# servidor, así que la memoria no depende del número de filas exportadas.
+def generate_services_csv(user_id, first_day, end_day, compress=False):
+    query = db.select(*csv_report_columns()).where(
+        Service.user_id == user_id,
+        Service.date >= first_day,
+        Service.date < end_day
+    ).order_by(Service.date.asc(), Service.entry_time.asc()).execution_options(yield_per=CSV_YIELD_PER)
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None # wbits=31 -> formato gzip
+    chunk = CsvChunk()
+    writer = csv.writer(chunk, lineterminator='\n')
+
+    def encode(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(CSV_HEADER)
+    for row in db.session.execute(query):
+        writer.writerow(services_csv_row(row))
+        if chunk.size >= CSV_CHUNK_SIZE:
+            data = encode(chunk.take())
+            if data:
+                yield data
+    data = encode(chunk.take())
+    if compressor:
+        data += compressor.flush()
+    if data:
+        yield data
+
+# Exporta el mes actual o, con ?start=YYYY-MM-DD&end=YYYY-MM-DD (ambos incluidos), cualquier rango
+# de fechas. Con ?gzip=1 el archivo se descarga comprimido (.csv.gz).
 @app.route("/export_csv")
+@app.route("/month/<month:month>/csv")
 @login_required
-def export_csv():
-    current_month_str = session.get('current_month', datetime.now().strftime('%Y-%m'))
-    year, month = map(int, current_month_str.split('-'))
-
-    services = Service.query.filter_by(user_id=current_user.id).filter(
-        db.extract('year', Service.date) == year,
-        db.extract('month', Service.date) == month
-    ).order_by(Service.date.asc(), Service.entry_time.asc()).all()
-
-    si = BytesIO()
-    # Write CSV header
-    si.write(b'Fecha,Lugar,Entrada,Descanso (min),Salida,Horas Trabajadas,Observaciones,Tareas Especificas\n')
-
-    for service in services:
-        # Prepare specific tasks for CSV
-        specific_tasks_csv = ""
-        if service.specific_tasks:
-            try:
-                tasks = json.loads(service.specific_tasks)
-                task_strings = []
-                for task in tasks:
-                    task_strings.append(f"{task.get('description', 'N/A')} ({task.get('duration', 0):.2f}h)")
-                specific_tasks_csv = "; ".join(task_strings)
-            except json.JSONDecodeError:
-                specific_tasks_csv = "Error al cargar tareas"
-
-        line = f"{service.date.strftime('%d/%m/%Y')}," \
-               f"{service.place}," \
-               f"{service.entry_time.strftime('%H:%M')}," \
-               f"{service.break_duration}," \
-               f"{service.exit_time.strftime('%H:%M')}," \
-               f"{service.worked_hours:.2f}," \
-               f"\"{service.observations if service.observations else ''}\"," \
-               f"\"{specific_tasks_csv}\"\n" # Enclose observations and specific tasks in quotes
-        si.write(line.encode('utf-8'))
-    
-    si.seek(0)
-    return send_file(si,
-                     mimetype='text/csv',
-                     as_attachment=True,
-                     download_name=f'servicios_{current_month_str}.csv')
+def export_csv(month=None):
+    current_month_str = selected_month('current_month', month)
+    start_str = request.args.get('start')
+    end_str = request.args.get('end')
 
-@app.route("/download_pdf")
-@login_required
-def download_pdf():
-    current_month_str = session.get('current_month', datetime.now().strftime('%Y-%m'))
-    year, month = map(int, current_month_str.split('-'))
+    if start_str or end_str:
+        try:
+            first_day = datetime.strptime(start_str, '%Y-%m-%d').date()
+            last_day = datetime.strptime(end_str, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            flash('Rango de fechas inválido. Usa el formato AAAA-MM-DD para inicio y fin.', 'danger')
+            return redirect(url_for('index'))
+        if last_day < first_day:
+            flash('La fecha de fin no puede ser anterior a la de inicio.', 'danger')
+            return redirect(url_for('index'))
+        end_day = last_day + timedelta(days=1)
+        download_name = f'servicios_{first_day.isoformat()}_{last_day.isoformat()}.csv'
+    else:
+        first_day, end_day = month_bounds(current_month_str)
+        download_name = f'servicios_{current_month_str}.csv'
 
-    services = Service.query.filter_by(user_id=current_user.id).filter(
-        db.extract('year', Service.date) == year,
-        db.extract('month', Service.date) == month
-    ).order_by(Service.date.asc(), Service.entry_time.asc()).all()
+    compress = request.args.get('gzip') in ('1', 'true', 'on')
+    if compress:
+        download_name += '.gz'
 
-    total_hours = sum(service.worked_hours for service in services)
+    response = Response(
+        stream_with_context(generate_services_csv(current_user.id, first_day, end_day, compress=compress)),
+        mimetype='application/gzip' if compress else 'text/csv'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    return response
+
+# Datos de cada informe como tuplas simples, para poder enviarlos a otro proceso
+def services_report_rows(user_id, month_str):
+    return [tuple(row) for row in db.session.execute(
+        db.select(Service.date, Service.place, Service.entry_time, Service.break_duration,
+                  Service.exit_time, Service.worked_hours, Service.observations)
+        .where(*service_month_filter(user_id, month_str))
+        .order_by(Service.date.asc(), Service.entry_time.asc())
+    )]
+
+def tasks_report_rows(user_id, month_str):
+    return [tuple(row) for row in db.session.execute(
+        db.select(Service.date, ServiceTask.description, ServiceTask.duration)
+        .join(ServiceTask, ServiceTask.service_id == Service.id)
+        .where(*service_month_filter(user_id, month_str))
+        .order_by(Service.date.asc(), Service.entry_time.asc(), ServiceTask.id.asc()) # Order by date to group tasks by day
+    )]
+
+# Argumentos de reports.build_report() para un informe del mes
+def report_args(report_type, user_id, username, month_str, totals):
+    if report_type == 'services':
+        return (services_report_rows(user_id, month_str), username, month_str, totals.total_hours)
+    return (tasks_report_rows(user_id, month_str), username, month_str, totals.task_hours)
+
+REPORT_DOWNLOAD_NAMES = {
+    'services': 'resumen_servicios_{month}.pdf',
+    'tasks': 'reporte_tareas_especificas_{month}.pdf',
+}
+
+# Versión del renderizador: hash del código de reports.py más la versión de ReportLab. Se calcula
+# sin importar reports (ReportLab se carga con el primer PDF), y cualquier cambio de maquetación
+# deja atrás los PDF cacheados sin acordarse de subir ningún número.
+def _report_renderer_version():
+    with open(os.path.join(app.root_path, 'reports.py'), 'rb') as source:
+        digest = hashlib.sha256(source.read()).hexdigest()[:12]
+    try:
+        return f"{digest}:{importlib.metadata.version('reportlab')}"
+    except importlib.metadata.PackageNotFoundError:
+        return digest
+
+REPORT_RENDERER_VERSION = _report_renderer_version()
+
+# La clave incluye la data_version del mes y la versión del renderizador, así que también sirve como ETag
+def report_cache_key(user_id, username, month_str, report_type, totals):
+    return report_cache.key(user_id, username, month_str, report_type, totals.data_version, REPORT_RENDERER_VERSION)
+
+def pdf_response(pdf_bytes, cache_key, download_name, last_modified):
+    response = send_file(BytesIO(pdf_bytes),
+                         mimetype='application/pdf',
+                         as_attachment=True,
+                         download_name=download_name,
+                         last_modified=last_modified)
+    response.set_etag(cache_key)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True # El navegador guarda el PDF pero revalida con el ETag
+    return response
+
+# Envía un informe PDF del mes usando la caché de informes. Si el navegador ya tiene esa versión
+# (If-None-Match) responde 304 sin tocar la caché, y el PDF solo se genera cuando no está en disco.
+def send_report(report_type, month_str):
+    totals = month_totals(current_user.id, month_str)
+    cache_key = report_cache_key(current_user.id, current_user.username, month_str, report_type, totals)
+
+    if cache_key in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(cache_key)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    pdf_bytes = report_cache.get(cache_key)
+    if pdf_bytes is None:
+        args = report_args(report_type, current_user.id, current_user.username, month_str, totals)
+        import reports # ReportLab solo se carga con el primer PDF (gunicorn.conf.py lo precarga)
+        with timed('pdf'):
+            pdf_bytes = pdf_pool.run(reports.build_report, report_type, *args)
+        report_cache.put(cache_key, pdf_bytes)
+    return pdf_response(pdf_bytes, cache_key, REPORT_DOWNLOAD_NAMES[report_type].format(month=month_str),
+                        totals.updated_at)
 
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4)) # Changed to landscape A4
-    styles = getSampleStyleSheet()
-    
-    # Custom style for table cells to handle long text
-    # Corrected: Use TA_CENTER, TA_LEFT from reportlab.lib.enums
-    styles.add(ParagraphStyle(name='TableContentCenter', fontSize=7, leading=9, alignment=TA_CENTER))
-    styles.add(ParagraphStyle(name='TableContentLeft', fontSize=7, leading=9, alignment=TA_LEFT))
-
-    story = []
-
-    # Title
-    month_name = [
-        "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-        "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-    ][month - 1]
-    title_text = f"Reporte de Horas Trabajadas para el mes de {month_name} {year}"
-    story.append(Paragraph(title_text, styles['h1']))
-    story.append(Spacer(1, 0.2 * inch))
-
-    # User Info
-    story.append(Paragraph(f"Usuario: <b>{current_user.username}</b>", styles['Normal']))
-    story.append(Spacer(1, 0.1 * inch))
-
-    # Table Data
-    # Removed 'Tareas Específicas' column
-    data = [['Fecha', 'Lugar', 'Entrada', 'Descanso (min)', 'Salida', 'Horas', 'Observaciones']]
-    for service in services:
-        # Using Paragraph for observations to allow word wrapping
-        obs_paragraph = Paragraph(service.observations if service.observations else '', styles['TableContentLeft'])
-
-        data.append([
-            Paragraph(service.date.strftime('%d/%m/%Y'), styles['TableContentCenter']), # Use TableContentCenter
-            Paragraph(service.place, styles['TableContentLeft']),
-            Paragraph(service.entry_time.strftime('%H:%M'), styles['TableContentCenter']), # Use TableContentCenter
-            Paragraph(str(service.break_duration), styles['TableContentCenter']), # Use TableContentCenter
-            Paragraph(service.exit_time.strftime('%H:%M'), styles['TableContentCenter']), # Use TableContentCenter
-            Paragraph(f"{service.worked_hours:.2f}", styles['TableContentCenter']), # Use TableContentCenter
-            obs_paragraph # Use the Paragraph object
-        ])
-
-    # Define column widths for landscape A4 (297mm width)
-    # Total width of page is ~11.69 inches. Let's use 10.5 inches for table width (756 points)
-    # Distribute 10.5 inches among 7 columns
-    # Fecha, Lugar, Entrada, Descanso, Salida, Horas, Observaciones
-    # Weights: 1.0, 1.5, 1.0, 1.0, 1.0, 1.0, 3.0 (approximate proportions)
-    # Total weight = 9.5
-    # Let's define fixed widths in points for better control, summing up to a bit less than page width
-    # A4 landscape width = 841.89 points. Let's aim for ~780 points total width.
-    col_widths_pts = [
-        60,  # Fecha (approx 21mm)
-        120, # Lugar (approx 42mm)
-        60,  # Entrada (approx 21mm)
-        60,  # Descanso (approx 21mm)
-        60,  # Salida (approx 21mm)
-        60,  # Horas (approx 21mm)
-        360  # Observaciones (approx 127mm - much wider for wrapping)
-    ]
-    
-    table = Table(data, colWidths=col_widths_pts)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4CAF50')), # Header background
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke), # Header text color
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'), # Header alignment
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f2f2f2')), # Even rows background
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black), # Thinner grid lines
-        ('BOX', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('FONTSIZE', (0,0), (-1,-1), 7), # Smaller font for table content
-        # Specific column alignments for data rows
-        ('ALIGN', (0,1), (0,-1), 'CENTER'), # Fecha data
-        ('ALIGN', (1,1), (1,-1), 'LEFT'),   # Lugar data
-        ('ALIGN', (2,1), (5,-1), 'CENTER'), # Entrada, Descanso, Salida, Horas data
-        ('ALIGN', (6,1), (6,-1), 'LEFT'),   # Observaciones data
-    ]))
-    story.append(table)
-    story.append(Spacer(1, 0.2 * inch))
-
-    # Total Hours
-    story.append(Paragraph(f"<b>Total de Horas Trabajadas: {total_hours:.2f}</b>", styles['h2']))
-
-    doc.build(story)
-    buffer.seek(0)
-
-    return send_file(buffer,
-                     mimetype='application/pdf',
-                     as_attachment=True,
-                     download_name=f'resumen_servicios_{current_month_str}.pdf')
+@app.route("/download_pdf")
+@app.route("/month/<month:month>/pdf")
+@login_required
+def download_pdf(month=None):
+    current_month_str = selected_month('current_month', month)
+
+    return send_report('services', current_month_str)
 
 
 # Tareas Específicas (Summary)
 @app.route("/tasks_summary")
+@app.route("/tasks/<month:month>")
 @login_required
-def tasks_summary():
-    current_tasks_month_str = session.get('current_tasks_month', datetime.now().strftime('%Y-%m'))
-    year, month = map(int, current_tasks_month_str.split('-'))
-
-    services = Service.query.filter_by(user_id=current_user.id).filter(
-        db.extract('year', Service.date) == year,
-        db.extract('month', Service.date) == month
-    ).all()
-
-    tasks_summary_data = defaultdict(float)
-    for service in services:
-        if service.specific_tasks:
-            try:
-                specific_tasks = json.loads(service.specific_tasks)
-                for task in specific_tasks:
-                    description = task.get('description')
-                    duration = task.get('duration')
-                    if description and isinstance(duration, (int, float)):
-                        tasks_summary_data[description] += duration
-            except json.JSONDecodeError:
-                # Handle cases where specific_tasks might be malformed JSON
-                print(f"Warning: Could not decode specific_tasks for service ID {service.id}: {service.specific_tasks}")
-                flash(f"Advertencia: Error al leer tareas específicas para el servicio del {service.date}. Contacta con soporte si persiste.", 'warning')
+def tasks_summary(month=None):
+    current_tasks_month_str = selected_month('current_tasks_month', month)
+
+    def render(totals):
+        # Una sola consulta agregada: la suma por tarea la hace la base de datos
+        tasks_summary_rows = db.session.query(
+            ServiceTask.description, db.func.sum(ServiceTask.duration)
+        ).join(Service).filter(
+            *service_month_filter(current_user.id, current_tasks_month_str)
+        ).group_by(ServiceTask.description).order_by(ServiceTask.description).all()
+        tasks_summary_data = {description: total for description, total in tasks_summary_rows}
+
+        spanish_month_names = [
+            "enero", "febrero", "marzo", "abril", "mayo", "junio",
+            "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+        ]
 
-    spanish_month_names = [
-        "enero", "febrero", "marzo", "abril", "mayo", "junio",
-        "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
-    ]
+        return render_template('tasks.html',
+                               tasks_summary=tasks_summary_data,
+                               current_month=current_tasks_month_str,
+                               spanish_month_names=spanish_month_names,
+                               current_username=current_user.username)
 
-    return render_template('tasks.html',
-                           tasks_summary=tasks_summary_data,
-                           current_month=current_tasks_month_str,
-                           spanish_month_names=spanish_month_names,
-                           current_username=current_user.username)
+    # Con un 304 ni siquiera se ejecuta la consulta agregada
+    return month_page_response('tasks', current_tasks_month_str, render)
 
 @app.route("/load_tasks_month", methods=['POST'])
 @login_required
 def load_tasks_month():
-    selected_month = request.form.get('selected_month')
-    if selected_month:
-        session['current_tasks_month'] = selected_month
+    month = request.form.get('selected_month', '')
+    if MONTH_RE.match(month):
+        return redirect(url_for('tasks_summary', month=month))
     return redirect(url_for('tasks_summary'))
 
 @app.route("/generate_tasks_pdf")
+@app.route("/tasks/<month:month>/pdf")
 @login_required
-def generate_tasks_pdf():
-    current_tasks_month_str = session.get('current_tasks_month', datetime.now().strftime('%Y-%m'))
-    year, month = map(int, current_tasks_month_str.split('-'))
+def generate_tasks_pdf(month=None):
+    current_tasks_month_str = selected_month('current_tasks_month', month)
+
+    return send_report('tasks', current_tasks_month_str)
+
+# --- Resumen anual ---
+# Todo sale de agregados: los doce meses de monthly_rollup y tres GROUP BY sobre el año (por lugar,
+# por tarea y por día) que usan ix_service_user_date_entry. No se carga ningún objeto Service.
+YEAR_TOP_TASKS = 10
+HEATMAP_THRESHOLDS = (0, 4, 8, 10) # Horas del día: hasta 4 -> nivel 1, hasta 8 -> 2, hasta 10 -> 3, más -> 4
+
+def year_rollups(user_id, year):
+    return db.session.query(
+        MonthlyRollup.year_month, MonthlyRollup.total_hours, MonthlyRollup.service_count,
+        MonthlyRollup.task_hours, MonthlyRollup.data_version
+    ).filter(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.year_month >= f'{year}-01',
+        MonthlyRollup.year_month <= f'{year}-12'
+    ).all()
 
-    services = Service.query.filter_by(user_id=current_user.id).filter(
-        db.extract('year', Service.date) == year,
-        db.extract('month', Service.date) == month
-    ).order_by(Service.date.asc()).all() # Order by date to group tasks by day
+# Semanas (de lunes a domingo) del año con (día, horas, nivel) por celda; None fuera del año
+def year_heatmap(year, daily_hours):
+    day = date(year, 1, 1)
+    day -= timedelta(days=day.weekday())
+    weeks = []
+    while day.year <= year:
+        week = []
+        for _ in range(7):
+            if day.year == year:
+                hours = daily_hours.get(day, 0.0)
+                week.append((day, hours, sum(hours > bound for bound in HEATMAP_THRESHOLDS)))
+            else:
+                week.append(None)
+            day += timedelta(days=1)
+        weeks.append(week)
+    return weeks
+
+def year_summary(user_id, year, rollups):
+    in_year = (Service.user_id == user_id, Service.date >= date(year, 1, 1), Service.date < date(year + 1, 1, 1))
+    months = [{'month': f'{year}-{number:02d}', 'hours': 0.0, 'services': 0, 'task_hours': 0.0}
+              for number in range(1, 13)]
+    for year_month, total_hours, service_count, task_hours, _ in rollups:
+        months[int(year_month[5:]) - 1].update(hours=total_hours, services=service_count, task_hours=task_hours)
+
+    place_hours = db.func.sum(Service.worked_hours)
+    places = db.session.query(Service.place, place_hours, db.func.count(Service.id)).filter(
+        *in_year
+    ).group_by(Service.place).order_by(place_hours.desc(), Service.place).all()
+    task_hours = db.func.sum(ServiceTask.duration)
+    tasks = db.session.query(ServiceTask.description, task_hours, db.func.count(ServiceTask.id)).join(Service).filter(
+        *in_year
+    ).group_by(ServiceTask.description).order_by(task_hours.desc(), ServiceTask.description).limit(YEAR_TOP_TASKS).all()
+    daily_hours = dict(db.session.query(Service.date, db.func.sum(Service.worked_hours)).filter(
+        *in_year
+    ).group_by(Service.date).all())
+
+    total_hours = sum(month['hours'] for month in months)
+    return {
+        'months': months,
+        'max_month_hours': max(month['hours'] for month in months),
+        'places': places,
+        'tasks': tasks,
+        'weeks': year_heatmap(year, daily_hours),
+        'total_hours': total_hours,
+        'service_count': sum(month['services'] for month in months),
+        'days_worked': len(daily_hours),
+        'hours_per_day': total_hours / len(daily_hours) if daily_hours else 0.0,
+    }
+
+@app.route("/year")
+@app.route("/year/<year:year>")
+@login_required
+def year_view(year=None):
+    if year is None:
+        year = int(selected_month('current_month')[:4])
+    rollups = year_rollups(current_user.id, year)
+
+    def render():
+        spanish_month_names = [
+            "enero", "febrero", "marzo", "abril", "mayo", "junio",
+            "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+        ]
+        return render_template('year.html', year=year, spanish_month_names=spanish_month_names,
+                               **year_summary(current_user.id, year, rollups))
+
+    # data_version solo crece, así que su suma cambia con cualquier alta, edición o borrado del año
+    return cached_page_response(('page', 'year', current_user.id, current_user.username, year, len(rollups),
+                                 sum(row.data_version for row in rollups), TEMPLATES_VERSION), render)
+
+
+# Migración de esquema para bases de datos existentes.
+# db.create_all() solo crea las tablas que faltan; no añade índices nuevos a tablas que ya
+# existen, así que los creamos aquí de forma idempotente (checkfirst).
+def upgrade_schema():
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        # Columnas nuevas en tablas existentes (deben ser nullable o tener server_default)
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_sql = f"{column.name} {column.type.compile(dialect=db.engine.dialect)}"
+                if column.server_default is not None:
+                    column_sql += f" DEFAULT {column.server_default.arg}"
+                    if not column.nullable:
+                        column_sql += " NOT NULL"
+                with db.engine.begin() as connection:
+                    connection.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {column_sql}"))
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    with db.engine.begin() as connection:
+        ensure_search_index(connection)
+
+    # monthly_rollup recién creada en una base de datos con historial: se calcula una vez
+    if MonthlyRollup.query.first() is None and Service.query.first() is not None:
+        rebuild_monthly_rollups()
+
+# --- Búsqueda de texto en lugar y observaciones ---
+# Usa un índice de texto completo en lugar de ILIKE '%texto%' (que no puede usar índices):
+# - SQLite: tabla FTS5 'service_fts' con contenido externo, sincronizada con triggers sobre 'service'.
+# - Postgres: índice GIN sobre to_tsvector('simple', place || ' ' || observations).
+# Cada palabra buscada se trata como prefijo y todas deben aparecer. Otros motores usan ILIKE.
+# En FTS5 también se indexa user_id, así la coincidencia ya sale limitada a los servicios del
+# usuario en lugar de calcular la relevancia sobre los de todos los usuarios.
+
+SEARCH_MAX_TERMS = 10
+SEARCH_TERM_RE = re.compile(r'\w+', re.UNICODE)
+PG_SEARCH_VECTOR = "to_tsvector('simple', coalesce(service.place, '') || ' ' || coalesce(service.observations, ''))"
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS service_fts USING fts5(
+        place, observations, user_id, content='service', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS service_fts_ai AFTER INSERT ON service BEGIN
+        INSERT INTO service_fts(rowid, place, observations, user_id) VALUES (new.id, new.place, new.observations, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS service_fts_ad AFTER DELETE ON service BEGIN
+        INSERT INTO service_fts(service_fts, rowid, place, observations, user_id)
+        VALUES ('delete', old.id, old.place, old.observations, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS service_fts_au AFTER UPDATE OF place, observations, user_id ON service BEGIN
+        INSERT INTO service_fts(service_fts, rowid, place, observations, user_id)
+        VALUES ('delete', old.id, old.place, old.observations, old.user_id);
+        INSERT INTO service_fts(rowid, place, observations, user_id) VALUES (new.id, new.place, new.observations, new.user_id);
+    END""",
+]
+POSTGRES_SEARCH_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_service_search ON service USING gin ({PG_SEARCH_VECTOR.replace('service.', '')})",
+]
+
+# Crea el índice de búsqueda del motor actual si no existe (idempotente)
+def ensure_search_index(connection):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        is_new = connection.execute(db.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'service_fts'"
+        )).first() is None
+        for statement in SQLITE_SEARCH_DDL:
+            connection.execute(db.text(statement))
+        if is_new:
+            # Indexa los servicios que ya existían antes de crear la tabla FTS
+            connection.execute(db.text("INSERT INTO service_fts(service_fts) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            connection.execute(db.text(statement))
+
+@event.listens_for(Service.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    ensure_search_index(connection)
+
+def search_terms(text):
+    return [term.lower() for term in SEARCH_TERM_RE.findall(text or '')][:SEARCH_MAX_TERMS]
+
+# Las palabras solo se buscan en lugar y observaciones; user_id acota al usuario
+def _fts_match(user_id, terms):
+    words = ' '.join(f'"{term}"*' for term in terms)
+    return db.text("service_fts MATCH :fts_query").bindparams(
+        fts_query=f'user_id : "{int(user_id)}" AND {{place observations}} : ({words})')
+
+# Condición "el servicio del usuario contiene todas las palabras", para combinarla con otros filtros
+def service_text_filter(user_id, text):
+    terms = search_terms(text)
+    if not terms:
+        return db.false()
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return Service.id.in_(
+            db.select(db.column('rowid')).select_from(db.table('service_fts')).where(_fts_match(user_id, terms))
+        ) & (Service.user_id == user_id)
+    if dialect == 'postgresql':
+        return db.text(f"{PG_SEARCH_VECTOR} @@ to_tsquery('simple', :ts_query)").bindparams(
+            ts_query=' & '.join(f"{term}:*" for term in terms)) & (Service.user_id == user_id)
+    return db.and_(Service.user_id == user_id,
+                   *[Service.place.ilike(f'%{term}%') | Service.observations.ilike(f'%{term}%') for term in terms])
+
+# Búsqueda ordenada por relevancia en todo el historial del usuario. Devuelve una lista de filas
+# (columnas de `columns`) de la página pedida y si hay más páginas detrás.
+def search_services(user_id, text, columns, page=1, per_page=50):
+    terms = search_terms(text)
+    if not terms:
+        return [], False
+    dialect = db.engine.dialect.name
+    query = db.select(*columns).where(Service.user_id == user_id)
+    if dialect == 'sqlite':
+        matches = db.select(
+            db.column('rowid').label('service_id'), db.literal_column('bm25(service_fts, 2.0, 1.0, 0.0)').label('rank')
+        ).select_from(db.table('service_fts')).where(_fts_match(user_id, terms)).subquery()
+        # bm25() es menor cuanto más relevante; el lugar pesa el doble que las observaciones
+        query = query.join(matches, matches.c.service_id == Service.id).order_by(matches.c.rank.asc())
+    elif dialect == 'postgresql':
+        ts_query = ' & '.join(f"{term}:*" for term in terms)
+        query = query.where(service_text_filter(user_id, text)).order_by(
+            db.text(f"ts_rank({PG_SEARCH_VECTOR}, to_tsquery('simple', :rank_query)) DESC").bindparams(rank_query=ts_query)
+        )
+    else:
+        query = query.where(service_text_filter(user_id, text))
+    query = query.order_by(Service.date.desc(), Service.id.desc())
+    rows = db.session.execute(query.limit(per_page + 1).offset((page - 1) * per_page)).all()
+    return rows[:per_page], len(rows) > per_page
+
+# --- API JSON de servicios ---
+# Paginación por cursor (keyset) sobre (date, entry_time, id): cada página continúa justo después de
+# la última fila de la anterior usando ix_service_user_date_entry, sin OFFSET, así que el coste de
+# una página no depende de cuántas haya delante.
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+class ServiceItem(msgspec.Struct):
+    id: int
+    date: date
+    place: str
+    entry_time: time
+    break_duration: int
+    exit_time: time
+    worked_hours: float
+    observations: Optional[str]
+
+class ServicePage(msgspec.Struct):
+    items: List[ServiceItem]
+    next_cursor: Optional[str]
+
+api_encoder = msgspec.json.Encoder()
+
+# Campos de Service en el orden de ServiceItem
+SERVICE_ITEM_COLUMNS = (Service.id, Service.date, Service.place, Service.entry_time, Service.break_duration,
+                        Service.exit_time, Service.worked_hours, Service.observations)
+
+def encode_cursor(item):
+    raw = f"{item.date.isoformat()}|{item.entry_time.isoformat()}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+    date_str, time_str, id_str = raw.split('|')
+    return date.fromisoformat(date_str), time.fromisoformat(time_str), int(id_str)
+
+
+def api_error(message, status=400):
+    return jsonify({'error': message}), status
+
+# Servicios del usuario por páginas. Parámetros opcionales:
+#   month=YYYY-MM, start=YYYY-MM-DD, end=YYYY-MM-DD (incluido), place (exacto), q (texto),
+#   limit (máx. API_MAX_PAGE_SIZE) y cursor (next_cursor de la página anterior)
+@app.route("/api/services")
+@login_required
+def api_services():
+    conditions = [Service.user_id == current_user.id]
+    try:
+        limit = max(1, min(int(request.args.get('limit', API_PAGE_SIZE)), API_MAX_PAGE_SIZE))
+        if request.args.get('month'):
+            first_day, next_first_day = month_bounds(request.args['month'])
+            conditions += [Service.date >= first_day, Service.date < next_first_day]
+        if request.args.get('start'):
+            conditions.append(Service.date >= date.fromisoformat(request.args['start']))
+        if request.args.get('end'):
+            conditions.append(Service.date <= date.fromisoformat(request.args['end']))
+        if request.args.get('cursor'):
+            cursor_date, cursor_time, cursor_id = decode_cursor(request.args['cursor'])
+            conditions.append(db.tuple_(Service.date, Service.entry_time, Service.id) >
+                              db.tuple_(cursor_date, cursor_time, cursor_id))
+    except (ValueError, binascii.Error):
+        return api_error('Parámetros inválidos.')
+    if request.args.get('place'):
+        conditions.append(Service.place == request.args['place'])
+    if request.args.get('q'):
+        conditions.append(service_text_filter(current_user.id, request.args['q']))
+
+    rows = db.session.execute(
+        db.select(*SERVICE_ITEM_COLUMNS).where(*conditions)
+        .order_by(Service.date.asc(), Service.entry_time.asc(), Service.id.asc())
+        .limit(limit + 1) # Una fila de más para saber si hay otra página
+    ).all()
+    items = [ServiceItem(*row) for row in rows[:limit]]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    return Response(api_encoder.encode(ServicePage(items=items, next_cursor=next_cursor)),
+                    mimetype='application/json')
+
+# Búsqueda por relevancia en todo el historial (ver search_services). Misma respuesta que
+# /api/services; aquí el cursor es simplemente el número de la página siguiente.
+@app.route("/api/services/search")
+@login_required
+def api_services_search():
+    try:
+        limit = max(1, min(int(request.args.get('limit', API_PAGE_SIZE)), API_MAX_PAGE_SIZE))
+        page = max(1, int(request.args.get('cursor', 1)))
+    except ValueError:
+        return api_error('Parámetros inválidos.')
+    rows, has_more = search_services(current_user.id, request.args.get('q', ''), SERVICE_ITEM_COLUMNS,
+                                     page=page, per_page=limit)
+    items = [ServiceItem(*row) for row in rows]
+    return Response(api_encoder.encode(ServicePage(items=items, next_cursor=str(page + 1) if has_more else None)),
+                    mimetype='application/json')
 
-    # Prepare data for the PDF table (Fecha, Tarea Específica, Horas)
-    pdf_table_data = []
-    grand_total_tasks_hours = 0.0
+# --- Informes en segundo plano (ver report_jobs.py) ---
 
-    for service in services:
-        if service.specific_tasks:
+@app.route("/reports/<report_type>/async", methods=['POST'])
+@login_required
+def report_async(report_type):
+    if report_type not in REPORT_DOWNLOAD_NAMES:
+        flash('Tipo de informe desconocido.', 'danger')
+        return redirect(url_for('index'))
+    month_key = 'current_month' if report_type == 'services' else 'current_tasks_month'
+    month = request.form.get('month', '')
+    month_str = selected_month(month_key, month if MONTH_RE.match(month) else None)
+    back_url = url_for('index' if report_type == 'services' else 'tasks_summary', month=month_str)
+
+    totals = month_totals(current_user.id, month_str)
+    job_id = report_cache_key(current_user.id, current_user.username, month_str, report_type, totals)
+    state = report_queue.state(job_id)
+    if state is None or state['status'] == 'failed':
+        meta = {
+            'download_name': REPORT_DOWNLOAD_NAMES[report_type].format(month=month_str),
+            'last_modified': totals.updated_at.isoformat() if totals.updated_at else None,
+        }
+        if report_cache.contains(job_id):
+            # Ya generado (p. ej. por la descarga directa): solo falta registrar el trabajo
+            report_queue.record_done(job_id, current_user.id, report_type, meta)
+        else:
             try:
-                specific_tasks = json.loads(service.specific_tasks)
-                for task in specific_tasks:
-                    description = task.get('description')
-                    duration = task.get('duration')
-                    if description and isinstance(duration, (int, float)):
-                        pdf_table_data.append([
-                            service.date.strftime('%d/%m/%Y'),
-                            description,
-                            f"{duration:.2f}"
-                        ])
-                        grand_total_tasks_hours += duration
-            except json.JSONDecodeError:
-                print(f"Warning: Could not decode specific_tasks for service ID {service.id} during PDF generation.")
-
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=portrait(A4)) # Portrait A4 for tasks summary
-    styles = getSampleStyleSheet()
-    
-    # Custom style for table cells to handle long text
-    styles.add(ParagraphStyle(name='TableContentCenter', fontSize=9, leading=11, alignment=TA_CENTER)) # Slightly larger font for tasks PDF
-    styles.add(ParagraphStyle(name='TableContentLeft', fontSize=9, leading=11, alignment=TA_LEFT))
-
-    story = []
-
-    # Title
-    month_name = [
-        "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-        "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-    ][month - 1]
-    title_text = f"Reporte Detallado de Tareas Específicas - {month_name} {year}"
-    story.append(Paragraph(title_text, styles['h1']))
-    story.append(Spacer(1, 0.2 * inch))
-
-    # User Info
-    story.append(Paragraph(f"Usuario: <b>{current_user.username}</b>", styles['Normal']))
-    story.append(Spacer(1, 0.1 * inch))
-
-    # Table Data
-    # Headers for the new table structure
-    data = [['Fecha', 'Tarea Específica', 'Horas']]
-
-    # Add processed task data to the table
-    for row in pdf_table_data:
-        data.append([
-            Paragraph(row[0], styles['TableContentCenter']), # Fecha
-            Paragraph(row[1], styles['TableContentLeft']),   # Tarea Específica
-            Paragraph(row[2], styles['TableContentCenter'])  # Horas
-        ])
-
-    if not pdf_table_data:
-        story.append(Paragraph("No hay datos de tareas específicas para este mes.", styles['Normal']))
-    else:
-        # Adjust column widths for portrait A4 (595.27 points total width)
-        # Aim for ~550 points total width for the table
-        col_widths_pts = [
-            70,  # Fecha
-            380, # Tarea Específica (more space for description)
-            100  # Horas
-        ]
+                report_queue.submit(job_id, current_user.id, report_type,
+                                    report_args(report_type, current_user.id, current_user.username, month_str, totals),
+                                    meta)
+            except QueueFullError as e:
+                flash(f'{e} Inténtalo de nuevo en unos segundos.', 'warning')
+                return redirect(back_url)
+    return redirect(url_for('report_job', job_id=job_id))
+
+# Estado del trabajo: redirige a la descarga cuando está listo. Con ?format=json devuelve el estado
+# para que el cliente pueda consultarlo sin recargar la página.
+@app.route("/reports/jobs/<job_id>")
+@login_required
+def report_job(job_id):
+    state = report_queue.state(job_id)
+    if state is None or state['user_id'] != current_user.id:
+        if request.args.get('format') == 'json':
+            return jsonify({'status': 'unknown'}), 404
+        flash('El informe solicitado no existe o ha caducado.', 'warning')
+        return redirect(url_for('index'))
 
-        table = Table(data, colWidths=col_widths_pts)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4CAF50')), # Header background
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke), # Header text color
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'), # Header alignment
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f2f2f2')), # Even rows background
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('FONTSIZE', (0,0), (-1,-1), 9), # Font size for table content
-            ('ALIGN', (0,1), (0,-1), 'CENTER'), # Fecha data (center align)
-            ('ALIGN', (1,1), (1,-1), 'LEFT'),   # Tarea Específica data (left align)
-            ('ALIGN', (2,1), (2,-1), 'CENTER'), # Horas data (center align)
-        ]))
-        story.append(table)
-        story.append(Spacer(1, 0.2 * inch))
-
-        # Grand Total of Specific Tasks
-        story.append(Paragraph(f"<b>Total General de Horas de Tareas Específicas: {grand_total_tasks_hours:.2f}</b>", styles['h2']))
-    
-    doc.build(story)
-    buffer.seek(0)
+    download_url = url_for('report_job_download', job_id=job_id)
+    if request.args.get('format') == 'json':
+        return jsonify({'status': state['status'], 'error': state.get('error'),
+                        'download_url': download_url if state['status'] == 'done' else None})
+    if state['status'] == 'done':
+        return redirect(download_url)
+    return render_template('report_job.html', state=state, job_id=job_id)
 
-    return send_file(buffer,
-                     mimetype='application/pdf',
-                     as_attachment=True,
-                     download_name=f'reporte_tareas_especificas_{current_tasks_month_str}.pdf')
+@app.route("/reports/jobs/<job_id>/download")
+@login_required
+def report_job_download(job_id):
+    state = report_queue.state(job_id)
+    if state is None or state['user_id'] != current_user.id or state['status'] != 'done':
+        flash('El informe solicitado no existe o ha caducado.', 'warning')
+        return redirect(url_for('index'))
+    if job_id in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(job_id)
+        return response
+    pdf_bytes = report_cache.get(job_id)
+    if pdf_bytes is None:
+        flash('El informe solicitado no existe o ha caducado.', 'warning')
+        return redirect(url_for('index'))
+    last_modified = datetime.fromisoformat(state['last_modified']) if state.get('last_modified') else None
+    return pdf_response(pdf_bytes, job_id, state['download_name'], last_modified)
+
+# Migra las tareas guardadas como JSON en Service.specific_tasks a la tabla service_task.
+# Recorre la tabla por lotes ordenados por id (keyset), así nunca carga todos los servicios
+# en memoria; solo procesa servicios sin filas en service_task, por lo que se puede repetir.
+# Los elementos que no son una tarea válida (un texto suelto, sin descripción o sin duración
+# numérica) se saltan y se cuentan en 'skipped_tasks'.
+def backfill_service_tasks(batch_size=1000):
+    stats = {'services': 0, 'tasks': 0, 'invalid': 0, 'skipped_tasks': 0}
+    last_id = 0
+    while True:
+        batch = db.session.query(Service.id, Service.specific_tasks, Service.user_id, Service.date).filter(
+            Service.id > last_id,
+            Service.specific_tasks.isnot(None),
+            ~Service.tasks.any()
+        ).order_by(Service.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        task_rows = []
+        touched_months = set()
+        for service_id, specific_tasks, user_id, service_date in batch:
+            try:
+                tasks = json.loads(specific_tasks)
+            except json.JSONDecodeError:
+                tasks = None
+            if not isinstance(tasks, list):
+                print(f"Warning: Could not decode specific_tasks for service ID {service_id}")
+                stats['invalid'] += 1
+                continue
+            for task in tasks:
+                description = task.get('description') if isinstance(task, dict) else None
+                duration = task.get('duration') if isinstance(task, dict) else None
+                if description and isinstance(duration, (int, float)) and not isinstance(duration, bool):
+                    task_rows.append({'service_id': service_id, 'description': description, 'duration': duration})
+                    touched_months.add((user_id, service_date.strftime('%Y-%m')))
+                else:
+                    stats['skipped_tasks'] += 1
+            stats['services'] += 1
+
+        if task_rows:
+            db.session.execute(db.insert(ServiceTask), task_rows)
+            # El insert masivo no pasa por los eventos del ORM: actualizamos task_hours a mano
+            refresh_monthly_rollups(db.session.connection(), touched_months)
+        db.session.commit()
+        stats['tasks'] += len(task_rows)
+        last_id = batch[-1][0]
+    return stats
+
+# Inserta muchos servicios (dicts con las columnas de Service) y sus tareas con un INSERT por lote,
+# y refresca monthly_rollup de los meses tocados; el insert masivo no pasa por los eventos del ORM.
+# No hace commit: lo decide quien llama.
+def insert_services_bulk(rows, rows_tasks, touched_months):
+    # Insert de Core sobre la tabla: el insert masivo del ORM parte el lote en un INSERT por
+    # cada racha de filas con las mismas claves no nulas (observaciones, tareas).
+    # SQLite no tiene un "sentinel" implícito: con sort_by_parameter_order SQLAlchemy haría un
+    # INSERT por fila. Dentro de la transacción (con el bloqueo de escritura) SQLite asigna los
+    # ids en el orden de VALUES, así que basta con ordenarlos.
+    sqlite = db.engine.dialect.name == 'sqlite'
+    service_ids = db.session.execute(
+        Service.__table__.insert().returning(Service.id, sort_by_parameter_order=not sqlite), rows
+    ).scalars().all()
+    if sqlite:
+        service_ids.sort()
+    task_rows = [{'service_id': service_id, **task}
+                 for service_id, tasks in zip(service_ids, rows_tasks) for task in tasks]
+    if task_rows:
+        db.session.execute(ServiceTask.__table__.insert(), task_rows)
+    refresh_monthly_rollups(db.session.connection(), touched_months)
+    return service_ids
+
+IMPORT_BATCH_SIZE = 2000 # Filas por insert masivo y por transacción
+IMPORT_MAX_ERRORS = 1000 # Errores que se detallan en el informe; a partir de ahí solo se cuentan
+
+# Valida una fila leída por service_import.iter_records igual que add_service y la convierte en
+# los valores de Service más su lista de tareas. Lanza ImportRowError con el motivo.
+def import_service_row(user_id, record):
+    service_date = parse_date(record.get('date'))
+    entry_time = parse_time(record.get('entry_time'), 'entrada')
+    exit_time = parse_time(record.get('exit_time'), 'salida')
+    break_duration = parse_break(record.get('break_duration'))
+    worked_hours = worked_hours_between(entry_time, exit_time, break_duration)
+    place = str(record.get('place') or '').strip()
+    if not place:
+        raise ImportRowError('Falta el lugar.')
+    if len(place) > 100:
+        raise ImportRowError('El lugar no puede tener más de 100 caracteres.')
+    observations = str(record.get('observations') or '').strip() or None
+    tasks = parse_tasks(record.get('specific_tasks'))
+    return {
+        'user_id': user_id,
+        'date': service_date,
+        'place': place,
+        'entry_time': entry_time,
+        'break_duration': break_duration,
+        'exit_time': exit_time,
+        'worked_hours': worked_hours,
+        'observations': observations,
+        'specific_tasks': json.dumps(tasks) if tasks else None,
+    }, tasks
+
+# Comprueba un lote de importación contra los servicios ya guardados y contra sí mismo. Una
+# consulta por rango sobre ix_service_user_date_entry (del día anterior a la primera fecha del lote
+# al siguiente a la última, por los turnos nocturnos) y un barrido por hora de inicio como en
+# audit_overlaps. Las filas idénticas (fecha, entrada y salida) a un servicio guardado son
+# duplicados: así, volver a subir un archivo cuya importación se cortó a medias no duplica los
+# lotes que ya se guardaron. Los servicios guardados se quedan siempre, así que primero se descartan
+# las filas que pisan uno guardado; después, entre las filas restantes que se solapan se descarta la
+# que empieza después. Una fila solo se compara con las aceptadas: si la que la pisaba se ha
+# descartado por chocar con un servicio guardado, la fila entra.
+# Devuelve (posiciones duplicadas, {posición en el lote: mensaje de error}).
+def check_import_batch(user_id, rows, lines):
+    query = db.select(Service.id, Service.date, Service.entry_time, Service.exit_time).where(
+        Service.user_id == user_id,
+        Service.date >= min(row['date'] for row in rows) - timedelta(days=1),
+        Service.date <= max(row['date'] for row in rows) + timedelta(days=1),
+    )
+    items = [] # (inicio, fin, posición en el lote o -1 si ya está guardado, fila)
+    stored = set()
+    for row in db.session.execute(query):
+        items.append((*service_interval(row.date, row.entry_time, row.exit_time), -1, row))
+        stored.add((row.date, row.entry_time, row.exit_time))
+    duplicates = set()
+    for index, row in enumerate(rows):
+        if (row['date'], row['entry_time'], row['exit_time']) in stored:
+            duplicates.add(index)
+            continue
+        items.append((*service_interval(row['date'], row['entry_time'], row['exit_time']), index, row))
+    items = sorted((item for item in items if item[0] != item[1]), # Un turno de duración cero no se solapa
+                   key=lambda item: (item[0], item[2]))             # Con el mismo inicio, primero los guardados
+
+    # Primera pasada: filas del lote contra servicios guardados
+    rejected, active_stored, active_rows = {}, [], []
+    for item in items:
+        start, _, index, row = item
+        active_stored = [other for other in active_stored if other[1] > start]
+        active_rows = [other for other in active_rows if other[1] > start]
+        if index >= 0:
+            if active_stored: # Un servicio guardado empieza antes y termina después de este inicio
+                rejected[index] = overlap_message(active_stored[0][3])
+            else:
+                active_rows.append(item)
+        else:
+            for other in active_rows: # Filas del lote que empezaron antes y pisan este servicio
+                rejected.setdefault(other[2], overlap_message(row))
+            active_rows = []
+            active_stored.append(item)
+
+    # Segunda pasada: las filas que quedan, entre sí
+    active = []
+    for item in items:
+        start, _, index, row = item
+        if index < 0 or index in rejected:
+            continue
+        active = [other for other in active if other[1] > start]
+        if active:
+            other_index, other = active[0][2], active[0][3]
+            rejected[index] = (f"El servicio se solapa con el de la línea {lines[other_index]} "
+                               f"({other['entry_time'].strftime('%H:%M')}-{other['exit_time'].strftime('%H:%M')}).")
+            continue
+        active.append(item)
+    return duplicates, rejected
+
+# Importación masiva desde un archivo de texto (CSV o JSON Lines) leído en streaming. Las filas
+# válidas se insertan por lotes de batch_size, cada lote en su propia transacción junto con sus
+# tareas y el refresco de monthly_rollup (el insert masivo no pasa por los eventos del ORM).
+# Las filas inválidas o que se solapan con otro servicio (ver check_import_batch) se saltan y se
+# anotan en el informe; las que ya estaban guardadas se saltan y solo se cuentan ('skipped').
+# Reimportar el mismo archivo es por tanto seguro. La memoria depende del tamaño del lote, no del archivo. Con dry_run
+# solo se valida; como no se guarda nada, los solapes entre filas de lotes distintos no se ven.
+def import_services(user_id, stream, file_format, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    report = {'imported': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+    batch, batch_tasks, batch_lines = [], [], []
+
+    def add_error(line_number, message):
+        report['failed'] += 1
+        if len(report['errors']) < IMPORT_MAX_ERRORS:
+            report['errors'].append({'line': line_number, 'error': message})
+
+    def flush():
+        if batch:
+            duplicates, rejected = check_import_batch(user_id, batch, batch_lines)
+            for index in sorted(rejected):
+                add_error(batch_lines[index], rejected[index])
+            report['skipped'] += len(duplicates)
+            keep = [index not in rejected and index not in duplicates for index in range(len(batch))]
+            rows = [row for row, kept in zip(batch, keep) if kept]
+            rows_tasks = [tasks for tasks, kept in zip(batch_tasks, keep) if kept]
+            if rows and not dry_run:
+                insert_services_bulk(rows, rows_tasks, {(user_id, row['date'].strftime('%Y-%m')) for row in rows})
+                db.session.commit()
+            report['imported'] += len(rows)
+        batch.clear()
+        batch_tasks.clear()
+        batch_lines.clear()
+
+    for line_number, record in iter_records(stream, file_format):
+        try:
+            if isinstance(record, ImportRowError):
+                raise record
+            row, tasks = import_service_row(user_id, record)
+        except ImportRowError as e:
+            add_error(line_number, str(e))
+            continue
+        batch.append(row)
+        batch_tasks.append(tasks)
+        batch_lines.append(line_number)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    report['errors'].sort(key=lambda error: error['line']) # Los solapes se anotan al cerrar cada lote
+    return report
+
+RECURRING_MAX_DAYS = 366 # Rango máximo de fechas de una plantilla recurrente
+WEEKDAY_NAMES = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+
+# Genera, en una sola transacción, un servicio por cada día de [start_date, end_date] cuyo día de
+# la semana esté en weekdays (0 = lunes), todos con el mismo turno y las mismas tareas. worked_hours
+# se calcula una vez para toda la plantilla. Los servicios existentes del rango (más un día a cada
+# lado por los turnos nocturnos) se leen con una sola consulta sobre ix_service_user_date_entry, y
+# se saltan los días que ya tienen ese mismo turno (duplicados) o uno que se solape con él.
+def create_recurring_services(user_id, start_date, end_date, weekdays, place, entry_time, exit_time,
+                              break_duration, observations=None, tasks=()):
+    tasks = list(tasks)
+    worked_hours = worked_hours_between(entry_time, exit_time, break_duration)
+    specific_tasks = json.dumps(tasks) if tasks else None
+
+    existing = {} # fecha -> [(entrada, salida, inicio, fin)]
+    for service_date, other_entry, other_exit in db.session.execute(
+        db.select(Service.date, Service.entry_time, Service.exit_time).where(
+            Service.user_id == user_id,
+            Service.date >= start_date - timedelta(days=1),
+            Service.date <= end_date + timedelta(days=1),
+        )
+    ):
+        existing.setdefault(service_date, []).append(
+            (other_entry, other_exit, *service_interval(service_date, other_entry, other_exit))
+        )
 
+    rows, touched_months = [], set()
+    result = {'created': 0, 'duplicates': [], 'overlaps': []}
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays:
+            start, end = service_interval(day, entry_time, exit_time)
+            if any(other_entry == entry_time and other_exit == exit_time
+                   for other_entry, other_exit, _, _ in existing.get(day, ())):
+                result['duplicates'].append(day)
+            elif any(other_start < end and start < other_end
+                     for offset in (-1, 0, 1)
+                     for _, _, other_start, other_end in existing.get(day + timedelta(days=offset), ())):
+                result['overlaps'].append(day)
+            else:
+                rows.append({
+                    'user_id': user_id, 'date': day, 'place': place,
+                    'entry_time': entry_time, 'break_duration': break_duration, 'exit_time': exit_time,
+                    'worked_hours': worked_hours, 'observations': observations,
+                    'specific_tasks': specific_tasks,
+                })
+                touched_months.add((user_id, day.strftime('%Y-%m')))
+        day += timedelta(days=1)
+
+    if rows:
+        insert_services_bulk(rows, [tasks] * len(rows), touched_months)
+        db.session.commit()
+    result['created'] = len(rows)
+    return result
 
 # Database Initialization (for local development or initial setup)
 def create_db():
     with app.app_context():
         db.create_all()
+        upgrade_schema()
         # Create default 'admin' user if it doesn't exist
         if not User.query.filter_by(username='admin').first():
             admin_user = User(username='admin')
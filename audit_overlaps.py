@@ -0,0 +1,30 @@
+# audit_overlaps.py
+# Busca servicios cuyos horarios se solapan (incluidos los turnos nocturnos) en todos los usuarios,
+# o en uno con --user. Recorre los servicios una sola vez en orden de inicio (ver audit_overlaps
+# en app.py). Sale con código 1 si encuentra alguno.
+#   python audit_overlaps.py [--user nombre]
+import sys
+from app import app, db, User, audit_overlaps
+
+username = None
+if '--user' in sys.argv[1:]:
+    username = sys.argv[sys.argv.index('--user') + 1]
+
+with app.app_context():
+    db.create_all()
+    user_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            sys.exit(f"El usuario '{username}' no existe.")
+        user_id = user.id
+
+    found = 0
+    for first, second in audit_overlaps(user_id):
+        found += 1
+        print(f"usuario {first.user_id}: servicio {first.id} ({first.date} {first.entry_time:%H:%M}-{first.exit_time:%H:%M})"
+              f" se solapa con {second.id} ({second.date} {second.entry_time:%H:%M}-{second.exit_time:%H:%M})")
+    print(f"Pares de servicios solapados: {found}.")
+
+if found:
+    sys.exit(1)
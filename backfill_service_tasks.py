@@ -0,0 +1,23 @@
+# backfill_service_tasks.py
+# Migra las tareas específicas guardadas como JSON (Service.specific_tasks) a la tabla service_task.
+# Ejecutar una vez después de desplegar la tabla nueva: python backfill_service_tasks.py [tamaño_lote]
+# Es seguro repetirlo: los servicios que ya tienen filas en service_task se saltan.
+import sys
+from app import app, db, backfill_service_tasks
+
+batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+with app.app_context():
+    # Crea la tabla service_task si la base de datos es anterior a ella
+    db.create_all()
+
+    print(f"Migrando tareas específicas en lotes de {batch_size} servicios...")
+    stats = backfill_service_tasks(batch_size=batch_size)
+    print(f"Servicios migrados: {stats['services']}")
+    print(f"Tareas creadas: {stats['tasks']}")
+    if stats['invalid']:
+        print(f"Servicios con JSON inválido (sin migrar): {stats['invalid']}")
+    if stats['skipped_tasks']:
+        print(f"Tareas saltadas (no son un objeto con descripción y duración): {stats['skipped_tasks']}")
+
+print("Migración de tareas finalizada.")
@@ -0,0 +1,53 @@
+# bench/bench_compression.py
+# Tamaño y CPU de la compresión de respuestas (compression.py) en las rutas más pesadas: la página
+# del mes (index), el resumen de tareas y la exportación CSV de un año (en streaming). Para cada
+# algoritmo y nivel informa los bytes enviados, el ahorro y los milisegundos de CPU por respuesta,
+# que es lo que hay que equilibrar al elegir COMPRESSION_LEVEL / COMPRESSION_BROTLI_LEVEL.
+#
+# Uso: python bench/bench_compression.py [--years 5] [--shifts-per-day 3] [--repeat 20]
+import argparse
+import os
+import tempfile
+
+from datagen import load_app, seed
+
+ROUTES = [
+    ('index', '/month/2026-03'),
+    ('tasks_summary', '/tasks/2026-03'),
+    ('export_csv', '/export_csv?start=2025-01-01&end=2025-12-31'),
+]
+LEVELS = {'gzip': (1, 6, 9), 'br': (1, 4, 6, 11)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--shifts-per-day', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ['COMPRESSION'] = '1'
+    app_module = load_app(os.path.join(tempfile.mkdtemp(prefix='bench_compression_'), 'bench.db'))
+    seed(app_module, users=1, years=args.years, shifts_per_day=args.shifts_per_day)
+    compression = app_module.compression
+
+    client = app_module.app.test_client()
+    client.post('/login', data={'username': 'bench_user_0', 'password': 'bench-password'})
+
+    for name, path in ROUTES:
+        raw = len(client.get(path).get_data())
+        print(f"{name} ({raw / 1024:.1f} KB sin comprimir)")
+        for encoding in compression.encodings:
+            for level in LEVELS[encoding]:
+                compression.levels[encoding] = level
+                before = compression.stats.snapshot().get(encoding, [0, 0, 0, 0.0])
+                for _ in range(args.repeat):
+                    size = len(client.get(path, headers={'Accept-Encoding': encoding}).get_data())
+                after = compression.stats.snapshot()[encoding]
+                cpu_ms = (after[3] - before[3]) / args.repeat * 1000
+                print(f"  {encoding:4s} nivel {level:2d}: {size / 1024:7.1f} KB ({100 * (1 - size / raw):4.1f}% menos), "
+                      f"CPU {cpu_ms:6.2f} ms por respuesta")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# bench/bench_db_concurrency.py
+# Tráfico mixto de lectura/escritura sobre SQLite desde varios procesos a la vez (como varios
+# workers de gunicorn), con el modo por defecto (rollback journal, SQLITE_TUNING=0) y con los
+# PRAGMAs de db_config.py (WAL, synchronous=NORMAL, busy_timeout, caché mayor).
+# Las lecturas son la consulta del mes de /api/services; las escrituras, altas de servicio por el
+# ORM (con su refresco de monthly_rollup), igual que add_service.
+#
+# Uso: python bench/bench_db_concurrency.py [--processes 4] [--seconds 10] [--write-ratio 0.2]
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, time as dtime
+
+from datagen import load_app, percentile, seed
+
+
+# Cuerpo de cada proceso: lee o escribe durante `seconds` segundos y devuelve sus mediciones
+def worker(db_path, tuning, seconds, write_ratio, user_ids, index, queue):
+    os.environ['SQLITE_TUNING'] = '1' if tuning else '0'
+    app_module = load_app(db_path)
+    app, db, Service = app_module.app, app_module.db, app_module.Service
+    rng = random.Random(index)
+    reads, writes, errors = [], [], 0
+    with app.app_context():
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            user_id = rng.choice(user_ids)
+            start = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    db.session.add(Service(
+                        user_id=user_id, date=date(2026, 3, rng.randint(1, 28)), place='Concurrencia',
+                        entry_time=dtime(8, 0), break_duration=30, exit_time=dtime(16, 0), worked_hours=7.5,
+                    ))
+                    db.session.commit()
+                    writes.append((time.perf_counter() - start) * 1000)
+                else:
+                    db.session.execute(
+                        db.select(*app_module.SERVICE_ITEM_COLUMNS)
+                        .where(*app_module.service_month_filter(user_id, '2026-03'))
+                        .order_by(Service.date, Service.entry_time, Service.id).limit(50)
+                    ).all()
+                    db.session.commit()
+                    reads.append((time.perf_counter() - start) * 1000)
+            except Exception: # "database is locked" cuando se agota la espera
+                db.session.rollback()
+                errors += 1
+    queue.put((reads, writes, errors))
+
+
+def run(db_path, tuning, args, user_ids):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(db_path, tuning, args.seconds, args.write_ratio, user_ids, n, queue))
+        for n in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    reads = [sample for result in results for sample in result[0]]
+    writes = [sample for result in results for sample in result[1]]
+    errors = sum(result[2] for result in results)
+    return {
+        'reads': len(reads),
+        'writes': len(writes),
+        'errors': errors,
+        'throughput_ops': round((len(reads) + len(writes)) / args.seconds, 1),
+        'read_p50_ms': round(statistics.median(reads), 3) if reads else None,
+        'read_p99_ms': round(percentile(reads, 0.99), 3) if reads else None,
+        'write_p50_ms': round(statistics.median(writes), 3) if writes else None,
+        'write_p99_ms': round(percentile(writes, 0.99), 3) if writes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--years', type=int, default=3)
+    args = parser.parse_args()
+
+    # Siembra una vez en modo rollback journal y copia el archivo para cada configuración
+    workdir = tempfile.mkdtemp(prefix='bench_dbconc_')
+    template = os.path.join(workdir, 'template.db')
+    os.environ['SQLITE_TUNING'] = '0'
+    user_ids = seed(load_app(template), users=args.users, years=args.years)
+
+    results = {}
+    for label, tuning in (('rollback_journal', False), ('wal_tuned', True)):
+        db_path = os.path.join(workdir, f'{label}.db')
+        shutil.copyfile(template, db_path)
+        results[label] = run(db_path, tuning, args, user_ids)
+        stats = results[label]
+        print(f"{label:17s} {stats['throughput_ops']:8.1f} op/s  lectura p50/p99 {stats['read_p50_ms']}/{stats['read_p99_ms']} ms"
+              f"  escritura p50/p99 {stats['write_p50_ms']}/{stats['write_p99_ms']} ms  errores {stats['errors']}")
+    json.dump({'processes': args.processes, 'seconds': args.seconds, 'write_ratio': args.write_ratio,
+               'cpus': os.cpu_count(), 'results': results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# bench/bench_export_csv.py
+# Exporta un rango de fechas muy grande con /export_csv y comprueba que la memoria del proceso
+# no crece con el número de filas (la exportación se genera por bloques).
+#
+# Uso: python bench/bench_export_csv.py [--rows 500000] [--max-rss-mb 64] [--gzip]
+# El proceso que exporta es un subproceso nuevo, para que la siembra no cuente en su memoria.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from datagen import load_app, seed
+
+SHIFTS_PER_YEAR = 365 * 6 / 7 * 0.9  # Turnos por año y por "hueco" diario de datagen.service_rows
+
+
+def rss_mb():
+    # ru_maxrss está en KiB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(db_path, compress):
+    app_module = load_app(db_path)
+    client = app_module.app.test_client()
+    client.post('/login', data={'username': 'bench_user_0', 'password': 'bench-password'})
+    baseline = rss_mb()
+
+    start = time.perf_counter()
+    response = client.get('/export_csv', query_string={
+        'start': '1900-01-01', 'end': '2100-12-31', 'gzip': '1' if compress else '0'
+    }, buffered=False)
+    total_bytes = 0
+    for chunk in response.response:
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - start
+    response.close()
+
+    print(json.dumps({
+        'bytes': total_bytes,
+        'seconds': round(elapsed, 3),
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(rss_mb(), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--max-rss-mb', type=float, default=64.0,
+                        help='Crecimiento máximo permitido del RSS durante la exportación')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.gzip)
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_csv_'), 'bench.db')
+    app_module = load_app(db_path)
+    years = 10
+    shifts_per_day = max(1, round(args.rows / (years * SHIFTS_PER_YEAR)))
+    seed(app_module, users=1, years=years, shifts_per_day=shifts_per_day)
+    with app_module.app.app_context():
+        rows = app_module.Service.query.count()
+    print(f"Filas sembradas: {rows}")
+
+    command = [sys.executable, os.path.abspath(__file__), '--child', db_path]
+    if args.gzip:
+        command.append('--gzip')
+    result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+    growth = result['peak_rss_mb'] - result['baseline_rss_mb']
+    print(f"Exportado: {result['bytes'] / 1e6:.1f} MB en {result['seconds']:.2f} s "
+          f"({rows / result['seconds']:.0f} filas/s)")
+    print(f"RSS: base {result['baseline_rss_mb']:.1f} MB, pico {result['peak_rss_mb']:.1f} MB "
+          f"(crecimiento {growth:.1f} MB, límite {args.max_rss_mb:.0f} MB)")
+    if growth > args.max_rss_mb:
+        print("ERROR: la exportación superó el límite de memoria")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
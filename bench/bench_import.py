@@ -0,0 +1,105 @@
+# bench/bench_import.py
+# Importa archivos de --rows filas con import_services() (CSV en el formato de la exportación y
+# JSON Lines) y mide filas por segundo y el crecimiento de memoria. Cada importación se hace en un
+# subproceso nuevo; con dos tamaños de archivo se ve que la memoria no depende del número de filas.
+# Incluye un 1% de filas inválidas para que el informe de errores también trabaje; las válidas no
+# se solapan entre sí, así que cada lote paga también la comprobación de solapes.
+#
+# Uso: python bench/bench_import.py [--rows 20000 200000] [--batch-size 2000]
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from datagen import load_app, seed, service_rows
+from csv_export import CSV_HEADER, services_csv_row
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KiB en Linux
+
+
+# Escribe `rows` servicios en CSV y JSONL sin tenerlos todos en memoria
+def write_files(directory, rows, seed_value=99):
+    rng = random.Random(seed_value)
+    csv_path = os.path.join(directory, f'import_{rows}.csv')
+    jsonl_path = os.path.join(directory, f'import_{rows}.jsonl')
+    # Un turno al día y tantos años como haga falta: la importación rechaza los turnos que se solapan
+    years = rows // 250 + 1
+    with open(csv_path, 'w', newline='', encoding='utf-8') as csv_file, open(jsonl_path, 'w', encoding='utf-8') as jsonl_file:
+        writer = csv.writer(csv_file, lineterminator='\n')
+        writer.writerow(CSV_HEADER)
+        written = 0
+        for row in service_rows(0, years, rng, tasks=True):
+            if written >= rows:
+                break
+            invalid = rng.random() < 0.01
+            values = services_csv_row((row['date'], row['place'], row['entry_time'], row['break_duration'],
+                                       row['exit_time'], row['worked_hours'], row['observations'], row['specific_tasks']))
+            record = {'date': row['date'].isoformat(), 'place': row['place'],
+                      'entry_time': row['entry_time'].strftime('%H:%M'), 'exit_time': row['exit_time'].strftime('%H:%M'),
+                      'break_duration': row['break_duration'], 'observations': row['observations'],
+                      'specific_tasks': row['tasks']}
+            if invalid:
+                values[2] = '25:99'
+                record['entry_time'] = '25:99'
+            writer.writerow(values)
+            jsonl_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            written += 1
+    return csv_path, jsonl_path
+
+
+def child(db_path, path, file_format, batch_size):
+    app_module = load_app(db_path)
+    with app_module.app.app_context():
+        user_id = app_module.User.query.filter_by(username='bench_user_0').one().id
+        baseline = rss_mb()
+        start = time.perf_counter()
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            report = app_module.import_services(user_id, stream, file_format, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        drift = app_module.verify_monthly_rollups()
+    print(json.dumps({'imported': report['imported'], 'failed': report['failed'], 'seconds': elapsed,
+                      'baseline_rss_mb': baseline, 'peak_rss_mb': rss_mb(), 'rollup_drift': len(drift)}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[20_000, 200_000])
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child, args.batch_size)
+        return
+
+    # Siembra el usuario una sola vez y copia la base de datos vacía para cada importación (en modo
+    # rollback journal, para que la copia no dependa del archivo -wal; los hijos usan WAL)
+    workdir = tempfile.mkdtemp(prefix='bench_import_')
+    template = os.path.join(workdir, 'template.db')
+    os.environ['SQLITE_TUNING'] = '0'
+    seed(load_app(template), users=1, years=0)
+    for rows in args.rows:
+        csv_path, jsonl_path = write_files(workdir, rows)
+        for file_format, path in (('csv', csv_path), ('jsonl', jsonl_path)):
+            db_path = os.path.join(workdir, f'{file_format}_{rows}.db')
+            shutil.copyfile(template, db_path)
+            result = json.loads(subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', db_path, path, file_format,
+                 '--batch-size', str(args.batch_size)],
+                env={**os.environ, 'SQLITE_TUNING': '1'}, check=True, capture_output=True, text=True).stdout)
+            print(f"{rows:>8} filas {file_format:5s}: {result['imported']} importadas, {result['failed']} con errores, "
+                  f"{result['imported'] / result['seconds']:8.0f} filas/s, RSS +{result['peak_rss_mb'] - result['baseline_rss_mb']:.1f} MB"
+                  f" (pico {result['peak_rss_mb']:.1f} MB), diferencias en monthly_rollup: {result['rollup_drift']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# bench/bench_login.py
+# Pico de inicios de sesión: --clients hilos hacen login a la vez (como los hilos de un worker
+# gthread) mientras otro hilo pide /api/services con una sesión ya abierta. Compara el hash
+# limitado de passwords.py (--hash-workers a la vez) con uno sin límite práctico, y comprueba que
+# un hash guardado con parámetros antiguos se rehace al iniciar sesión.
+#
+# Uso: python bench/bench_login.py [--clients 8] [--logins 64] [--hash-workers 2]
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from datagen import BENCH_PASSWORD, load_app, percentile, seed
+
+
+def run(app_module, usernames, clients, logins, reader_user_id):
+    app = app_module.app
+    latencies, busy = [], [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login_worker(names):
+        client = app.test_client()
+        for name in names:
+            start = time.perf_counter()
+            response = client.post('/login', data={'username': name, 'password': BENCH_PASSWORD})
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if response.status_code == 503:
+                    busy[0] += 1
+                else:
+                    latencies.append(elapsed)
+            client.get('/logout')
+
+    # Otra petición cualquiera durante el pico: mide si los logins dejan sin CPU al resto
+    reads = []
+
+    def reader():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(reader_user_id)
+            sess['_fresh'] = True
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/api/services?month=2026-03')
+            reads.append((time.perf_counter() - start) * 1000)
+
+    plan = [usernames[i % len(usernames)] for i in range(logins)]
+    threads = [threading.Thread(target=login_worker, args=(plan[i::clients],)) for i in range(clients)]
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    done.set()
+    reader_thread.join()
+    return {
+        'logins_per_s': len(latencies) / wall,
+        'login_p50_ms': statistics.median(latencies),
+        'login_p95_ms': percentile(latencies, 0.95),
+        'busy_503': busy[0],
+        'other_p50_ms': statistics.median(reads),
+        'other_p95_ms': percentile(reads, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--hash-workers', type=int, default=2)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_login_'), 'bench.db')
+    app_module = load_app(db_path)
+    from passwords import PasswordHasher
+
+    user_ids = seed(app_module, users=args.clients, years=1)
+    usernames = [f'bench_user_{n}' for n in range(args.clients)]
+    method = app_module.app.config['PASSWORD_HASH_METHOD']
+
+    variants = (
+        (f'limitado ({args.hash_workers} a la vez)', PasswordHasher(method, max_workers=args.hash_workers)),
+        ('sin límite', PasswordHasher(method, max_workers=args.clients, max_waiting=args.clients)),
+    )
+    print(f"{args.clients} clientes, {args.logins} logins, {method}, {os.cpu_count()} CPU")
+    for label, hasher in variants:
+        app_module.password_hasher = hasher
+        stats = run(app_module, usernames, args.clients, args.logins, user_ids[0])
+        print(f"{label:22s} {stats['logins_per_s']:6.1f} logins/s  login p50/p95 {stats['login_p50_ms']:7.1f}/"
+              f"{stats['login_p95_ms']:7.1f} ms  503: {stats['busy_503']}  "
+              f"otras peticiones p50/p95 {stats['other_p50_ms']:6.1f}/{stats['other_p95_ms']:6.1f} ms")
+
+    # Rehash: un hash pbkdf2 antiguo pasa a la política actual tras un login correcto
+    app_module.password_hasher = variants[0][1]
+    with app_module.app.app_context():
+        user = app_module.db.session.get(app_module.User, user_ids[0])
+        user.password_hash = PasswordHasher('pbkdf2:sha256:100000').hash(BENCH_PASSWORD)
+        app_module.db.session.commit()
+    app_module.app.test_client().post('/login', data={'username': usernames[0], 'password': BENCH_PASSWORD})
+    with app_module.app.app_context():
+        stored = app_module.db.session.get(app_module.User, user_ids[0]).password_hash
+    assert not app_module.password_hasher.needs_rehash(stored), stored[:40]
+    print(f"Rehash al iniciar sesión: pbkdf2:sha256:100000 -> {stored.split('$', 1)[0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# bench/bench_month_query.py
+# Compara el filtro mensual antiguo (extract year/month) con el rango semiabierto de
+# service_month_filter(), con y sin el índice compuesto (user_id, date, entry_time).
+#
+# Uso: python bench/bench_month_query.py [--users 20] [--years 10] [--repeat 200]
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from datagen import load_app, seed
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--month', default='2026-03')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_month_'), 'bench.db')
+    app_module = load_app(db_path)
+    app, db, Service = app_module.app, app_module.db, app_module.Service
+    user_ids = seed(app_module, users=args.users, years=args.years)
+    user_id = user_ids[len(user_ids) // 2]
+    year, month = map(int, args.month.split('-'))
+
+    def old_query():
+        return Service.query.filter_by(user_id=user_id).filter(
+            db.extract('year', Service.date) == year,
+            db.extract('month', Service.date) == month
+        ).order_by(Service.date.asc(), Service.entry_time.asc()).all()
+
+    def new_query():
+        return Service.query.filter(*app_module.service_month_filter(user_id, args.month)).order_by(
+            Service.date.asc(), Service.entry_time.asc()
+        ).all()
+
+    index = next(i for i in Service.__table__.indexes if i.name == 'ix_service_user_date_entry')
+    with app.app_context():
+        total = db.session.query(Service).count()
+        print(f"Filas de servicio: {total} ({args.users} usuarios x {args.years} años)")
+        assert len(old_query()) == len(new_query())
+
+        index.drop(bind=db.engine)
+        before = timed(old_query, args.repeat)
+        index.create(bind=db.engine)
+        old_indexed = timed(old_query, args.repeat)
+        after = timed(new_query, args.repeat)
+
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT * FROM service WHERE user_id = :u "
+            "AND date >= :a AND date < :b ORDER BY date, entry_time"
+        ), {'u': user_id, 'a': f'{args.month}-01', 'b': '9999-12-31'}).fetchall()
+
+    print(f"extract() sin índice compuesto : {before:8.3f} ms (mediana)")
+    print(f"extract() con índice compuesto : {old_indexed:8.3f} ms (mediana)")
+    print(f"rango con índice compuesto     : {after:8.3f} ms (mediana)")
+    print(f"Mejora: x{before / after:.1f}")
+    print("Plan de la consulta nueva:", '; '.join(row[-1] for row in plan))
+
+
+if __name__ == '__main__':
+    main()
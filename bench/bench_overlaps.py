@@ -0,0 +1,79 @@
+# bench/bench_overlaps.py
+# Detección de servicios solapados. Siembra usuarios con dos turnos al día (así hay solapes de
+# verdad, incluidos los nocturnos) y compara la pasada única de audit_overlaps() con un self-join
+# por usuario y fecha (cada servicio contra los de su día y el siguiente), comprobando que los dos
+# encuentran los mismos pares. También mide la comprobación al guardar (find_overlapping_service).
+#
+# Uso: python bench/bench_overlaps.py [--users 10] [--years 5] [--checks 2000]
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from datagen import SHIFTS, load_app, seed
+
+
+# date(a.date, '+1 day') es la suma de fechas de SQLite
+def self_join_pairs(app_module):
+    db, Service = app_module.db, app_module.Service
+    a, b = db.aliased(Service), db.aliased(Service)
+    rows = db.session.execute(
+        db.select(a.id, a.date, a.entry_time, a.exit_time, b.id, b.date, b.entry_time, b.exit_time)
+        .join(b, db.and_(b.user_id == a.user_id, b.date >= a.date, b.date <= db.func.date(a.date, '+1 day'),
+                         db.tuple_(b.date, b.entry_time, b.id) > db.tuple_(a.date, a.entry_time, a.id)))
+    )
+    pairs = set()
+    for a_id, a_date, a_entry, a_exit, b_id, b_date, b_entry, b_exit in rows:
+        a_start, a_end = app_module.service_interval(a_date, a_entry, a_exit)
+        b_start, b_end = app_module.service_interval(b_date, b_entry, b_exit)
+        if a_start < a_end and b_start < b_end and a_start < b_end and b_start < a_end:
+            pairs.add((a_id, b_id))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--checks', type=int, default=2000)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_overlaps_'), 'bench.db')
+    app_module = load_app(db_path)
+    user_ids = seed(app_module, users=args.users, years=args.years, shifts_per_day=2, tasks=False)
+
+    with app_module.app.app_context():
+        db = app_module.db
+        total = db.session.query(db.func.count(app_module.Service.id)).scalar()
+
+        start = time.perf_counter()
+        sweep = {(first.id, second.id) for first, second in app_module.audit_overlaps()}
+        sweep_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        joined = self_join_pairs(app_module)
+        join_s = time.perf_counter() - start
+        assert sweep == joined, (len(sweep), len(joined))
+
+        rng = random.Random(7)
+        samples = []
+        first_day = app_module.Service.query.order_by(app_module.Service.date).first().date
+        for _ in range(args.checks):
+            day = first_day + timedelta(days=rng.randrange(365 * args.years))
+            entry, exit_, _ = rng.choice(SHIFTS)
+            start = time.perf_counter()
+            app_module.find_overlapping_service(rng.choice(user_ids), day, entry, exit_)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    print(f"{total} servicios, {args.users} usuarios, {len(sweep)} pares solapados")
+    print(f"audit_overlaps (una pasada) {sweep_s * 1000:8.1f} ms")
+    print(f"self-join por fecha         {join_s * 1000:8.1f} ms  (mismos pares: sí)")
+    print(f"find_overlapping_service    p50 {statistics.median(samples):.3f} ms  "
+          f"p99 {sorted(samples)[int(0.99 * (len(samples) - 1))]:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
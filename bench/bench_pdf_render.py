@@ -0,0 +1,160 @@
+# bench/bench_pdf_render.py
+# Compara el tiempo y la memoria pico de reports.build_services_pdf con el renderizador anterior
+# para meses de 31, 500 y 5.000 filas.
+#
+# Uso: python bench/bench_pdf_render.py [--rows 31 500 5000] [--repeat 3]
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from io import BytesIO
+
+from datagen import OBSERVATIONS, PLACES, SHIFTS, _worked_hours  # Ajusta sys.path a la raíz del repo
+import reports
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+
+# Renderizador anterior (un Paragraph por celda, estilos nuevos en cada llamada, una sola tabla),
+# copiado aquí como referencia para comparar.
+def legacy_build_services_pdf(services, username, month_str, total_hours):
+    year, month = map(int, month_str.split('-'))
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4)) # Changed to landscape A4
+    styles = getSampleStyleSheet()
+    
+    # Custom style for table cells to handle long text
+    # Corrected: Use TA_CENTER, TA_LEFT from reportlab.lib.enums
+    styles.add(ParagraphStyle(name='TableContentCenter', fontSize=7, leading=9, alignment=TA_CENTER))
+    styles.add(ParagraphStyle(name='TableContentLeft', fontSize=7, leading=9, alignment=TA_LEFT))
+
+    story = []
+
+    # Title
+    month_name = [
+        "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+        "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+    ][month - 1]
+    title_text = f"Reporte de Horas Trabajadas para el mes de {month_name} {year}"
+    story.append(Paragraph(title_text, styles['h1']))
+    story.append(Spacer(1, 0.2 * inch))
+
+    # User Info
+    story.append(Paragraph(f"Usuario: <b>{username}</b>", styles['Normal']))
+    story.append(Spacer(1, 0.1 * inch))
+
+    # Table Data
+    # Removed 'Tareas Específicas' column
+    data = [['Fecha', 'Lugar', 'Entrada', 'Descanso (min)', 'Salida', 'Horas', 'Observaciones']]
+    for service_date, place, entry_time, break_duration, exit_time, worked_hours, observations in services:
+        # Using Paragraph for observations to allow word wrapping
+        obs_paragraph = Paragraph(observations if observations else '', styles['TableContentLeft'])
+
+        data.append([
+            Paragraph(service_date.strftime('%d/%m/%Y'), styles['TableContentCenter']), # Use TableContentCenter
+            Paragraph(place, styles['TableContentLeft']),
+            Paragraph(entry_time.strftime('%H:%M'), styles['TableContentCenter']), # Use TableContentCenter
+            Paragraph(str(break_duration), styles['TableContentCenter']), # Use TableContentCenter
+            Paragraph(exit_time.strftime('%H:%M'), styles['TableContentCenter']), # Use TableContentCenter
+            Paragraph(f"{worked_hours:.2f}", styles['TableContentCenter']), # Use TableContentCenter
+            obs_paragraph # Use the Paragraph object
+        ])
+
+    # Define column widths for landscape A4 (297mm width)
+    # Total width of page is ~11.69 inches. Let's use 10.5 inches for table width (756 points)
+    # Distribute 10.5 inches among 7 columns
+    # Fecha, Lugar, Entrada, Descanso, Salida, Horas, Observaciones
+    # Weights: 1.0, 1.5, 1.0, 1.0, 1.0, 1.0, 3.0 (approximate proportions)
+    # Total weight = 9.5
+    # Let's define fixed widths in points for better control, summing up to a bit less than page width
+    # A4 landscape width = 841.89 points. Let's aim for ~780 points total width.
+    col_widths_pts = [
+        60,  # Fecha (approx 21mm)
+        120, # Lugar (approx 42mm)
+        60,  # Entrada (approx 21mm)
+        60,  # Descanso (approx 21mm)
+        60,  # Salida (approx 21mm)
+        60,  # Horas (approx 21mm)
+        360  # Observaciones (approx 127mm - much wider for wrapping)
+    ]
+    
+    table = Table(data, colWidths=col_widths_pts)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4CAF50')), # Header background
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke), # Header text color
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'), # Header alignment
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f2f2f2')), # Even rows background
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black), # Thinner grid lines
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('FONTSIZE', (0,0), (-1,-1), 7), # Smaller font for table content
+        # Specific column alignments for data rows
+        ('ALIGN', (0,1), (0,-1), 'CENTER'), # Fecha data
+        ('ALIGN', (1,1), (1,-1), 'LEFT'),   # Lugar data
+        ('ALIGN', (2,1), (5,-1), 'CENTER'), # Entrada, Descanso, Salida, Horas data
+        ('ALIGN', (6,1), (6,-1), 'LEFT'),   # Observaciones data
+    ]))
+    story.append(table)
+    story.append(Spacer(1, 0.2 * inch))
+
+    # Total Hours
+    story.append(Paragraph(f"<b>Total de Horas Trabajadas: {total_hours:.2f}</b>", styles['h2']))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def sample_rows(count, seed_value=1234):
+    rng = random.Random(seed_value)
+    day = date(2026, 9, 1)
+    rows = []
+    for n in range(count):
+        entry, exit_, break_minutes = rng.choice(SHIFTS)
+        rows.append((day + timedelta(days=n // 3), rng.choice(PLACES), entry, break_minutes, exit_,
+                     _worked_hours(entry, exit_, break_minutes), rng.choice(OBSERVATIONS)))
+    return rows
+
+
+def measure(build, rows, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(rows, 'bench_user', '2026-09', 123.0)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    build(rows, 'bench_user', '2026-09', 123.0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='*', default=[31, 500, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # Calentamiento: imports perezosos de ReportLab y estilos cacheados de reports.py
+    reports.build_services_pdf(sample_rows(5), 'bench_user', '2026-09', 1.0)
+    legacy_build_services_pdf(sample_rows(5), 'bench_user', '2026-09', 1.0)
+
+    print(f"{'filas':>6} {'antes (s)':>10} {'ahora (s)':>10} {'mejora':>7} {'antes (MB)':>11} {'ahora (MB)':>11}")
+    for count in args.rows:
+        rows = sample_rows(count)
+        old_time, old_peak = measure(legacy_build_services_pdf, rows, args.repeat)
+        new_time, new_peak = measure(reports.build_services_pdf, rows, args.repeat)
+        print(f"{count:>6} {old_time:>10.3f} {new_time:>10.3f} {old_time / new_time:>6.1f}x "
+              f"{old_peak:>11.1f} {new_peak:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# bench/bench_search.py
+# Compara la búsqueda antigua (ILIKE '%texto%' sobre lugar y observaciones) con
+# search_services(), que usa la tabla FTS5 'service_fts', en todo el historial de un usuario.
+# Mide la primera página y el total de horas de la búsqueda (el SUM que hace index()).
+# Ojo: ILIKE sin ranking puede cortar en cuanto encuentra 50 filas, así que con términos muy
+# frecuentes la primera página por ILIKE sale barata; el SUM recorre siempre todo el historial.
+#
+# Uso: python bench/bench_search.py [--users 20] [--years 10] [--repeat 100] [--query "camión"]
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from datagen import load_app, seed
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--query', default='camión')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_search_'), 'bench.db')
+    app_module = load_app(db_path)
+    app, db, Service = app_module.app, app_module.db, app_module.Service
+    user_ids = seed(app_module, users=args.users, years=args.years)
+    user_id = user_ids[len(user_ids) // 2]
+    columns = app_module.SERVICE_ITEM_COLUMNS
+    text = args.query
+
+    def old_search():
+        return db.session.execute(
+            db.select(*columns).where(
+                Service.user_id == user_id,
+                Service.place.ilike(f'%{text}%') | Service.observations.ilike(f'%{text}%')
+            ).order_by(Service.date.desc(), Service.id.desc()).limit(50)
+        ).all()
+
+    def new_search():
+        return app_module.search_services(user_id, text, columns, per_page=50)[0]
+
+    def old_total():
+        return db.session.query(db.func.sum(Service.worked_hours)).filter(
+            Service.user_id == user_id,
+            Service.place.ilike(f'%{text}%') | Service.observations.ilike(f'%{text}%')
+        ).scalar()
+
+    def new_total():
+        return db.session.query(db.func.sum(Service.worked_hours)).filter(
+            app_module.service_text_filter(user_id, text)
+        ).scalar()
+
+    def count_matches():
+        return db.session.query(Service.id).filter(
+            app_module.service_text_filter(user_id, text)
+        ).count()
+
+    with app.app_context():
+        total = db.session.query(Service).count()
+        print(f"Filas de servicio: {total} ({args.users} usuarios x {args.years} años)")
+        print(f"Coincidencias de '{text}' para el usuario: {count_matches()}")
+        before = timed(old_search, args.repeat)
+        after = timed(new_search, args.repeat)
+        total_before = timed(old_total, args.repeat)
+        total_after = timed(new_total, args.repeat)
+
+    print(f"ILIKE '%texto%' (primera página) : {before:8.3f} ms (mediana)")
+    print(f"FTS5 por relevancia (1ª página)  : {after:8.3f} ms (mediana)")
+    print(f"ILIKE '%texto%' (SUM de horas)   : {total_before:8.3f} ms (mediana)")
+    print(f"FTS5 (SUM de horas)              : {total_after:8.3f} ms (mediana)")
+    print(f"Mejora en el SUM: x{total_before / total_after:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# bench/bench_startup.py
+# Coste de arrancar un worker:
+# - importación en frío de app.py con `python -X importtime` (mediana de --runs procesos nuevos) y lo
+#   que costaría además ReportLab (reports.py), que app.py ya no importa al arrancar;
+# - tiempo hasta la primera respuesta (una página y un PDF) en un proceso nuevo, con la caché de
+#   bytecode de Jinja vacía y ya rellena;
+# - lo mismo en un proceso creado con fork desde un "maestro" que ya ha importado la aplicación,
+#   ReportLab y las plantillas (lo que hace gunicorn.conf.py con preload_app), que es lo que paga
+#   un worker de gunicorn al arrancar o reiniciarse.
+#
+# Uso: python bench/bench_startup.py [--runs 5]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from datagen import ROOT, load_app, seed
+
+# Cuerpo de los procesos hijos: importa la aplicación, pide una página y un PDF y mide cada paso
+CHILD = r'''
+import gc, json, os, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+
+def first_requests():
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = sys.argv[1]
+    t0 = time.perf_counter()
+    assert client.get('/month/2026-03').status_code == 200
+    t1 = time.perf_counter()
+    assert client.get('/month/2026-03/pdf').status_code == 200
+    t2 = time.perf_counter()
+    return (t1 - t0) * 1000, (t2 - t1) * 1000
+
+if sys.argv[2] == 'preload':
+    import reports
+    app.warm_templates()
+    gc.freeze()
+    read_fd, write_fd = os.pipe()
+    forked = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        with app.app.app_context():
+            app.db.engine.dispose(close=False)
+        page_ms, pdf_ms = first_requests()
+        os.write(write_fd, json.dumps({'import_ms': 0.0, 'page_ms': page_ms, 'pdf_ms': pdf_ms,
+                                       'to_first_ms': (time.perf_counter() - forked) * 1000 - pdf_ms}).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    print(os.read(read_fd, 65536).decode())
+else:
+    page_ms, pdf_ms = first_requests()
+    print(json.dumps({'import_ms': (imported - start) * 1000, 'page_ms': page_ms, 'pdf_ms': pdf_ms,
+                      'to_first_ms': (imported - start) * 1000 + page_ms}))
+'''
+
+
+def import_time_ms(module, env):
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True).stderr
+    for line in reversed(output.splitlines()):
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f'{module} no aparece en la salida de -X importtime')
+
+
+# Cada hijo con su propia caché de informes, para que el PDF se genere de verdad
+def run_child(env, user_id, mode):
+    env = dict(env, REPORT_CACHE_DIR=tempfile.mkdtemp(prefix='reports_', dir=env['WORKDIR']))
+    output = subprocess.run([sys.executable, '-c', CHILD, str(user_id), mode],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    db_path = os.path.join(workdir, 'bench.db')
+    os.environ['SQLITE_TUNING'] = '0'
+    user_id = seed(load_app(db_path), users=1, years=1)[0]
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", REPORT_CACHE_DIR=os.path.join(workdir, 'reports'),
+               JINJA_CACHE_DIR=os.path.join(workdir, 'jinja'), WORKDIR=workdir)
+
+    app_ms = statistics.median(import_time_ms('app', env) for _ in range(args.runs))
+    reports_ms = statistics.median(import_time_ms('reports', env) for _ in range(args.runs))
+    print(f"Importación en frío (-X importtime, mediana de {args.runs}): app {app_ms:.0f} ms; "
+          f"reports/ReportLab, diferido al primer PDF: {reports_ms:.0f} ms")
+
+    def summary(label, results):
+        keys = ('import_ms', 'page_ms', 'pdf_ms', 'to_first_ms')
+        medians = {key: statistics.median(result[key] for result in results) for key in keys}
+        print(f"{label:38s} importar {medians['import_ms']:6.0f} ms  primera página {medians['page_ms']:6.1f} ms  "
+              f"primer PDF {medians['pdf_ms']:6.1f} ms  hasta la primera respuesta {medians['to_first_ms']:6.0f} ms")
+
+    # Caché de Jinja vacía en cada proceso
+    cold = []
+    for n in range(args.runs):
+        cold.append(run_child(dict(env, JINJA_CACHE_DIR=os.path.join(workdir, f'jinja_cold_{n}')), user_id, 'cold'))
+    summary('Proceso nuevo, caché de Jinja vacía', cold)
+    run_child(env, user_id, 'cold') # Rellena la caché compartida
+    summary('Proceso nuevo, caché de Jinja rellena', [run_child(env, user_id, 'cold') for _ in range(args.runs)])
+    summary('Fork de un maestro precargado', [run_child(env, user_id, 'preload') for _ in range(args.runs)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# bench/bench_user_cache.py
+# Cuenta las sentencias SQL por petición autenticada con y sin la caché de usuarios de
+# load_user (user_cache.py), y comprueba que un cambio de nombre en /profile se ve al momento.
+#
+# Uso: python bench/bench_user_cache.py [--repeat 200]
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from datagen import load_app, seed
+
+PAGES = ['/', '/tasks_summary', '/api/services?month=2026-03']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_user_'), 'bench.db')
+    app_module = load_app(db_path)
+    app, db, User = app_module.app, app_module.db, app_module.User
+    user_id = seed(app_module, users=2, years=1)[0]
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a, **kw: statements.append(a[2]))
+        user_sql = str(db.select(User.id, User.username).where(User.id == 0).compile(db.engine)).split(' WHERE')[0]
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+    def measure(path, cached):
+        counts, user_counts, samples = [], [], []
+        for _ in range(args.repeat):
+            if not cached:
+                app_module.user_cache.clear()
+            del statements[:]
+            start = time.perf_counter()
+            response = client.get(path)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, (path, response.status_code)
+            counts.append(len(statements))
+            user_counts.append(sum(1 for sql in statements if sql.startswith(user_sql)))
+        return statistics.median(counts), statistics.median(user_counts), statistics.median(samples)
+
+    for path in PAGES:
+        client.get(path) # Calienta plantillas y caché
+        no_cache = measure(path, cached=False)
+        with_cache = measure(path, cached=True)
+        print(f"{path:32s} sin caché: {no_cache[0]:.0f} SQL ({no_cache[1]:.0f} de user), {no_cache[2]:6.2f} ms"
+              f" | con caché: {with_cache[0]:.0f} SQL ({with_cache[1]:.0f} de user), {with_cache[2]:6.2f} ms")
+
+    # Cambio de nombre: profile() invalida la entrada y la siguiente página muestra el nombre nuevo
+    client.post('/profile', data={'username': 'renombrado'})
+    page = client.get('/profile').get_data(as_text=True)
+    assert 'renombrado' in page, "la caché no se invalidó tras cambiar el nombre"
+    print("Cambio de nombre visible tras /profile: ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# bench/bench_workers.py
+# Compara los tipos de worker de gunicorn.conf.py (sync, gthread y gevent) con 50, 200 y 1000
+# clientes a la vez. El tráfico es el habitual: páginas del mes (/month, /tasks), que son consultas
+# pequeñas, y un --pdf-ratio de PDFs generados de verdad (caché de informes desactivada), que son
+# trabajo de CPU. Informa peticiones/s, p50/p99 de las páginas, p99 de los PDFs y errores
+# (respuestas distintas de 200, conexiones rechazadas y peticiones que superan --timeout).
+# Necesita gunicorn y gevent. Los clientes son greenlets en un proceso aparte; en una máquina con
+# pocas CPUs compiten con el servidor, así que compara tipos de worker entre sí, no en absoluto.
+#
+# Uso: python bench/bench_workers.py [--classes sync,gthread,gevent] [--clients 50 200 1000]
+#                                    [--seconds 15] [--workers 2] [--threads 8]
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from datagen import load_app, seed
+from loadtest import start_gunicorn
+
+MONTHS = [f'2026-{month:02d}' for month in range(1, 10)]
+
+
+# Proceso cliente: `clients` greenlets piden páginas y PDFs durante `seconds` segundos
+def client(base_url, clients, seconds, cookies, pdf_ratio, timeout):
+    from gevent import monkey
+    monkey.patch_all()
+    import http.client
+    import statistics
+    from urllib.parse import urlsplit
+
+    import gevent.pool
+
+    host, port = urlsplit(base_url).hostname, urlsplit(base_url).port
+    pages, pdfs, errors = [], [], [0]
+    deadline = time.monotonic() + seconds
+
+    def run(n):
+        rng = random.Random(n)
+        cookie = cookies[n % len(cookies)]
+        connection = None
+        while time.monotonic() < deadline:
+            is_pdf = rng.random() < pdf_ratio
+            month = rng.choice(MONTHS)
+            path = f'/month/{month}/pdf' if is_pdf else rng.choice((f'/month/{month}', f'/tasks/{month}'))
+            start = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+                connection.request('GET', path, headers={'Cookie': cookie})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200: # Una redirección a /login también sería un fallo
+                    raise OSError(response.status)
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                if connection is not None:
+                    connection.close()
+                connection = None
+                continue
+            (pdfs if is_pdf else pages).append((time.perf_counter() - start) * 1000)
+
+    started = time.monotonic()
+    pool = gevent.pool.Pool(clients)
+    for n in range(clients):
+        pool.spawn(run, n)
+    pool.join()
+    elapsed = time.monotonic() - started
+
+    def pct(samples, fraction):
+        ordered = sorted(samples)
+        return round(ordered[min(len(ordered) - 1, int(fraction * (len(ordered) - 1)))], 1) if ordered else None
+
+    print(json.dumps({
+        'rps': round((len(pages) + len(pdfs)) / elapsed, 1),
+        'page_p50_ms': round(statistics.median(pages), 1) if pages else None,
+        'page_p99_ms': pct(pages, 0.99),
+        'pdf_p99_ms': pct(pdfs, 0.99),
+        'errors': errors[0],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--classes', default='sync,gthread,gevent')
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help="Hilos por worker con gthread")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--pdf-ratio', type=float, default=0.05)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--client', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        base_url, cookies_path = args.client
+        with open(cookies_path, encoding='utf-8') as cookies_file:
+            cookies = json.load(cookies_file)
+        client(base_url, args.clients[0], args.seconds, cookies, args.pdf_ratio, args.timeout)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_workers_')
+    db_path = os.path.join(workdir, 'bench.db')
+    app_module = load_app(db_path)
+    user_ids = seed(app_module, users=args.users, years=1)
+    # Cookies de sesión firmadas con la SECRET_KEY de la aplicación: sin pasar por /login (scrypt)
+    app = app_module.app
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookies = [f"{app.config['SESSION_COOKIE_NAME']}={serializer.dumps({'_user_id': str(user_id), '_fresh': True})}"
+               for user_id in user_ids]
+    cookies_path = os.path.join(workdir, 'cookies.json')
+    with open(cookies_path, 'w', encoding='utf-8') as cookies_file:
+        json.dump(cookies, cookies_file)
+
+    results = {}
+    print(f"{args.workers} workers, {os.cpu_count()} CPU, {args.seconds:.0f} s por medida, {args.pdf_ratio:.0%} PDFs")
+    for worker_class in args.classes.split(','):
+        threads = args.threads if worker_class == 'gthread' else 1
+        server, base_url = start_gunicorn(db_path, os.path.join(workdir, 'report_cache'), args.workers, threads,
+                                          worker_class, extra_env={'REPORT_CACHE_MAX_BYTES': '0'})
+        try:
+            for clients in args.clients:
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--client', base_url, cookies_path,
+                     '--clients', str(clients), '--seconds', str(args.seconds),
+                     '--pdf-ratio', str(args.pdf_ratio), '--timeout', str(args.timeout)],
+                    check=True, capture_output=True, text=True).stdout
+                stats = json.loads(output.strip().splitlines()[-1])
+                results[f'{worker_class}/{clients}'] = stats
+                print(f"{worker_class:8s} {clients:5d} clientes  {stats['rps']:7.1f} req/s  páginas p50/p99 "
+                      f"{stats['page_p50_ms']}/{stats['page_p99_ms']} ms  PDF p99 {stats['pdf_p99_ms']} ms  "
+                      f"errores {stats['errors']}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
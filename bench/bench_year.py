@@ -0,0 +1,94 @@
+# bench/bench_year.py
+# Resumen anual (/year/AAAA) de un usuario con 10 años de historial: tiempo de los agregados
+# (year_rollups + year_summary, todo GROUP BY) frente a cargar los servicios del año como objetos
+# del ORM y agregar en Python, y latencia de la petición completa (consultas y plantilla) con el
+# cliente de pruebas de Flask. Falla (código 1) si el p95 de la petición supera --budget-ms.
+#
+# Uso: python bench/bench_year.py [--years 10] [--shifts-per-day 1] [--repeat 50] [--budget-ms 50]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from datagen import load_app, percentile, seed
+
+
+def timed_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    print(f"  {label:34s} p50 {statistics.median(samples):7.2f} ms  p95 {percentile(samples, 0.95):7.2f} ms")
+
+
+# Lo que haría la vista sin agregados: todos los servicios del año (y sus tareas) como objetos
+def orm_year_summary(app_module, user_id, year):
+    from datetime import date
+    from sqlalchemy.orm import selectinload
+    Service = app_module.Service
+    services = Service.query.options(selectinload(Service.tasks)).filter(
+        Service.user_id == user_id, Service.date >= date(year, 1, 1), Service.date < date(year + 1, 1, 1)).all()
+    months, places, tasks, days = defaultdict(float), defaultdict(float), Counter(), defaultdict(float)
+    for service in services:
+        months[service.date.month] += service.worked_hours
+        places[service.place] += service.worked_hours
+        days[service.date] += service.worked_hours
+        for task in service.tasks:
+            tasks[task.description] += task.duration
+    app_module.db.session.expunge_all()
+    return months, places, tasks.most_common(app_module.YEAR_TOP_TASKS), days
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--shifts-per-day', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--budget-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    app_module = load_app(os.path.join(tempfile.mkdtemp(prefix='bench_year_'), 'bench.db'))
+    user_id = seed(app_module, users=2, years=args.years, shifts_per_day=args.shifts_per_day)[0]
+    app, db, Service = app_module.app, app_module.db, app_module.Service
+    years = list(range(2026 - args.years + 1, 2027))
+
+    with app.app_context():
+        rows = db.session.query(Service).filter(Service.user_id == user_id).count()
+    print(f"Usuario con {rows} servicios en {args.years} años; {args.repeat} repeticiones por año")
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+    aggregate, orm, request_samples = [], [], []
+    with app.app_context():
+        for year in years:
+            aggregate += timed_ms(lambda: app_module.year_summary(
+                user_id, year, app_module.year_rollups(user_id, year)), args.repeat)
+            orm += timed_ms(lambda: orm_year_summary(app_module, user_id, year), args.repeat)
+    for year in years:
+        client.get(f'/year/{year}') # Compila la plantilla fuera de la medida
+        def get():
+            response = client.get(f'/year/{year}')
+            assert response.status_code == 200, response.status_code
+        request_samples += timed_ms(get, args.repeat)
+
+    report("agregados (GROUP BY)", aggregate)
+    report("objetos del ORM + Python", orm)
+    report("petición /year/AAAA completa", request_samples)
+    p95 = percentile(request_samples, 0.95)
+    if p95 > args.budget_ms:
+        sys.exit(f"p95 de /year/AAAA {p95:.2f} ms > {args.budget_ms} ms")
+
+
+if __name__ == '__main__':
+    main()
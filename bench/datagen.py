@@ -0,0 +1,158 @@
+# bench/datagen.py
+# Generador determinista de datos sintéticos para los benchmarks de bench/.
+# Con la misma semilla produce siempre las mismas filas, así dos ejecuciones son comparables.
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import date, time, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+PLACES = [
+    "Almacén Central", "Nave 2", "Muelle de carga", "Oficina", "Tienda Norte",
+    "Tienda Sur", "Centro Logístico", "Taller", "Cliente externo", "Recepción",
+]
+OBSERVATIONS = [
+    None, None, None, "Sin incidencias", "Inventario mensual", "Cubro turno de compañero",
+    "Descarga de camión con retraso", "Formación de personal nuevo", "Revisión de carretillas",
+]
+BENCH_PASSWORD = 'bench-password' # Contraseña de todos los usuarios que crea seed()
+TASKS = [  # Tareas específicas habituales; un servicio tiene 0-3 y su duración cabe en el turno
+    "Recepción de mercancía", "Inventario", "Preparación de pedidos", "Carga de camión",
+    "Descarga de camión", "Limpieza de zona", "Formación", "Reunión de equipo",
+    "Revisión de carretillas", "Etiquetado", "Control de calidad", "Atención al cliente",
+]
+SHIFTS = [  # (entrada, salida, descanso en minutos)
+    (time(8, 0), time(16, 0), 30),
+    (time(7, 0), time(15, 0), 30),
+    (time(14, 0), time(22, 0), 30),
+    (time(22, 0), time(6, 0), 45),  # Turno de noche: la salida cae al día siguiente
+    (time(9, 0), time(13, 0), 0),
+]
+
+
+# Importa app.py apuntando a una base de datos SQLite concreta. DATABASE_URL se lee al
+# importar app.py, así que hay que fijarla antes del primer import. Las cachés de informes y de
+# Jinja van a un directorio temporal (salvo que el script ya las haya fijado): por defecto
+# estarían en instance/, dentro del repositorio.
+def load_app(db_path):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(db_path)}"
+    if 'REPORT_CACHE_DIR' not in os.environ or 'JINJA_CACHE_DIR' not in os.environ:
+        cache_dir = tempfile.mkdtemp(prefix='bench_cache_')
+        os.environ.setdefault('REPORT_CACHE_DIR', os.path.join(cache_dir, 'report_cache'))
+        os.environ.setdefault('JINJA_CACHE_DIR', os.path.join(cache_dir, 'jinja_cache'))
+    import app as app_module
+    return app_module
+
+
+# Percentil de una lista de medidas (el valor de la posición más cercana), o None si está vacía.
+# Lo usan todos los scripts que informan de p50/p95/p99.
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))]
+
+
+def _worked_hours(entry, exit_, break_minutes):
+    start = entry.hour * 60 + entry.minute
+    end = exit_.hour * 60 + exit_.minute
+    if end < start:
+        end += 24 * 60
+    return max(0.0, (end - start - break_minutes) / 60)
+
+
+# Tareas específicas de un servicio como las guarda set_service_tasks(): lista de
+# {"description", "duration"} con duraciones en cuartos de hora que no superan el turno.
+def task_list(rng, worked_hours):
+    tasks = []
+    remaining = worked_hours
+    for description in rng.sample(TASKS, rng.choice((0, 0, 1, 1, 2, 3))):
+        duration = min(remaining, rng.randint(2, 12) / 4)
+        if duration <= 0:
+            break
+        tasks.append({"description": description, "duration": duration})
+        remaining -= duration
+    return tasks
+
+
+# Filas de servicio (dicts listos para un insert masivo) de un usuario durante `years` años
+# que terminan en `end`. shifts_per_day > 1 sirve para generar volúmenes grandes en pocos años.
+# Con tasks=True cada fila lleva además la clave 'tasks' (que seed() separa) y su copia JSON.
+def service_rows(user_id, years, rng, end=date(2026, 9, 30), shifts_per_day=1, tasks=False):
+    day = end - timedelta(days=365 * years)
+    while day <= end:
+        for _ in range(shifts_per_day):
+            if day.weekday() >= 6 or rng.random() >= 0.9:
+                continue
+            entry, exit_, break_minutes = rng.choice(SHIFTS)
+            worked_hours = _worked_hours(entry, exit_, break_minutes)
+            row = {
+                'user_id': user_id,
+                'date': day,
+                'place': rng.choice(PLACES),
+                'entry_time': entry,
+                'break_duration': break_minutes,
+                'exit_time': exit_,
+                'worked_hours': worked_hours,
+                'observations': rng.choice(OBSERVATIONS),
+                'specific_tasks': None,
+            }
+            if tasks:
+                row['tasks'] = task_list(rng, worked_hours)
+                row['specific_tasks'] = json.dumps(row['tasks']) if row['tasks'] else None
+            yield row
+        day += timedelta(days=1)
+
+
+# Crea `users` usuarios con `years` años de servicios cada uno. Devuelve los ids creados.
+# Con tasks=True también rellena service_task (y la copia JSON en specific_tasks).
+def seed(app_module, users=5, years=5, seed_value=1234, batch_size=5000, shifts_per_day=1, tasks=True):
+    from sqlalchemy import insert
+
+    app, db, User, Service, ServiceTask = (app_module.app, app_module.db, app_module.User,
+                                           app_module.Service, app_module.ServiceTask)
+    rng = random.Random(seed_value)
+    user_ids = []
+    with app.app_context():
+        db.create_all()
+        app_module.upgrade_schema()
+        # El hash es caro a propósito; con uno compartido basta para los benchmarks.
+        shared = User(username='bench_template')
+        shared.set_password(BENCH_PASSWORD)
+        for n in range(users):
+            user = User(username=f'bench_user_{n}', password_hash=shared.password_hash)
+            db.session.add(user)
+            db.session.flush()
+            user_ids.append(user.id)
+        db.session.commit()
+
+        # Los ids se asignan aquí para poder enlazar las tareas sin leerlos de vuelta
+        next_id = (db.session.query(db.func.max(Service.id)).scalar() or 0) + 1
+        batch, task_batch = [], []
+
+        def flush():
+            if batch:
+                db.session.execute(insert(Service), batch)
+            if task_batch:
+                db.session.execute(insert(ServiceTask), task_batch)
+            del batch[:], task_batch[:]
+
+        for user_id in user_ids:
+            for row in service_rows(user_id, years, rng, shifts_per_day=shifts_per_day, tasks=tasks):
+                row['id'] = next_id
+                next_id += 1
+                for task in row.pop('tasks', ()):
+                    task_batch.append({'service_id': row['id'], **task})
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    flush()
+        flush()
+        db.session.commit()
+        # El insert masivo no pasa por los eventos del ORM
+        app_module.rebuild_monthly_rollups()
+    return user_ids
@@ -0,0 +1,334 @@
+# bench/loadtest.py
+# Prueba de carga reproducible de las rutas reales de app.py sobre datos de datagen.py.
+#
+# Modos:
+#   --mode client    peticiones secuenciales con el cliente de pruebas de Flask (por defecto)
+#   --mode gunicorn  arranca gunicorn en local sobre la misma base de datos y lanza
+#                    --concurrency clientes HTTP a la vez (necesita gunicorn instalado);
+#                    --worker-class sync|gthread|gevent elige el tipo de worker de gunicorn.conf.py
+#   --url URL        como gunicorn, pero contra un servidor ya arrancado (no siembra datos:
+#                    usa --db con la base de datos que sirve ese servidor, o datos propios)
+#
+# Por cada escenario informa p50/p95/p99, media, peticiones por segundo y errores, además de
+# la memoria máxima (RSS) del proceso que sirve las peticiones. Con -o guarda el resultado en
+# JSON, y con --compare anterior.json marca como regresión un p95 o un throughput que empeore
+# más de --tolerance (20% por defecto) y termina con código 1.
+#
+# Uso:
+#   python bench/loadtest.py --users 5 --years 5 --requests 200 -o results/base.json
+#   python bench/loadtest.py --mode gunicorn --workers 2 --concurrency 8 --compare results/base.json
+import argparse
+import contextlib
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from datagen import BENCH_PASSWORD, PLACES, ROOT, SHIFTS, TASKS, load_app, percentile, seed
+
+BENCH_MONTH = '2026-03' # Mes con datos para index, tasks_summary y download_pdf
+# Primer día de las altas de add_service (una por día, así ninguna se solapa); main() lo mueve
+# detrás del último servicio de la base de datos
+ADD_SERVICE_FIRST_DAY = date(2030, 1, 1)
+SEARCH_WORDS = sorted({word for place in PLACES for word in place.lower().split() if len(word) > 3})
+
+
+# Cada escenario devuelve (método, ruta, datos del formulario) para la petición número i
+def _index(rng, i):
+    return 'GET', f'/month/{BENCH_MONTH}', None
+
+def _search(rng, i):
+    return 'GET', '/api/services/search?' + urllib.parse.urlencode({'q': rng.choice(SEARCH_WORDS)}), None
+
+def _export_csv(rng, i):
+    year = rng.randint(2017, 2025)
+    return 'GET', f'/export_csv?start={year}-01-01&end={year}-12-31', None
+
+def _download_pdf(rng, i):
+    return 'GET', f'/month/{BENCH_MONTH}/pdf', None
+
+def _tasks_summary(rng, i):
+    return 'GET', f'/tasks/{BENCH_MONTH}', None
+
+def _add_service(rng, i):
+    entry, exit_, break_minutes = rng.choice(SHIFTS)
+    task = rng.choice(TASKS)
+    return 'POST', '/add_service', {
+        'date': (ADD_SERVICE_FIRST_DAY + timedelta(days=i)).isoformat(),
+        'place': rng.choice(PLACES),
+        'entry_time': entry.strftime('%H:%M'),
+        'exit_time': exit_.strftime('%H:%M'),
+        'break_duration': str(break_minutes),
+        'observations': 'Alta desde loadtest',
+        'specific_task_description[]': [task],
+        'specific_task_duration[]': ['1.5'],
+    }
+
+# El PDF se guarda en la caché de informes tras la primera petición: este escenario mide
+# sobre todo el camino con caché (ETag y lectura de disco), que es el habitual en producción.
+SCENARIOS = {
+    'index': _index,
+    'search': _search,
+    'export_csv': _export_csv,
+    'download_pdf': _download_pdf,
+    'tasks_summary': _tasks_summary,
+    'add_service': _add_service,
+}
+
+
+class ClientDriver:
+    def __init__(self, client):
+        self.client = client
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        body = response.get_data() # Consume también las respuestas en streaming (CSV)
+        return response.status_code, len(body), response.headers.get('Location')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=120) as response:
+                return response.status, len(response.read()), response.headers.get('Location')
+        except urllib.error.HTTPError as error: # Incluye las redirecciones 302, que no se siguen
+            return error.code, len(error.read()), error.headers.get('Location')
+
+
+# Inicia sesión como lo haría un usuario desde el navegador; el mes va en la URL de cada escenario
+def prepare(driver, username):
+    status, _, _ = driver.request('POST', '/login', {'username': username, 'password': BENCH_PASSWORD})
+    if status not in (200, 302):
+        raise RuntimeError(f"No se pudo iniciar sesión como {username} (HTTP {status})")
+    return driver
+
+
+def summarize(samples, errors, wall_seconds):
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'p50_ms': round(percentile(samples, 0.50), 3),
+        'p95_ms': round(percentile(samples, 0.95), 3),
+        'p99_ms': round(percentile(samples, 0.99), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'throughput_rps': round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+    }
+
+
+# Lanza `requests` peticiones del escenario repartidas entre los drivers (uno por cliente concurrente)
+def run_scenario(name, drivers, requests, seed_value):
+    make = SCENARIOS[name]
+    plan = [make(random.Random(f'{seed_value}:{name}:{i}'), i) for i in range(requests)]
+    per_driver = [plan[i::len(drivers)] for i in range(len(drivers))]
+
+    def worker(driver, items):
+        samples, errors = [], 0
+        for method, path, data in items:
+            start = time.perf_counter()
+            status, _, location = driver.request(method, path, data)
+            samples.append((time.perf_counter() - start) * 1000)
+            # Los formularios responden con una redirección: a otra página si se ha guardado y al
+            # mismo formulario (con el mensaje de error) si se ha rechazado
+            if status >= 400 or (location and urllib.parse.urlsplit(location).path == urllib.parse.urlsplit(path).path):
+                errors += 1
+        return samples, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(drivers)) as pool:
+        results = list(pool.map(worker, drivers, per_driver))
+    wall = time.perf_counter() - start
+    samples = [sample for result in results for sample in result[0]]
+    return summarize(samples, sum(result[1] for result in results), wall)
+
+
+# Día siguiente al último servicio guardado (con margen para el turno de noche), para que las altas
+# de add_service no choquen con los datos sembrados ni con las de una ejecución anterior
+def first_free_day(db_path):
+    if not db_path or not os.path.exists(db_path):
+        return ADD_SERVICE_FIRST_DAY
+    with contextlib.closing(sqlite3.connect(db_path)) as connection:
+        latest = connection.execute('SELECT max(date) FROM service').fetchone()[0]
+    if latest is None:
+        return ADD_SERVICE_FIRST_DAY
+    return max(ADD_SERVICE_FIRST_DAY, date.fromisoformat(latest) + timedelta(days=2))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# El tipo de worker y los hilos van por entorno, como los lee gunicorn.conf.py (y db_config.py)
+def start_gunicorn(db_path, cache_dir, workers, threads, worker_class='sync', extra_env=None):
+    try:
+        import gunicorn # noqa: F401
+    except ImportError:
+        sys.exit("El modo gunicorn necesita gunicorn instalado (pip install gunicorn).")
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.abspath(db_path)}", REPORT_CACHE_DIR=cache_dir,
+               GUNICORN_WORKER_CLASS=worker_class, GUNICORN_THREADS=str(threads), **(extra_env or {}))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit("gunicorn no ha arrancado en 30 segundos.")
+
+
+def peak_rss_mb(who):
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def compare(current, previous, tolerance):
+    regressions = []
+    for name, now in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if before.get('throughput_rps') and now['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {now['throughput_rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--url', help="Servidor ya arrancado (implica peticiones HTTP)")
+    parser.add_argument('--db', help="Base de datos SQLite a usar; si no existe se siembra")
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--requests', type=int, default=200, help="Peticiones por escenario")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--workers', type=int, default=2, help="Workers de gunicorn")
+    parser.add_argument('--threads', type=int, default=1, help="Hilos por worker de gunicorn")
+    parser.add_argument('--worker-class', choices=('sync', 'gthread', 'gevent'), default='sync')
+    parser.add_argument('--concurrency', type=int, default=4, help="Clientes HTTP simultáneos")
+    parser.add_argument('-o', '--output', help="Archivo JSON con los resultados")
+    parser.add_argument('--compare', help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix='bench_load_')
+    db_path = args.db or os.path.join(workdir, 'bench.db')
+    cache_dir = os.path.join(workdir, 'report_cache')
+    os.environ['REPORT_CACHE_DIR'] = cache_dir
+    usernames = [f'bench_user_{n}' for n in range(args.users)]
+
+    rows = None
+    if not args.url:
+        app_module = load_app(db_path)
+        if not (args.db and os.path.exists(db_path)):
+            seed(app_module, users=args.users, years=args.years, seed_value=args.seed)
+        with app_module.app.app_context():
+            rows = app_module.db.session.query(app_module.Service).count()
+
+    global ADD_SERVICE_FIRST_DAY
+    ADD_SERVICE_FIRST_DAY = first_free_day(db_path if not args.url or args.db else None)
+
+    server = None
+    if args.mode == 'client' and not args.url:
+        drivers = [prepare(ClientDriver(app_module.app.test_client()), usernames[0])]
+        memory_scope = resource.RUSAGE_SELF
+    else:
+        if args.url:
+            base_url = args.url
+        else:
+            server, base_url = start_gunicorn(db_path, cache_dir, args.workers, args.threads, args.worker_class)
+        drivers = [prepare(HttpDriver(base_url), usernames[n % len(usernames)]) for n in range(args.concurrency)]
+        memory_scope = resource.RUSAGE_CHILDREN
+
+    results = {}
+    try:
+        for name in scenarios:
+            results[name] = run_scenario(name, drivers, args.requests, args.seed)
+            stats = results[name]
+            print(f"{name:14s} p50 {stats['p50_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms  "
+                  f"p99 {stats['p99_ms']:9.2f} ms  {stats['throughput_rps']:8.1f} req/s  errores {stats['errors']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        'meta': {
+            'mode': 'url' if args.url else args.mode,
+            'users': args.users,
+            'years': args.years,
+            'seed': args.seed,
+            'service_rows': rows,
+            'requests_per_scenario': args.requests,
+            'concurrency': len(drivers),
+            'workers': args.workers if args.mode == 'gunicorn' and not args.url else None,
+            'threads': args.threads if args.mode == 'gunicorn' and not args.url else None,
+            'worker_class': args.worker_class if args.mode == 'gunicorn' and not args.url else None,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'peak_rss_mb': None if args.url else peak_rss_mb(memory_scope),
+        'scenarios': results,
+    }
+    print(f"Memoria máxima: {report['peak_rss_mb']} MB")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            regressions = compare(report, json.load(handle), args.tolerance)
+        for line in regressions:
+            print(f"REGRESIÓN {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# build_assets.py
+# Compila assets/app.css con Tailwind: solo las clases que usan las plantillas de templates/,
+# minificado, en static/css/app.<hash>.css. static/manifest.json guarda el nombre con el hash
+# y asset_url() de app.py lo usa para enlazarlo; como el nombre cambia con el contenido, el
+# navegador puede guardarlo un año sin volver a preguntar. Hay que volver a ejecutarlo (y
+# subir static/) cada vez que se cambian clases en las plantillas.
+#   python build_assets.py [--check]
+# Con --check no escribe nada: sale con código 1 si el CSS subido no corresponde a las plantillas.
+# Necesita el ejecutable de Tailwind v4 (pip install tailwindcss-bin) o su ruta en TAILWINDCSS_BIN.
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(ROOT, 'assets', 'app.css')
+STATIC_DIR = os.path.join(ROOT, 'static')
+MANIFEST = os.path.join(STATIC_DIR, 'manifest.json')
+LOGICAL_NAME = 'css/app.css' # Nombre que usan las plantillas: asset_url('css/app.css')
+
+tailwind = os.environ.get('TAILWINDCSS_BIN') or shutil.which('tailwindcss')
+if not tailwind:
+    sys.exit("No se encuentra Tailwind: instala tailwindcss-bin o indica la ruta en TAILWINDCSS_BIN.")
+
+with tempfile.TemporaryDirectory() as workdir:
+    output = os.path.join(workdir, 'app.css')
+    subprocess.run([tailwind, '--input', SOURCE, '--output', output, '--minify'],
+                   cwd=ROOT, check=True, capture_output=True)
+    with open(output, 'rb') as handle:
+        css = handle.read()
+
+digest = hashlib.sha256(css).hexdigest()[:12]
+built_name = f'css/app.{digest}.css'
+
+try:
+    with open(MANIFEST, encoding='utf-8') as handle:
+        manifest = json.load(handle)
+except FileNotFoundError:
+    manifest = {}
+
+if '--check' in sys.argv[1:]:
+    if manifest.get(LOGICAL_NAME) != built_name or not os.path.exists(os.path.join(STATIC_DIR, built_name)):
+        sys.exit(f"static/ no está al día: ejecuta python build_assets.py (se esperaba {built_name}).")
+    print(f"static/ al día ({built_name}).")
+    sys.exit(0)
+
+css_dir = os.path.join(STATIC_DIR, 'css')
+os.makedirs(css_dir, exist_ok=True)
+# Borra las versiones anteriores: las páginas nuevas ya enlazan la nueva
+for name in os.listdir(css_dir):
+    if name.startswith('app.') and name.endswith('.css') and f'css/{name}' != built_name:
+        os.remove(os.path.join(css_dir, name))
+with open(os.path.join(STATIC_DIR, built_name), 'wb') as handle:
+    handle.write(css)
+
+manifest[LOGICAL_NAME] = built_name
+with open(MANIFEST, 'w', encoding='utf-8') as handle:
+    json.dump(manifest, handle, indent=2, sort_keys=True)
+    handle.write('\n')
+print(f"{built_name}: {len(css) / 1024:.1f} KB")
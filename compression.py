@@ -0,0 +1,170 @@
+# compression.py
+# Compresión opcional de las respuestas (se activa con COMPRESSION=1, ver app.py) según la
+# cabecera Accept-Encoding del navegador: brotli si está instalado (pip install brotli) y el
+# navegador lo acepta, si no gzip. Solo comprime tipos de texto (HTML, CSV, JSON...) y deja
+# como están los PDF, las descargas ya comprimidas (?gzip=1 de export_csv) y los archivos de
+# send_file. Las respuestas en streaming se comprimen bloque a bloque sin leerlas enteras.
+# Bytes ahorrados y tiempo de CPU por algoritmo se publican en /metrics si INSTRUMENTATION=1.
+import threading
+import time
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset((
+    'text/html', 'text/csv', 'text/plain', 'text/css', 'text/javascript',
+    'application/json', 'application/javascript', 'image/svg+xml',
+))
+
+
+class _GzipEncoder:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits=31 -> formato gzip
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level, mode=brotli.MODE_TEXT)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {} # encoding -> [respuestas, bytes sin comprimir, bytes enviados, segundos de CPU]
+
+    def record(self, encoding, bytes_in, bytes_out, cpu_seconds):
+        with self._lock:
+            totals = self._totals.setdefault(encoding, [0, 0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += bytes_in
+            totals[2] += bytes_out
+            totals[3] += cpu_seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {encoding: list(totals) for encoding, totals in self._totals.items()}
+
+    def render(self):
+        totals = sorted(self.snapshot().items())
+        lines = []
+        for name, help_text, index, fmt in (
+            ('http_compressed_responses_total', 'Respuestas comprimidas por algoritmo.', 0, '{}'),
+            ('http_compression_input_bytes_total', 'Bytes antes de comprimir.', 1, '{}'),
+            ('http_compression_output_bytes_total', 'Bytes enviados tras comprimir.', 2, '{}'),
+            ('http_compression_cpu_seconds_total', 'Tiempo de CPU comprimiendo.', 3, '{:.6f}'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{{encoding="{encoding}"}} {fmt.format(values[index])}' for encoding, values in totals)
+        lines.append('# HELP http_compression_saved_bytes_total Bytes ahorrados por la compresión.')
+        lines.append('# TYPE http_compression_saved_bytes_total counter')
+        lines.extend(f'http_compression_saved_bytes_total{{encoding="{encoding}"}} {values[1] - values[2]}'
+                     for encoding, values in totals)
+        return '\n'.join(lines) + '\n'
+
+
+class Compression:
+    def __init__(self, min_size=1024, level=6, brotli_level=4, encodings=('br', 'gzip')):
+        self.min_size = min_size
+        self.levels = {'gzip': level, 'br': brotli_level}
+        # brotli solo si el módulo está instalado; el orden es la preferencia ante un empate de q
+        self.encodings = [encoding for encoding in encodings
+                          if encoding == 'gzip' or (encoding == 'br' and brotli is not None)]
+        self.stats = CompressionStats()
+
+    def _encoder(self, encoding):
+        if encoding == 'br':
+            return _BrotliEncoder(self.levels['br'])
+        return _GzipEncoder(self.levels['gzip'])
+
+    def _eligible(self, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.cache_control.no_transform:
+            return False
+        # En streaming el tamaño no se conoce (salvo que la vista ponga Content-Length): se comprime
+        if response.is_streamed:
+            length = response.content_length
+            return length is None or length >= self.min_size
+        return response.content_length is None or response.content_length >= self.min_size
+
+    def process(self, response):
+        if not self.encodings or not self._eligible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            start = time.thread_time()
+            encoder = self._encoder(encoding)
+            compressed = encoder.compress(data) + encoder.finish()
+            cpu = time.thread_time() - start
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+            self.stats.record(encoding, len(data), len(compressed), cpu)
+        response.headers['Content-Encoding'] = encoding
+        # El ETag identifica el contenido sin comprimir: pasa a débil (If-None-Match compara en débil)
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    # Comprime un cuerpo en streaming a medida que la vista lo genera; los contadores se
+    # actualizan al terminar el envío
+    def _stream(self, chunks, encoding):
+        encoder = self._encoder(encoding)
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                bytes_in += len(chunk)
+                start = time.thread_time()
+                data = encoder.compress(chunk)
+                cpu += time.thread_time() - start
+                if data:
+                    bytes_out += len(data)
+                    yield data
+            start = time.thread_time()
+            data = encoder.finish()
+            cpu += time.thread_time() - start
+            bytes_out += len(data)
+            yield data
+            self.stats.record(encoding, bytes_in, bytes_out, cpu)
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+
+def init_compression(app, **options):
+    compression = Compression(**options)
+    app.after_request(compression.process)
+    return compression
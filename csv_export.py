@@ -0,0 +1,62 @@
+# csv_export.py
+# Formato de las exportaciones CSV de servicios. Solo trabaja con tuplas simples, así lo comparten
+# la exportación en streaming de app.py y la exportación masiva de export_reports.py.
+import csv
+import io
+import json
+
+# Columnas de Service que necesita cada fila, en este orden
+CSV_COLUMNS = ('date', 'place', 'entry_time', 'break_duration', 'exit_time', 'worked_hours', 'observations', 'specific_tasks')
+CSV_HEADER = ['Fecha', 'Lugar', 'Entrada', 'Descanso (min)', 'Salida', 'Horas Trabajadas', 'Observaciones', 'Tareas Especificas']
+
+
+# Destino de csv.writer que acumula las líneas en memoria hasta que se envían
+class CsvChunk:
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, value):
+        self.parts.append(value)
+        self.size += len(value)
+
+    def take(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+
+# Texto de la columna 'Tareas Especificas' a partir de la copia JSON de Service.specific_tasks
+def specific_tasks_csv_text(specific_tasks):
+    if not specific_tasks:
+        return ""
+    try:
+        tasks = json.loads(specific_tasks)
+    except json.JSONDecodeError:
+        return "Error al cargar tareas"
+    return "; ".join(f"{task.get('description', 'N/A')} ({task.get('duration', 0):.2f}h)" for task in tasks)
+
+
+def services_csv_row(row):
+    service_date, place, entry_time, break_duration, exit_time, worked_hours, observations, specific_tasks = row
+    return [
+        service_date.strftime('%d/%m/%Y'),
+        place,
+        entry_time.strftime('%H:%M'),
+        break_duration,
+        exit_time.strftime('%H:%M'),
+        f"{worked_hours:.2f}",
+        observations or '',
+        specific_tasks_csv_text(specific_tasks)
+    ]
+
+
+# CSV completo (bytes UTF-8) a partir de una lista de filas en el orden de CSV_COLUMNS
+def build_services_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(CSV_HEADER)
+    for row in rows:
+        writer.writerow(services_csv_row(row))
+    return buffer.getvalue().encode('utf-8')
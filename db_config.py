@@ -0,0 +1,110 @@
+# db_config.py
+# Opciones del motor de SQLAlchemy según la base de datos de DATABASE_URL.
+# - Postgres: pool de conexiones por worker de gunicorn (cada worker es un proceso con su propio
+#   pool), comprobación de la conexión antes de usarla (pool_pre_ping) y reciclado periódico,
+#   para no usar conexiones que el servidor o un proxy ya han cerrado.
+# - SQLite: modo WAL (los lectores no se bloquean mientras alguien escribe), synchronous=NORMAL,
+#   espera en lugar de fallar con "database is locked" y una caché de páginas mayor. Se aplica
+#   con PRAGMAs en cada conexión nueva. SQLITE_TUNING=0 lo desactiva.
+#   Con workers gevent, una espera por bloqueo de SQLite detiene el worker entero: para gevent
+#   conviene Postgres.
+import os
+
+from sqlalchemy import event
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+# Heroku y otros proveedores aún entregan 'postgres://', que SQLAlchemy 2 ya no acepta
+def normalize_database_url(url):
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def is_sqlite(url):
+    return url.startswith('sqlite')
+
+
+def _is_memory_sqlite(url):
+    return url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url
+
+
+# Conexiones que necesita cada worker: un hilo de petición ocupa una conexión a la vez, así que
+# por defecto el pool tiene tantas como hilos por worker (GUNICORN_THREADS) y unas
+# pocas de reserva para picos. Total en el servidor ≈ workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+# Con workers gevent (GUNICORN_WORKER_CLASS=gevent) un worker atiende cientos de peticiones a la vez:
+# el pool no puede crecer con ellas (Postgres no admite tantas conexiones), así que es fijo
+# (GEVENT_POOL_SIZE) y las peticiones esperan su turno en el pool, cediendo el control mientras.
+def engine_options(url):
+    if is_sqlite(url):
+        if _is_memory_sqlite(url):
+            return {}
+        return {'connect_args': {'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}}
+    if os.environ.get('GUNICORN_WORKER_CLASS') == 'gevent':
+        concurrency = _env_int('GEVENT_POOL_SIZE', 10)
+    else:
+        concurrency = _env_int('GUNICORN_THREADS', 1)
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', max(2, concurrency)),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', max(2, concurrency // 2)),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'), # Seguro con WAL: como mucho se pierde la última transacción si se va la luz
+    ('busy_timeout', None), # Se rellena con SQLITE_BUSY_TIMEOUT_MS
+    ('cache_size', None), # Negativo = KiB; se rellena con SQLITE_CACHE_KB
+    ('temp_store', 'MEMORY'),
+)
+
+
+# Registra los PRAGMAs en el motor (llamar una vez tras crear la extensión SQLAlchemy)
+def configure_engine(engine):
+    url = str(engine.url)
+    if not is_sqlite(url) or _is_memory_sqlite(url) or os.environ.get('SQLITE_TUNING', '1') == '0':
+        return
+    values = {
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'cache_size': -_env_int('SQLITE_CACHE_KB', 20000),
+    }
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {name}={values.get(name, value)}')
+        cursor.close()
+
+
+# Con workers gevent, psycopg2 (escrito en C) bloquearía todo el worker mientras espera a Postgres.
+# Con este callback espera al socket a través de gevent, como hace psycogreen. Devuelve False si
+# psycopg2 no está instalado.
+def use_gevent_wait_callback():
+    try:
+        import psycopg2
+        from psycopg2 import extensions
+    except ImportError:
+        return False
+    from gevent.socket import wait_read, wait_write
+
+    def gevent_wait_callback(connection, timeout=None):
+        while True:
+            state = connection.poll()
+            if state == extensions.POLL_OK:
+                return
+            if state == extensions.POLL_READ:
+                wait_read(connection.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(connection.fileno(), timeout=timeout)
+            else:
+                raise psycopg2.OperationalError(f"Estado inesperado de poll(): {state!r}")
+
+    extensions.set_wait_callback(gevent_wait_callback)
+    return True
@@ -0,0 +1,131 @@
+# export_reports.py
+# Exportación masiva de cierre de mes: genera, para cada usuario y cada mes del rango, el PDF de
+# servicios, el PDF de tareas específicas y el CSV, y los guarda todos en un único ZIP.
+#
+#   python export_reports.py 2026-01 2026-03 -o cierre_2026T1.zip
+#   python export_reports.py 2026-09 --users ana luis --workers 4
+#   python export_reports.py 2026-09 --scaling    (además mide reports/s con 1, 2, 4... procesos)
+#
+# Las consultas se hacen en este proceso; el renderizado se reparte en un ProcessPoolExecutor y
+# cada archivo se escribe en el ZIP en cuanto está listo, con un número limitado de informes en
+# vuelo para que la memoria no dependa del tamaño del rango.
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from app import (app, User, month_totals, services_report_rows, tasks_report_rows, csv_report_rows,
+                 REPORT_DOWNLOAD_NAMES)
+import reports
+
+
+def month_range(first_month, last_month):
+    year, month = map(int, first_month.split('-'))
+    last_year, last_month_number = map(int, last_month.split('-'))
+    while (year, month) <= (last_year, last_month_number):
+        yield f"{year:04d}-{month:02d}"
+        month += 1
+        if month == 13:
+            year, month = year + 1, 1
+
+
+# Genera (nombre en el ZIP, tipo de informe, argumentos de reports.build_report) para cada informe
+def export_jobs(users, months):
+    for user in users:
+        for month_str in months:
+            totals = month_totals(user.id, month_str)
+            folder = f"{user.username}/{month_str}"
+            yield (f"{folder}/{REPORT_DOWNLOAD_NAMES['services'].format(month=month_str)}", 'services',
+                   (services_report_rows(user.id, month_str), user.username, month_str, totals.total_hours))
+            yield (f"{folder}/{REPORT_DOWNLOAD_NAMES['tasks'].format(month=month_str)}", 'tasks',
+                   (tasks_report_rows(user.id, month_str), user.username, month_str, totals.task_hours))
+            yield (f"{folder}/servicios_{month_str}.csv", 'csv', (csv_report_rows(user.id, month_str),))
+
+
+# Renderiza los informes en `workers` procesos y los escribe en el ZIP. Devuelve (informes, bytes)
+def write_zip(output, jobs, workers):
+    in_flight_limit = workers * 4
+    count = 0
+    total_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        in_flight = {}
+
+        def drain(return_when):
+            nonlocal count, total_bytes
+            done, _ = wait(in_flight, return_when=return_when)
+            for future in done:
+                arcname = in_flight.pop(future)
+                data = future.result()
+                # Los PDF ya van comprimidos: se guardan tal cual
+                compress_type = zipfile.ZIP_STORED if arcname.endswith('.pdf') else zipfile.ZIP_DEFLATED
+                archive.writestr(arcname, data, compress_type=compress_type)
+                count += 1
+                total_bytes += len(data)
+
+        for arcname, report_type, args in jobs:
+            in_flight[pool.submit(reports.build_report, report_type, *args)] = arcname
+            if len(in_flight) >= in_flight_limit:
+                drain(FIRST_COMPLETED)
+        while in_flight:
+            drain(FIRST_COMPLETED)
+    return count, total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta los informes de todos los usuarios en un ZIP.')
+    parser.add_argument('first_month', help='Primer mes (AAAA-MM)')
+    parser.add_argument('last_month', nargs='?', help='Último mes (AAAA-MM); por defecto el primero')
+    parser.add_argument('-o', '--output', help='Archivo ZIP de salida')
+    parser.add_argument('--users', nargs='*', help='Solo estos usuarios (por nombre)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--scaling', action='store_true',
+                        help='Mide también el rendimiento con 1, 2, 4... procesos hasta --workers')
+    args = parser.parse_args()
+
+    last_month = args.last_month or args.first_month
+    months = list(month_range(args.first_month, last_month))
+    output = args.output or f"informes_{args.first_month}_{last_month}.zip"
+
+    with app.app_context():
+        users_query = User.query.order_by(User.username)
+        if args.users:
+            users_query = users_query.filter(User.username.in_(args.users))
+        users = users_query.all()
+        if not users:
+            print("No hay usuarios que exportar.")
+            return 1
+
+        print(f"Exportando {len(users)} usuarios x {len(months)} meses a {output} con {args.workers} procesos...")
+        start = time.perf_counter()
+        count, total_bytes = write_zip(output, export_jobs(users, months), args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"{count} informes ({total_bytes / 1e6:.1f} MB) en {elapsed:.2f} s: {count / elapsed:.1f} informes/s")
+
+        if args.scaling:
+            # Los datos se consultan una sola vez para medir solo el renderizado y la escritura del ZIP
+            jobs = list(export_jobs(users, months))
+            worker_counts = []
+            n = 1
+            while n < args.workers:
+                worker_counts.append(n)
+                n *= 2
+            worker_counts.append(args.workers)
+            print("\nEscalado (mismos informes, ZIP temporal):")
+            print(f"{'procesos':>8} {'segundos':>9} {'informes/s':>11} {'aceleración':>12}")
+            baseline = None
+            for workers in worker_counts:
+                with tempfile.TemporaryFile() as scratch:
+                    start = time.perf_counter()
+                    write_zip(scratch, jobs, workers)
+                    elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(f"{workers:>8} {elapsed:>9.2f} {len(jobs) / elapsed:>11.1f} {baseline / elapsed:>11.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
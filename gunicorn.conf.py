@@ -0,0 +1,55 @@
+# gunicorn.conf.py
+# Configuración de gunicorn (gunicorn la lee sola desde la raíz del repositorio; ver Procfile).
+# El número de workers, el puerto, etc. siguen saliendo de la línea de comandos o de las variables
+# habituales (WEB_CONCURRENCY, PORT, GUNICORN_CMD_ARGS).
+# - Tipo de worker con GUNICORN_WORKER_CLASS (no con --worker-class, porque db_config.py también la
+#   lee para dimensionar el pool de conexiones):
+#   - 'sync' (por defecto): una petición a la vez por worker.
+#   - 'gthread': GUNICORN_THREADS hilos por worker (8 por defecto) y un pool de conexiones del mismo
+#     tamaño.
+#   - 'gevent': hasta GUNICORN_WORKER_CONNECTIONS peticiones a la vez por worker (1000 por defecto)
+#     con greenlets, psycopg2 cooperativo (db_config.use_gevent_wait_callback) y un pool fijo de
+#     GEVENT_POOL_SIZE conexiones. Es para Postgres, donde las peticiones pasan la mayor parte del
+#     tiempo esperando a la base de datos; con SQLite todo es CPU y no gana nada (bench/README.md).
+#   Los PDFs y los hashes de contraseñas se calculan en hilos del sistema aparte (offload.py), así
+#   que no paran el bucle de eventos de gevent.
+# - keepalive 0 (GUNICORN_KEEPALIVE): con gthread y gevent, las conexiones keep-alive que ya tiene
+#   un worker se atienden una y otra vez mientras las nuevas esperan; con el servidor saturado
+#   algunos clientes esperaban más de 15 s. Sin keep-alive cada petición vuelve a la cola del
+#   sistema, que es FIFO. Detrás de un proxy apenas cuesta nada.
+# - preload_app: el proceso maestro importa la aplicación una sola vez y los workers se crean con
+#   fork, compartiendo esa memoria (copy-on-write). Arrancar o reiniciar un worker ya no importa
+#   Flask, SQLAlchemy ni ReportLab.
+# - when_ready: en el maestro se cargan también ReportLab (reports.py, que app.py solo importa al
+#   generar el primer PDF) y todas las plantillas compiladas; gc.freeze() saca esos objetos del
+#   recolector para que no toque sus páginas y dejen de compartirse.
+# - post_fork: cada worker descarta las conexiones a la base de datos heredadas del maestro, que no
+#   se pueden usar desde dos procesos, y abre las suyas.
+import gc
+import os
+
+worker_class = os.environ.setdefault('GUNICORN_WORKER_CLASS', 'sync')
+if worker_class == 'gevent':
+    # Antes de importar la aplicación (preload_app), para que sus locks y sockets ya sean de gevent
+    from gevent import monkey
+    monkey.patch_all()
+    from db_config import use_gevent_wait_callback
+    use_gevent_wait_callback()
+
+threads = int(os.environ.setdefault('GUNICORN_THREADS', '8' if worker_class == 'gthread' else '1'))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 0))
+preload_app = True
+
+
+def when_ready(server):
+    import reports # noqa: F401
+    from app import warm_templates
+    warm_templates()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,46 @@
+# import_services.py
+# Importa servicios de un usuario desde un archivo CSV o JSON Lines (ver import_services en app.py).
+#   python import_services.py <usuario> <archivo> [--format csv|jsonl] [--batch-size 2000]
+#                             [--dry-run] [--report errores.json]
+# Sale con código 1 si alguna fila tiene errores.
+import argparse
+import json
+import sys
+import time
+from app import app, db, User, import_services, IMPORT_BATCH_SIZE
+from service_import import detect_format
+
+parser = argparse.ArgumentParser(description="Importa servicios desde CSV o JSON Lines.")
+parser.add_argument('username')
+parser.add_argument('path')
+parser.add_argument('--format', choices=('csv', 'jsonl'))
+parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+parser.add_argument('--dry-run', action='store_true', help="Solo valida, no guarda nada")
+parser.add_argument('--report', help="Guarda el informe completo (con los errores) en este archivo JSON")
+args = parser.parse_args()
+
+with app.app_context():
+    db.create_all()
+    user = User.query.filter_by(username=args.username).first()
+    if user is None:
+        sys.exit(f"El usuario '{args.username}' no existe.")
+
+    start = time.perf_counter()
+    with open(args.path, encoding='utf-8-sig', newline='') as stream:
+        report = import_services(user.id, stream, args.format or detect_format(args.path),
+                                 batch_size=args.batch_size, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - start
+
+action = "validadas" if args.dry_run else "importadas"
+print(f"Filas {action}: {report['imported']} en {elapsed:.1f} s ({report['imported'] / max(elapsed, 1e-9):.0f} filas/s).")
+print(f"Filas ya guardadas (se saltan): {report['skipped']}.")
+print(f"Filas con errores: {report['failed']}.")
+for error in report['errors'][:20]:
+    print(f"  línea {error['line']}: {error['error']}")
+if report['failed'] > 20:
+    print("  ...")
+if args.report:
+    with open(args.report, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+if report['failed']:
+    sys.exit(1)
@@ -1,5 +1,5 @@
 # init_db.py
-from app import app, db, User # Solo importamos User, ya no SubTask ni Service aquí
+from app import app, db, User, upgrade_schema # Solo importamos User, ya no SubTask ni Service aquí
 import os
 
 # Define la contraseña predeterminada para el usuario 'admin'
@@ -12,6 +12,10 @@ with app.app_context():
     # Crea todas las tablas definidas en los modelos (User y Service) si no existen
     db.create_all()
 
+    # Aplica los cambios de esquema que create_all() no hace sobre tablas existentes
+    # (por ejemplo, índices nuevos en 'service'). Es seguro ejecutarlo varias veces.
+    upgrade_schema()
+
     # Crea el usuario 'admin' por defecto si no existe en la base de datos
     if not User.query.filter_by(username='admin').first():
         admin_user = User(username='admin')
@@ -0,0 +1,173 @@
+# instrumentation.py
+# Medición opcional por petición (se activa con INSTRUMENTATION=1, ver app.py):
+# - número de consultas SQL y tiempo en la base de datos (eventos de cursor de SQLAlchemy),
+# - tiempo renderizando plantillas Jinja (señales de Flask) y generando PDF (timed('pdf')),
+# - latencia total de la vista.
+# Se envía en la cabecera Server-Timing, se escribe una línea JSON en el log 'controldehoras.slow'
+# si la petición supera SLOW_REQUEST_MS, y se agrega en /metrics (formato de texto de Prometheus).
+# Las métricas son por proceso: con varios workers de gunicorn cada uno expone las suyas.
+# extra_metrics son funciones que devuelven más líneas para /metrics (p. ej. compression.py).
+# En respuestas en streaming (CSV) la latencia cubre hasta que empieza el envío, no el cuerpo entero.
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Límites superiores (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_log = logging.getLogger('controldehoras.slow')
+
+
+class _RequestTimings:
+    __slots__ = ('start', 'queries', 'db', 'render', 'render_start', 'segments')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.render_start = None
+        self.segments = {} # Otros tramos medidos con timed(), p. ej. 'pdf'
+
+
+def _current():
+    return g.get('_timings') if has_request_context() else None
+
+
+# Mide un tramo de código dentro de la petición actual (no hace nada si la medición está desactivada)
+@contextmanager
+def timed(name):
+    timings = _current()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.segments[name] = timings.segments.get(name, 0.0) + time.perf_counter() - start
+
+
+class Metrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._latency = {} # (endpoint, method, status) -> [cuentas por bucket..., suma, total]
+        self._db = {} # endpoint -> [consultas, segundos]
+
+    def observe(self, endpoint, method, status, seconds, queries, db_seconds):
+        with self._lock:
+            series = self._latency.setdefault((endpoint, method, status), [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[index] += 1
+            series[-2] += seconds
+            series[-1] += 1
+            totals = self._db.setdefault(endpoint, [0, 0.0])
+            totals[0] += queries
+            totals[1] += db_seconds
+
+    def render(self):
+        lines = [
+            '# HELP http_request_duration_seconds Latencia de las peticiones por endpoint.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            latency = {key: list(values) for key, values in self._latency.items()}
+            db_totals = {key: list(values) for key, values in self._db.items()}
+        for (endpoint, method, status), series in sorted(latency.items()):
+            labels = f'endpoint="{endpoint}",method="{method}",status="{status}"'
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {series[-2]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {series[-1]}')
+        lines.append('# HELP db_queries_total Consultas SQL ejecutadas por endpoint.')
+        lines.append('# TYPE db_queries_total counter')
+        for endpoint, (queries, _) in sorted(db_totals.items()):
+            lines.append(f'db_queries_total{{endpoint="{endpoint}"}} {queries}')
+        lines.append('# HELP db_query_seconds_total Tiempo en la base de datos por endpoint.')
+        lines.append('# TYPE db_query_seconds_total counter')
+        for endpoint, (_, seconds) in sorted(db_totals.items()):
+            lines.append(f'db_query_seconds_total{{endpoint="{endpoint}"}} {seconds:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def init_instrumentation(app, db, slow_request_ms=500, extra_metrics=()):
+    metrics = Metrics()
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current() is not None:
+            conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        timings = _current()
+        starts = conn.info.get('_query_start')
+        if timings is not None and starts:
+            timings.db += time.perf_counter() - starts.pop()
+            timings.queries += 1
+
+    @before_render_template.connect_via(app)
+    def _before_render(sender, template, context, **extra):
+        timings = _current()
+        if timings is not None and timings.render_start is None:
+            timings.render_start = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def _after_render(sender, template, context, **extra):
+        timings = _current()
+        if timings is not None and timings.render_start is not None:
+            timings.render += time.perf_counter() - timings.render_start
+            timings.render_start = None
+
+    @app.before_request
+    def _start_timings():
+        g._timings = _RequestTimings()
+
+    @app.after_request
+    def _finish_timings(response):
+        timings = g.pop('_timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.start
+        endpoint = request.endpoint or 'unknown'
+        parts = [
+            f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"',
+            f'render;dur={timings.render * 1000:.1f}',
+        ]
+        parts.extend(f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.segments.items())
+        parts.append(f'total;dur={total * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(parts)
+
+        if endpoint != 'metrics':
+            metrics.observe(endpoint, request.method, response.status_code, total, timings.queries, timings.db)
+        if total * 1000 >= slow_request_ms:
+            slow_log.warning(json.dumps({
+                'endpoint': endpoint,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(timings.db * 1000, 1),
+                'queries': timings.queries,
+                'render_ms': round(timings.render * 1000, 1),
+                **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds in timings.segments.items()},
+            }))
+        return response
+
+    @app.route('/metrics', endpoint='metrics')
+    def metrics_view():
+        return Response(metrics.render() + ''.join(render() for render in extra_metrics),
+                        mimetype='text/plain; version=0.0.4')
+
+    return metrics
@@ -0,0 +1,45 @@
+# offload.py
+# Pools de hilos del sistema operativo para el trabajo de CPU de una petición (PDF con ReportLab,
+# hash de contraseñas), de modo que no se ejecute en el hilo que la atiende.
+# - Con workers sync o gthread es un ThreadPoolExecutor normal: limita cuántos PDFs o hashes se
+#   calculan a la vez en el proceso.
+# - Con workers gevent, threading está parcheado y un ThreadPoolExecutor normal usaría greenlets:
+#   el trabajo de CPU bloquearía el bucle de eventos y todas las demás peticiones del worker. Se usa
+#   el de gevent, que siempre crea hilos reales y cuyo result() espera cediendo el control.
+# Los pools se crean al primer uso en cada proceso, no en el maestro de gunicorn antes del fork.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def gevent_active():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+class NativePool:
+    def __init__(self, max_workers, thread_name_prefix):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                if gevent_active():
+                    from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+                    self._executor = GeventThreadPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix=self.thread_name_prefix)
+                self._pid = os.getpid()
+            return self._executor
+
+    # Ejecuta fn(*args) en uno de los hilos del pool y espera el resultado
+    def run(self, fn, *args):
+        return self._get_executor().submit(fn, *args).result()
@@ -0,0 +1,52 @@
+# passwords.py
+# Política de hash de contraseñas y verificación con concurrencia limitada.
+# - PASSWORD_HASH_METHOD (app.py) elige el algoritmo y su coste en el formato de Werkzeug, p. ej.
+#   'scrypt:32768:8:1' (por defecto) o 'pbkdf2:sha256:1000000'. Los hashes guardados con otros
+#   parámetros se rehacen en el siguiente inicio de sesión correcto (needs_rehash).
+# - scrypt y pbkdf2 se calculan en C sin el GIL, así que un pool de hilos basta para no bloquear
+#   al resto del proceso. Lo importante es el límite: como mucho max_workers hashes a la vez por
+#   proceso (scrypt con n=32768 usa 32 MB cada uno) y como mucho max_waiting esperando turno.
+#   Si se supera, PasswordBusyError en lugar de encolar sin fin durante un pico de inicios de sesión.
+#   Los hilos son siempre del sistema operativo, también con workers gevent (ver offload.py).
+import threading
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from offload import NativePool
+
+
+class PasswordBusyError(Exception):
+    pass
+
+
+# Parámetros completos de un método: 'scrypt' -> 'scrypt:32768:8:1' (los que Werkzeug usaría)
+@lru_cache(maxsize=8)
+def full_method(method):
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+class PasswordHasher:
+    def __init__(self, method, max_workers=2, max_waiting=16, wait_timeout=10):
+        self.method = method
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_waiting)
+        self._pool = NativePool(max_workers, thread_name_prefix='password')
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise PasswordBusyError("Demasiados inicios de sesión a la vez.")
+        try:
+            return self._pool.run(fn, *args)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    # True si el hash se hizo con otro algoritmo o con otros parámetros que la política actual
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split('$', 1)[0] != full_method(self.method)
@@ -0,0 +1,17 @@
+# purge_sessions.py
+# Borra las sesiones caducadas de la tabla web_session (solo con SESSION_BACKEND=sql).
+# La aplicación ya purga un lote cada SESSION_PURGE_INTERVAL segundos; este script sirve para
+# lanzarlo desde cron y vaciar de una vez lo acumulado, por lotes para no bloquear la tabla.
+#   python purge_sessions.py [--batch-size 1000]
+import sys
+from app import app, db, WebSession
+from sessions import PURGE_BATCH_SIZE, purge_expired_sessions
+
+batch_size = PURGE_BATCH_SIZE
+if '--batch-size' in sys.argv[1:]:
+    batch_size = int(sys.argv[sys.argv.index('--batch-size') + 1])
+
+with app.app_context():
+    db.create_all()
+    removed = purge_expired_sessions(db.engine, WebSession.__table__, batch_size=batch_size)
+    print(f"Sesiones caducadas borradas: {removed}.")
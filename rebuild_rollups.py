@@ -0,0 +1,28 @@
+# rebuild_rollups.py
+# Recalcula o verifica la tabla monthly_rollup (totales por usuario y mes).
+#   python rebuild_rollups.py           -> informa de las diferencias y reconstruye la tabla
+#   python rebuild_rollups.py --verify  -> solo informa de las diferencias (sale con código 1 si hay)
+import sys
+from app import app, db, verify_monthly_rollups, rebuild_monthly_rollups
+
+verify_only = '--verify' in sys.argv[1:]
+
+with app.app_context():
+    db.create_all()
+
+    drift = verify_monthly_rollups()
+    if drift:
+        print(f"Se encontraron {len(drift)} meses con diferencias:")
+        for user_id, month_str, stored, expected in drift:
+            print(f"  usuario {user_id} {month_str}: guardado horas={stored[0]:.2f} servicios={stored[1]} "
+                  f"tareas={stored[2]:.2f} / esperado horas={expected[0]:.2f} servicios={expected[1]} "
+                  f"tareas={expected[2]:.2f}")
+    else:
+        print("Los totales mensuales coinciden con los datos.")
+
+    if not verify_only:
+        months = rebuild_monthly_rollups()
+        print(f"Tabla monthly_rollup reconstruida: {months} meses.")
+
+if verify_only and drift:
+    sys.exit(1)
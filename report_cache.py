@@ -0,0 +1,80 @@
+# report_cache.py
+# Caché en disco de informes ya generados (PDF), con un tamaño máximo y expulsión LRU.
+# Cada entrada es un archivo; la fecha de modificación marca el último uso, así que la caché
+# se comparte entre todos los workers de gunicorn que apunten al mismo directorio.
+import hashlib
+import os
+import tempfile
+import threading
+
+
+class ReportCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    # Clave estable a partir de las partes que identifican el informe (usuario, mes, tipo, versión...)
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cached:
+                data = cached.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path) # Marca la entrada como usada recientemente
+        except FileNotFoundError:
+            pass # Expulsada por otro proceso mientras la leíamos; los datos ya están en memoria
+        return data
+
+    def contains(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        # Escritura atómica: nadie puede leer un PDF a medio escribir
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict()
+
+    # Borra las entradas usadas hace más tiempo hasta quedar por debajo de max_bytes
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if not entry.name.endswith('.pdf'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
@@ -0,0 +1,224 @@
+# report_jobs.py
+# Cola local de generación de informes PDF en procesos aparte, sin broker externo.
+# Una petición encarga el informe y recibe un id de trabajo; un hilo despachador de cada worker
+# de gunicorn lanza como mucho `max_workers` procesos a la vez, y cada proceso deja el PDF en la
+# ReportCache compartida. El estado de cada trabajo se guarda en un pequeño JSON junto a la caché,
+# así que cualquier worker puede responder a la consulta de estado o servir la descarga.
+#
+# Los límites (max_workers, max_pending, per_user_limit) son POR WORKER de gunicorn: la cola y los
+# procesos en marcha solo existen en el proceso que recibió el encargo. Con N workers puede haber
+# hasta max_workers x N procesos generando PDFs a la vez; hay que dimensionar REPORT_WORKERS con eso.
+#
+# Si el worker dueño de un trabajo muere o se recicla, su estado se quedaría en pending/running
+# para siempre. Por eso cada estado guarda el pid y el host del dueño y la hora de su última
+# escritura (el despachador la renueva mientras el trabajo sigue vivo): state() da por fallido
+# ('timeout') un trabajo cuyo dueño ya no existe o que lleva más de timeout + STATE_STALE_MARGIN
+# segundos sin noticias, y la aplicación lo vuelve a encargar.
+import json
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+
+from report_cache import ReportCache
+
+STATE_MAX_AGE = 24 * 3600 # Segundos que se conservan los estados de trabajos terminados
+STATE_HEARTBEAT = 10 # Cada cuántos segundos el despachador renueva los estados pending/running
+STATE_STALE_MARGIN = 30 # Margen sobre el timeout antes de dar por abandonado un trabajo
+HOSTNAME = socket.gethostname()
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# Se ejecuta en el proceso hijo: solo importa reports/report_cache, nunca la aplicación Flask
+def _render_job(cache_dir, cache_max_bytes, job_id, report_type, args):
+    import reports
+    ReportCache(cache_dir, cache_max_bytes).put(job_id, reports.build_report(report_type, *args))
+
+
+class _Job:
+    __slots__ = ('job_id', 'user_id', 'report_type', 'args', 'meta')
+
+    def __init__(self, job_id, user_id, report_type, args, meta):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.report_type = report_type
+        self.args = args
+        self.meta = meta
+
+
+class ReportQueue:
+    def __init__(self, cache, max_workers=2, max_pending=20, per_user_limit=2, timeout=120):
+        self.cache = cache
+        self.jobs_dir = os.path.join(cache.directory, 'jobs')
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.per_user_limit = per_user_limit
+        self.timeout = timeout
+        self._reset()
+
+    # Estado propio de cada proceso: tras un fork (gunicorn --preload) se empieza de cero
+    def _reset(self):
+        self._pid = os.getpid()
+        self._pending = deque()
+        self._running = {} # job_id -> (job, proceso, inicio)
+        self._condition = threading.Condition()
+        self._dispatcher = None
+        self._last_purge = 0.0
+        self._last_heartbeat = 0.0
+
+    def _context(self):
+        # forkserver evita hacer fork de un proceso con hilos (los del servidor web)
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['reports'])
+            return context
+        return multiprocessing.get_context('spawn')
+
+    def _ensure_dispatcher(self):
+        if self._pid != os.getpid():
+            self._reset()
+        if self._dispatcher is None:
+            self._mp_context = self._context()
+            self._dispatcher = threading.Thread(target=self._dispatch, name='report-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+    # Encarga un informe. job_id debe identificar el contenido (la clave de la caché); si ya está
+    # en marcha en este proceso no se duplica. Lanza QueueFullError si la cola o el límite del
+    # usuario están completos.
+    def submit(self, job_id, user_id, report_type, args, meta=None):
+        if self._pid != os.getpid():
+            self._reset()
+        with self._condition:
+            if job_id in self._running or any(job.job_id == job_id for job in self._pending):
+                return job_id
+            if len(self._pending) >= self.max_pending:
+                raise QueueFullError('La cola de informes está llena.')
+            user_jobs = sum(1 for job in self._pending if job.user_id == user_id) + \
+                sum(1 for job, _, _ in self._running.values() if job.user_id == user_id)
+            if user_jobs >= self.per_user_limit:
+                raise QueueFullError('Ya tienes informes en preparación.')
+            self._ensure_dispatcher()
+            job = _Job(job_id, user_id, report_type, args, meta or {})
+            self._write_state(job, 'pending')
+            self._pending.append(job)
+            self._condition.notify()
+        self._purge_old_states()
+        return job_id
+
+    # Registra como terminado un informe que ya estaba en la caché
+    def record_done(self, job_id, user_id, report_type, meta=None):
+        self._write_state(_Job(job_id, user_id, report_type, None, meta or {}), 'done')
+
+    # Estado de un trabajo (dict con 'status' = pending/running/done/failed, 'user_id' y meta) o None
+    def state(self, job_id):
+        try:
+            with open(self._state_path(job_id), encoding='utf-8') as state_file:
+                state = json.load(state_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if state['status'] == 'done' and not self.cache.contains(job_id):
+            return None # El PDF se expulsó de la caché: hay que volver a encargarlo
+        if state['status'] in ('pending', 'running') and self._abandoned(state):
+            state.update(status='failed', error='timeout')
+        return state
+
+    # El worker que tenía el trabajo ya no existe, o no ha renovado el estado a tiempo
+    def _abandoned(self, state):
+        if time.time() - state.get('updated_at', 0) > self.timeout + STATE_STALE_MARGIN:
+            return True
+        if state.get('host') != HOSTNAME or not state.get('pid'):
+            return False
+        try:
+            os.kill(state['pid'], 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass # Existe, pero es de otro usuario
+        return False
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                self._reap()
+                self._heartbeat()
+                while self._pending and len(self._running) < self.max_workers:
+                    job = self._pending.popleft()
+                    process = self._mp_context.Process(
+                        target=_render_job,
+                        args=(self.cache.directory, self.cache.max_bytes, job.job_id, job.report_type, job.args),
+                        daemon=True
+                    )
+                    try:
+                        process.start()
+                    except Exception as e:
+                        # El despachador no debe morir por un trabajo: se marca como fallido y sigue
+                        self._write_state(job, 'failed', error=str(e))
+                        continue
+                    self._running[job.job_id] = (job, process, time.monotonic())
+                    self._write_state(job, 'running')
+                # Con trabajos en marcha se revisa a menudo (fin y timeout); si no, se espera a submit()
+                self._condition.wait(timeout=0.2 if self._running else None)
+
+    def _reap(self):
+        now = time.monotonic()
+        for job_id, (job, process, started) in list(self._running.items()):
+            if process.is_alive():
+                if now - started <= self.timeout:
+                    continue
+                process.terminate()
+                process.join()
+                self._write_state(job, 'failed', error='timeout')
+            else:
+                process.join()
+                if process.exitcode == 0 and self.cache.contains(job_id):
+                    self._write_state(job, 'done')
+                else:
+                    self._write_state(job, 'failed', error=f'exit code {process.exitcode}')
+            del self._running[job_id]
+
+    # Renueva updated_at de los trabajos de este proceso para que state() no los dé por abandonados
+    def _heartbeat(self):
+        now = time.monotonic()
+        if now - self._last_heartbeat < STATE_HEARTBEAT:
+            return
+        self._last_heartbeat = now
+        for job in self._pending:
+            self._write_state(job, 'pending')
+        for job, _, _ in self._running.values():
+            self._write_state(job, 'running')
+
+    def _state_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _write_state(self, job, status, error=None):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        state = dict(job.meta, status=status, user_id=job.user_id, report_type=job.report_type,
+                     pid=os.getpid(), host=HOSTNAME, updated_at=time.time())
+        if error:
+            state['error'] = error
+        fd, tmp_path = tempfile.mkstemp(dir=self.jobs_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            json.dump(state, tmp)
+        os.replace(tmp_path, self._state_path(job.job_id))
+
+    def _purge_old_states(self):
+        now = time.time()
+        if now - self._last_purge < 3600:
+            return
+        self._last_purge = now
+        try:
+            with os.scandir(self.jobs_dir) as scan:
+                for entry in scan:
+                    try:
+                        if now - entry.stat().st_mtime > STATE_MAX_AGE:
+                            os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,204 @@
+# reports.py
+# Generación de los informes PDF con ReportLab.
+# Solo recibe datos simples (tuplas, cadenas, números) y devuelve bytes: no depende de Flask ni de
+# la base de datos, así que se puede ejecutar en otro proceso (report_jobs.py, export_reports.py).
+#
+# Para que los meses largos se generen rápido:
+# - los estilos y TableStyle se crean una vez por proceso (_report_styles) y se reutilizan;
+# - fechas, horas, números y los textos que caben en una línea van como cadenas simples, que la
+#   tabla dibuja sin maquetar párrafos; solo los textos largos se convierten en Paragraph;
+# - las filas se reparten en tablas de TABLE_CHUNK_ROWS filas con la cabecera repetida
+#   (repeatRows), en lugar de una sola tabla gigante que ReportLab tiene que partir página a página.
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from csv_export import build_services_csv
+
+from reportlab.lib.pagesizes import A4, landscape, portrait # Import landscape and portrait
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch # Para ReportLab TableStyle
+from reportlab.lib.enums import TA_LEFT
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# Columnas que esperan los informes (ver services_report_rows/tasks_report_rows en app.py)
+SERVICE_REPORT_COLUMNS = ('date', 'place', 'entry_time', 'break_duration', 'exit_time', 'worked_hours', 'observations')
+TASK_REPORT_COLUMNS = ('date', 'description', 'duration')
+
+# Filas de datos por tabla; cada tabla lleva su cabecera y se repite si aun así cambia de página
+TABLE_CHUNK_ROWS = 40
+
+MONTH_NAMES = [
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+]
+
+SERVICES_HEADER = ['Fecha', 'Lugar', 'Entrada', 'Descanso (min)', 'Salida', 'Horas', 'Observaciones']
+# Define column widths for landscape A4 (841.89 points wide); ~780 points in total
+SERVICES_COL_WIDTHS = [
+    60,  # Fecha (approx 21mm)
+    120, # Lugar (approx 42mm)
+    60,  # Entrada (approx 21mm)
+    60,  # Descanso (approx 21mm)
+    60,  # Salida (approx 21mm)
+    60,  # Horas (approx 21mm)
+    360  # Observaciones (approx 127mm - much wider for wrapping)
+]
+
+TASKS_HEADER = ['Fecha', 'Tarea Específica', 'Horas']
+# Adjust column widths for portrait A4 (595.27 points wide); ~550 points in total
+TASKS_COL_WIDTHS = [
+    70,  # Fecha
+    380, # Tarea Específica (more space for description)
+    100  # Horas
+]
+
+
+def _table_style(grid_width, font_size, column_alignments):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4CAF50')), # Header background
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke), # Header text color
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'), # Header alignment
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f2f2f2')), # Data rows background
+        ('GRID', (0, 0), (-1, -1), grid_width, colors.black),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),
+    ] + [
+        # Specific column alignments for data rows
+        ('ALIGN', (first, 1), (last, -1), alignment) for first, last, alignment in column_alignments
+    ])
+
+
+# Estilos de cada tipo de informe, creados una sola vez por proceso
+@lru_cache(maxsize=None)
+def _report_styles(report_type):
+    styles = getSampleStyleSheet()
+    if report_type == 'services':
+        font_size, leading = 7, 9
+        table_style = _table_style(0.5, font_size, [
+            (0, 0, 'CENTER'), # Fecha
+            (1, 1, 'LEFT'),   # Lugar
+            (2, 5, 'CENTER'), # Entrada, Descanso, Salida, Horas
+            (6, 6, 'LEFT'),   # Observaciones
+        ])
+    else:
+        font_size, leading = 9, 11 # Slightly larger font for tasks PDF
+        table_style = _table_style(1, font_size, [
+            (0, 0, 'CENTER'), # Fecha
+            (1, 1, 'LEFT'),   # Tarea Específica
+            (2, 2, 'CENTER'), # Horas
+        ])
+    # Custom style for table cells that need word wrapping
+    cell_left = ParagraphStyle(name='TableContentLeft', fontSize=font_size, leading=leading, alignment=TA_LEFT)
+    return styles, cell_left, table_style
+
+
+# Tablas de como mucho TABLE_CHUNK_ROWS filas, cada una con la cabecera repetida
+def _chunked_tables(header, rows, col_widths, table_style):
+    tables = []
+    for start in range(0, len(rows), TABLE_CHUNK_ROWS):
+        table = Table([header] + rows[start:start + TABLE_CHUNK_ROWS], colWidths=col_widths, repeatRows=1)
+        table.setStyle(table_style)
+        tables.append(table)
+    return tables
+
+
+CELL_PADDING = 12 # Relleno horizontal por defecto de una celda (6 pt a cada lado)
+
+
+# Celda de texto libre: si cabe en una línea se deja como cadena simple y solo los textos largos
+# (o con saltos de línea) pasan a Paragraph para que se ajusten a la columna.
+def _text_cell(text, style, width):
+    if not text:
+        return ''
+    if '\n' not in text and stringWidth(text, style.fontName, style.fontSize) <= width - CELL_PADDING:
+        return text
+    return Paragraph(escape(text).replace('\n', '<br/>'), style)
+
+
+def _title_story(title_text, username, styles):
+    return [
+        Paragraph(title_text, styles['h1']),
+        Spacer(1, 0.2 * inch),
+        Paragraph(f"Usuario: <b>{escape(username)}</b>", styles['Normal']),
+        Spacer(1, 0.1 * inch),
+    ]
+
+
+# Construye el PDF mensual de servicios y devuelve sus bytes.
+# services: tuplas en el orden de SERVICE_REPORT_COLUMNS
+def build_services_pdf(services, username, month_str, total_hours):
+    year, month = map(int, month_str.split('-'))
+    styles, cell_left, table_style = _report_styles('services')
+
+    rows = []
+    for service_date, place, entry_time, break_duration, exit_time, worked_hours, observations in services:
+        rows.append([
+            service_date.strftime('%d/%m/%Y'),
+            _text_cell(place, cell_left, SERVICES_COL_WIDTHS[1]),
+            entry_time.strftime('%H:%M'),
+            str(break_duration),
+            exit_time.strftime('%H:%M'),
+            f"{worked_hours:.2f}",
+            _text_cell(observations, cell_left, SERVICES_COL_WIDTHS[6]), # Long observations wrap
+        ])
+
+    story = _title_story(f"Reporte de Horas Trabajadas para el mes de {MONTH_NAMES[month - 1]} {year}", username, styles)
+    if rows:
+        story.extend(_chunked_tables(SERVICES_HEADER, rows, SERVICES_COL_WIDTHS, table_style))
+    else:
+        # Mes sin servicios: solo la cabecera de la tabla, como antes
+        story.append(Table([SERVICES_HEADER], colWidths=SERVICES_COL_WIDTHS, style=table_style))
+    story.append(Spacer(1, 0.2 * inch))
+
+    # Total Hours
+    story.append(Paragraph(f"<b>Total de Horas Trabajadas: {total_hours:.2f}</b>", styles['h2']))
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4)) # Changed to landscape A4
+    doc.build(story)
+    return buffer.getvalue()
+
+
+# Construye el PDF detallado de tareas específicas del mes y devuelve sus bytes.
+# task_rows: tuplas (fecha, descripción, horas) en el orden de TASK_REPORT_COLUMNS
+def build_tasks_pdf(task_rows, username, month_str, grand_total_tasks_hours):
+    year, month = map(int, month_str.split('-'))
+    styles, cell_left, table_style = _report_styles('tasks')
+
+    rows = [
+        [service_date.strftime('%d/%m/%Y'), _text_cell(description, cell_left, TASKS_COL_WIDTHS[1]), f"{duration:.2f}"]
+        for service_date, description, duration in task_rows
+    ]
+
+    story = _title_story(f"Reporte Detallado de Tareas Específicas - {MONTH_NAMES[month - 1]} {year}", username, styles)
+    if not rows:
+        story.append(Paragraph("No hay datos de tareas específicas para este mes.", styles['Normal']))
+    else:
+        story.extend(_chunked_tables(TASKS_HEADER, rows, TASKS_COL_WIDTHS, table_style))
+        story.append(Spacer(1, 0.2 * inch))
+
+        # Grand Total of Specific Tasks
+        story.append(Paragraph(f"<b>Total General de Horas de Tareas Específicas: {grand_total_tasks_hours:.2f}</b>", styles['h2']))
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=portrait(A4)) # Portrait A4 for tasks summary
+    doc.build(story)
+    return buffer.getvalue()
+
+
+# Informes disponibles por nombre (report_type), para poder encargarlos a otro proceso
+REPORT_BUILDERS = {
+    'services': build_services_pdf,
+    'tasks': build_tasks_pdf,
+    'csv': build_services_csv,
+}
+
+
+def build_report(report_type, *args):
+    return REPORT_BUILDERS[report_type](*args)
@@ -0,0 +1,136 @@
+# service_import.py
+# Lectura en streaming de archivos de servicios para la importación masiva (ver import_services
+# en app.py). Acepta CSV (con las cabeceras de la exportación o con los nombres de los campos) y
+# JSON Lines (un objeto por línea). Solo convierte texto en valores; la validación de negocio
+# (horas trabajadas, tareas) y la inserción se hacen en app.py.
+import csv
+import json
+import re
+from datetime import date, time
+
+# Cabecera (en minúsculas) -> campo. 'Horas Trabajadas' se ignora: se recalcula siempre.
+FIELD_ALIASES = {
+    'fecha': 'date', 'date': 'date',
+    'lugar': 'place', 'place': 'place',
+    'entrada': 'entry_time', 'entry_time': 'entry_time',
+    'descanso (min)': 'break_duration', 'descanso': 'break_duration', 'break_duration': 'break_duration',
+    'salida': 'exit_time', 'exit_time': 'exit_time',
+    'observaciones': 'observations', 'observations': 'observations',
+    'tareas especificas': 'specific_tasks', 'tareas específicas': 'specific_tasks',
+    'specific_tasks': 'specific_tasks', 'tasks': 'specific_tasks',
+}
+# AAAA-MM-DD o DD/MM/AAAA (el de la exportación CSV) y HH:MM (o H:MM, o HH:MM:SS de una exportación
+# de la base de datos). Con expresiones regulares en lugar de strptime, que es lo más caro por fila.
+ISO_DATE_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+DMY_DATE_RE = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$')
+TIME_RE = re.compile(r'^([01]?[0-9]|2[0-3]):([0-5][0-9])(?::[0-5][0-9])?$')
+# Tarea en el formato de la exportación CSV: "Inventario (1.50h)"
+CSV_TASK_RE = re.compile(r'^(?P<description>.+?)\s*\((?P<duration>[0-9]+(?:[.,][0-9]+)?)\s*h\)$')
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+# Recorre el archivo (un objeto de texto) sin cargarlo entero. Devuelve (número de línea,
+# dict de campos) o (número de línea, ImportRowError) si la línea no se puede leer.
+def iter_records(stream, file_format):
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ImportRowError(f"JSON inválido: {e.msg}")
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ImportRowError("Cada línea debe ser un objeto JSON.")
+                continue
+            yield line_number, {FIELD_ALIASES.get(key.strip().lower(), key): value for key, value in record.items()}
+        return
+
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    fields = [FIELD_ALIASES.get(name.strip().lower()) for name in header]
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        yield reader.line_num, {field: value for field, value in zip(fields, values) if field}
+
+
+def parse_date(value):
+    if not isinstance(value, str):
+        raise ImportRowError("Falta la fecha.")
+    value = value.strip()
+    try:
+        match = ISO_DATE_RE.match(value)
+        if match:
+            return date(int(match[1]), int(match[2]), int(match[3]))
+        match = DMY_DATE_RE.match(value)
+        if match:
+            return date(int(match[3]), int(match[2]), int(match[1]))
+    except ValueError: # 31/02/2026
+        pass
+    raise ImportRowError(f"Fecha inválida '{value}'. Usa AAAA-MM-DD o DD/MM/AAAA.")
+
+
+def parse_time(value, label):
+    if not isinstance(value, str) or not value.strip():
+        raise ImportRowError(f"Falta la hora de {label}.")
+    match = TIME_RE.match(value.strip())
+    if not match:
+        raise ImportRowError(f"Hora de {label} inválida '{value}'. Usa HH:MM.")
+    return time(int(match[1]), int(match[2]))
+
+
+def parse_break(value):
+    if value in (None, ''):
+        return 0
+    try:
+        minutes = int(float(value))
+    except (TypeError, ValueError):
+        raise ImportRowError(f"Descanso inválido '{value}'. Debe ser un número de minutos.")
+    if minutes < 0:
+        raise ImportRowError("El descanso no puede ser negativo.")
+    return minutes
+
+
+# Tareas como lista de {"description", "duration"}: admite una lista (JSON Lines), un texto JSON
+# o el texto de la exportación CSV ("Tarea (1.50h); Otra (2.00h)")
+def parse_tasks(value):
+    if value in (None, '', []):
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith('['):
+            try:
+                value = json.loads(text)
+            except json.JSONDecodeError:
+                raise ImportRowError("Tareas en JSON inválido.")
+        else:
+            value = []
+            for part in filter(None, (item.strip() for item in text.split(';'))):
+                match = CSV_TASK_RE.match(part)
+                if not match:
+                    raise ImportRowError(f"Tarea inválida '{part}'. Usa 'Descripción (1.50h)'.")
+                value.append({'description': match['description'], 'duration': match['duration'].replace(',', '.')})
+    if not isinstance(value, list):
+        raise ImportRowError("Las tareas deben ser una lista.")
+    tasks = []
+    for task in value:
+        description = str(task.get('description') or '').strip() if isinstance(task, dict) else ''
+        try:
+            duration = float(task.get('duration'))
+        except (AttributeError, TypeError, ValueError):
+            duration = 0
+        if not description or duration <= 0:
+            raise ImportRowError("Cada tarea necesita descripción y una duración mayor que 0.")
+        tasks.append({'description': description[:200], 'duration': duration})
+    return tasks
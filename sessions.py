@@ -0,0 +1,126 @@
+# sessions.py
+# Almacenes de sesión intercambiables (SESSION_BACKEND en app.py):
+# - 'cookie' (por defecto): la sesión firmada de Flask dentro de la propia cookie. La aplicación
+#   solo guarda el id del usuario, los meses de trabajo y los mensajes flash, así que cabe de
+#   sobra; no hay nada en disco y sirve igual en varios servidores con la misma SECRET_KEY.
+# - 'sql': la cookie lleva solo un id aleatorio y los datos van en la tabla web_session, con la
+#   fecha de caducidad indexada. Útil para poder cerrar sesiones desde el servidor. Solo se
+#   escribe cuando la sesión cambia o le queda menos de la mitad de vida, y las sesiones
+#   caducadas se borran por lotes (purge_expired_sessions, también desde purge_sessions.py).
+import secrets
+import time
+from datetime import datetime, timezone
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, insert, select, update
+from werkzeug.datastructures import CallbackDict
+
+SESSION_ID_BYTES = 32
+PURGE_BATCH_SIZE = 1000
+
+
+class SqlSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires_at=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = new
+        self.modified = False
+        self.user_id = (initial or {}).get('_user_id') # Para cambiar el id al iniciar o cerrar sesión
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Borra sesiones caducadas en lotes pequeños para no bloquear la tabla mucho rato.
+# Devuelve cuántas se han borrado.
+def purge_expired_sessions(engine, table, batch_size=PURGE_BATCH_SIZE, max_batches=None):
+    removed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with engine.begin() as connection:
+            ids = connection.execute(
+                select(table.c.id).where(table.c.expires_at < _utcnow()).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            connection.execute(delete(table).where(table.c.id.in_(ids)))
+        removed += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    return removed
+
+
+class SqlSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer() # El mismo formato que la cookie de Flask (tuplas, Markup...)
+
+    def __init__(self, engine, table, purge_interval=300):
+        self.engine = engine
+        self.table = table
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and len(sid) < 100:
+            with self.engine.connect() as connection:
+                row = connection.execute(
+                    select(self.table.c.data, self.table.c.expires_at).where(self.table.c.id == sid)
+                ).first()
+            if row is not None and row.expires_at > _utcnow():
+                try:
+                    return SqlSession(self.serializer.loads(row.data), sid=sid, expires_at=row.expires_at)
+                except ValueError:
+                    pass
+        return SqlSession(sid=secrets.token_urlsafe(SESSION_ID_BYTES), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if not session.new:
+                with self.engine.begin() as connection:
+                    connection.execute(delete(self.table).where(self.table.c.id == session.sid))
+            if session.modified or not session.new:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = _utcnow()
+        lifetime = app.permanent_session_lifetime
+        expires_at = now + lifetime
+        user_changed = session.get('_user_id') != session.user_id
+        # Renovar solo cuando ya ha pasado la mitad de la vida evita una escritura por petición
+        needs_refresh = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if not (session.modified or user_changed or needs_refresh):
+            return
+
+        data = self.serializer.dumps(dict(session))
+        with self.engine.begin() as connection:
+            if user_changed and not session.new:
+                # Id nuevo al iniciar o cerrar sesión, para que un id anterior no sirva (session fixation)
+                connection.execute(delete(self.table).where(self.table.c.id == session.sid))
+                session.sid = secrets.token_urlsafe(SESSION_ID_BYTES)
+                session.new = True
+            values = {'data': data, 'expires_at': expires_at}
+            if session.new or connection.execute(
+                update(self.table).where(self.table.c.id == session.sid).values(**values)
+            ).rowcount == 0:
+                connection.execute(insert(self.table).values(id=session.sid, **values))
+
+        response.set_cookie(
+            name, session.sid,
+            expires=expires_at.replace(tzinfo=timezone.utc) if session.permanent else None,
+            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+        )
+
+        if self.purge_interval and time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval
+            purge_expired_sessions(self.engine, self.table, max_batches=1)
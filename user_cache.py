@@ -0,0 +1,60 @@
+# user_cache.py
+# Caché en memoria (por proceso) de los usuarios que carga Flask-Login en cada petición.
+# Guarda una copia ligera y desconectada de la sesión de SQLAlchemy (UserSnapshot) con
+# caducidad (TTL) y un número máximo de entradas (LRU), así una página normal no consulta
+# la tabla user. Cada worker de gunicorn tiene su propia caché: tras cambiar el nombre de
+# usuario, otro worker puede mostrar el nombre anterior como mucho durante el TTL.
+import threading
+import time
+from collections import OrderedDict
+
+
+# Lo mínimo que usan las vistas y plantillas de current_user. No guarda el hash de la
+# contraseña: para comprobarla o cambiarla hay que cargar el User real (ver profile()).
+class UserSnapshot:
+    __slots__ = ('id', 'username')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def get_id(self):
+        return str(self.id)
+
+
+class UserCache:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # user_id -> (caduca, UserSnapshot)
+        self._lock = threading.Lock()
+
+    # Devuelve el snapshot del usuario; si no está o ha caducado, lo pide a load(user_id),
+    # que debe devolver un UserSnapshot o None si el usuario no existe
+    def get(self, user_id, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        snapshot = load(user_id)
+        if snapshot is not None and self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()